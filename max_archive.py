@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 归档清单
+archive/manifest.json 记录 archive/ 下的每一份快照（路径、时间戳、类型、大小、内容哈希、国家数），
+按类型（all_countries / cny_sorted）以完整时间戳 YYYYMMDD_HHMMSS 升序排列：
+- "最新"和"往前第 N 份"直接按下标取，不再递归 glob 整个归档目录
+- 写入归档的代码（流水线、爬虫）同时登记到清单，清单以临时文件 + os.replace 原子更新
+- 清单缺失或损坏时扫描一次归档目录重建；手工增删归档文件后可用 python max_archive.py rebuild 重建
+
+用法:
+  python max_archive.py show                # 各类型的快照数量和最新一份
+  python max_archive.py rebuild             # 扫描 archive/ 重建清单
+"""
+
+import json
+import os
+import re
+import sys
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from max_logger import get_logger
+
+log = get_logger("archive")
+
+ARCHIVE_DIR = 'archive'
+MANIFEST_NAME = 'manifest.json'
+OBJECTS_DIR = 'objects'
+# 清单格式版本：修改条目结构时递增，旧版本清单会被重建
+MANIFEST_VERSION = 1
+SNAPSHOT_PATTERN = re.compile(r"^max_prices_(all_countries|cny_sorted)_(\d{8}_\d{6})\.json$")
+KINDS = ("all_countries", "cny_sorted")
+
+
+def parse_snapshot_name(filename: str) -> Optional[Dict[str, str]]:
+    """归档文件名 -> {"kind", "timestamp"}；不是快照文件时返回 None"""
+    match = SNAPSHOT_PATTERN.match(os.path.basename(filename))
+    if not match:
+        return None
+    return {"kind": match.group(1), "timestamp": match.group(2)}
+
+
+def describe_snapshot(path: str, content: Optional[bytes] = None, countries: Optional[int] = None) -> Dict[str, Any]:
+    """
+    计算快照的大小、sha256 和国家数（不含 _ 开头的元数据键）
+    调用方已有序列化结果或国家数时直接传入，避免重新读取和解析文件
+    快照引用文件（max_snapshot_store）直接取引用中记录的完整快照信息
+    """
+    import hashlib
+    if content is None:
+        with open(path, 'rb') as f:
+            content = f.read()
+        from max_snapshot_store import reference_info
+        ref = reference_info(content)
+        if ref is not None:
+            return {"size": ref["size"], "sha256": ref["sha256"], "countries": ref["countries"]}
+    if countries is None:
+        data = json.loads(content)
+        countries = sum(1 for key in data if not key.startswith('_'))
+    return {"size": len(content), "sha256": hashlib.sha256(content).hexdigest(), "countries": countries}
+
+
+class ArchiveManifest:
+    """archive/manifest.json 的读写与查询；首次查询时才加载"""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.path = os.path.join(archive_dir, MANIFEST_NAME)
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    @property
+    def entries(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            payload = None
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"⚠️ 归档清单无法读取，重新扫描: {self.path} - {e}")
+            payload = None
+        if isinstance(payload, dict) and payload.get("version") == MANIFEST_VERSION:
+            snapshots = payload.get("snapshots", {})
+            return {kind: list(snapshots.get(kind, [])) for kind in KINDS}
+        return self.rebuild()
+
+    def rebuild(self) -> Dict[str, List[Dict[str, Any]]]:
+        """扫描归档目录重建清单（清单缺失、损坏或手工增删归档文件后）"""
+        entries: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KINDS}
+        if os.path.isdir(self.archive_dir):
+            for root, dirs, files in os.walk(self.archive_dir):
+                # archive/objects/ 中是快照存储的压缩对象，不必扫描
+                dirs[:] = [d for d in dirs if not (root == self.archive_dir and d == OBJECTS_DIR)]
+                for name in files:
+                    parsed = parse_snapshot_name(name)
+                    if not parsed:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        entry = self._entry(path, parsed, describe_snapshot(path))
+                    except (OSError, ValueError) as e:
+                        log.warning(f"⚠️ 跳过无法读取的归档文件: {path} - {e}")
+                        continue
+                    entries[parsed["kind"]].append(entry)
+        for kind in KINDS:
+            entries[kind].sort(key=lambda entry: (entry["timestamp"], entry["path"]))
+        self._entries = entries
+        if os.path.isdir(self.archive_dir):
+            self.save()
+            log.info(f"🗂️ 归档清单已重建: {self.path}（{sum(len(v) for v in entries.values())} 份快照）")
+        return entries
+
+    def _entry(self, path: str, parsed: Dict[str, str], info: Dict[str, Any]) -> Dict[str, Any]:
+        # 路径相对于归档目录保存，仓库整体移动后清单依然有效
+        relative = os.path.relpath(path, self.archive_dir).replace(os.sep, '/')
+        return {"path": relative, "timestamp": parsed["timestamp"], "kind": parsed["kind"], **info}
+
+    def save(self):
+        """原子写入清单"""
+        if not os.path.exists(self.archive_dir):
+            os.makedirs(self.archive_dir)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "updated_at": datetime.now().isoformat(),
+            "snapshots": self.entries,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, path: str, content: Optional[bytes] = None, countries: Optional[int] = None) -> Dict[str, Any]:
+        """登记一份刚写入的归档快照并保存清单；同一路径重复登记时更新原条目"""
+        parsed = parse_snapshot_name(path)
+        if not parsed:
+            raise ValueError(f"不是归档快照文件名: {path}")
+        entry = self._entry(path, parsed, describe_snapshot(path, content, countries))
+        items = self.entries[parsed["kind"]]
+        items[:] = [item for item in items if item["path"] != entry["path"]]
+        key = (entry["timestamp"], entry["path"])
+        if items and (items[-1]["timestamp"], items[-1]["path"]) > key:
+            # 补录旧快照：按时间戳插入到对应位置（新快照直接追加在末尾）
+            items.insert(bisect_right([(item["timestamp"], item["path"]) for item in items], key), entry)
+        else:
+            items.append(entry)
+        self.save()
+        return entry
+
+    def previous(self, kind: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """往前第 offset 份快照（0 为最新）；不存在时返回 None"""
+        items = self.entries.get(kind, [])
+        if offset < 0 or offset >= len(items):
+            return None
+        return items[-1 - offset]
+
+    def latest(self, kind: str) -> Optional[Dict[str, Any]]:
+        return self.previous(kind, 0)
+
+    def resolve(self, entry: Dict[str, Any]) -> str:
+        """清单条目 -> 文件路径"""
+        return os.path.join(self.archive_dir, *entry["path"].split('/'))
+
+    def find(self, kind: str, offset: int = 0) -> Optional[str]:
+        """
+        往前第 offset 份快照的文件路径
+        文件已被删除（清单过期）时重建一次清单再查
+        """
+        entry = self.previous(kind, offset)
+        if entry is not None and not os.path.exists(self.resolve(entry)):
+            log.warning(f"⚠️ 归档清单中的文件不存在，重新扫描: {entry['path']}")
+            self.rebuild()
+            entry = self.previous(kind, offset)
+        return self.resolve(entry) if entry is not None else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """归档清单命令行入口（python max_archive.py / python max_cli.py manifest）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max 归档清单（archive/manifest.json）")
+    parser.add_argument("action", choices=["show", "rebuild"], nargs="?", default="show")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="归档目录")
+    args = parser.parse_args(argv)
+
+    manifest = ArchiveManifest(args.archive_dir)
+    if args.action == "rebuild":
+        manifest.rebuild()
+    for kind in KINDS:
+        items = manifest.entries[kind]
+        latest = items[-1] if items else None
+        print(f"{kind}: {len(items)} 份快照" + (f"，最新 {latest['path']}（{latest['countries']} 个国家）" if latest else ""))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max CHANGELOG 回填
+按归档清单取一段时间内的全部转换结果（cny_sorted），并行计算每两份相邻快照之间的变化，
+重写 CHANGELOG 结构化存储（changelog_data/），再渲染 CHANGELOG.md 和 changelog_archive/changelog_YYYY-QN.md：
+- 相邻快照按时间顺序切成若干连续片段，每个进程处理一段：片段内每份快照只读取和解析一次，
+  片段之间只多读一份边界快照
+- 条目时间取较新一份快照的归档时间戳，条目内容与检测器写入的相同
+- 当前季度的条目渲染到 CHANGELOG.md，更早的季度各渲染一个季度归档文件（最新的条目在前）
+- 指定 --since/--until 时只替换该时间范围内的条目，范围外的现有条目原样保留；
+  范围内第一份快照会与它的前一份快照对比，因此范围起点当次的变化同样会被记录
+
+用法:
+  python max_backfill.py                                   # 用全部归档快照重建 CHANGELOG
+  python max_backfill.py --since 20260101 --until 20260331 # 只修复 2026 年第一季度的记录
+  python max_backfill.py --output-dir /tmp/changelog       # 写到其他目录，便于与现有文件对比
+"""
+
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from max_changelog_store import CHANGELOG_ARCHIVE_DIR, CHANGELOG_FILE, ChangelogStore
+from max_logger import get_logger
+
+log = get_logger("backfill")
+
+# 每对相邻快照的变化事件；任一份快照无法读取时为 None
+Changes = Optional[List[Dict[str, Any]]]
+
+
+def normalize_bound(text: str) -> str:
+    """时间范围参数（2026-01-01、20260101、20260101_120000 等）-> 纯数字前缀"""
+    digits = re.sub(r'\D', '', text or '')
+    if len(digits) not in (4, 6, 8, 10, 12, 14):
+        raise ValueError(f"无法识别的时间: {text}")
+    return digits
+
+
+def in_range(moment: str, since: str = '', until: str = '') -> bool:
+    """moment 为时间戳或条目时间；since/until 为 normalize_bound 的结果，按相同精度比较"""
+    digits = re.sub(r'\D', '', moment)
+    return (not since or digits[:len(since)] >= since) and (not until or digits[:len(until)] <= until)
+
+
+def snapshot_date(timestamp: str) -> str:
+    """归档时间戳 YYYYMMDD_HHMMSS -> 条目时间 YYYY-MM-DD HH:MM:SS"""
+    return datetime.strptime(timestamp, '%Y%m%d_%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+
+
+def select_snapshots(archive_dir: str, since: str = '', until: str = '') -> List[Dict[str, str]]:
+    """
+    范围内的转换结果（按时间升序），再加上范围起点之前的一份快照作为第一对的旧数据
+    返回 [{"path", "timestamp"}]
+    """
+    from max_archive import ArchiveManifest
+
+    manifest = ArchiveManifest(archive_dir)
+    items = manifest.entries["cny_sorted"]
+    selected = [i for i, entry in enumerate(items) if in_range(entry["timestamp"], since, until)]
+    if not selected:
+        return []
+    first = max(0, selected[0] - 1)
+    return [{"path": manifest.resolve(entry), "timestamp": entry["timestamp"]}
+            for entry in items[first:selected[-1] + 1]]
+
+
+def diff_chain(paths: List[str]) -> List[Changes]:
+    """
+    处理一段相邻快照（在工作进程中执行）：每份快照只读取一次，与前一份对比
+    返回每对相邻快照的变化事件；任一份无法读取时该对为 None
+    """
+    from max_diff import diff_snapshots
+    from max_price_change_detector import MaxPriceChangeDetector
+
+    detector = MaxPriceChangeDetector()
+    results: List[Changes] = []
+    previous = detector.load_price_data(paths[0])
+    for path in paths[1:]:
+        current = detector.load_price_data(path)
+        results.append(diff_snapshots(previous, current) if previous and current else None)
+        previous = current
+    return results
+
+
+def split_chain(count: int, parts: int) -> List[Tuple[int, int]]:
+    """把 count 份快照切成 parts 段 [start, end]（含两端），相邻两段共用边界快照"""
+    pairs = count - 1
+    parts = max(1, min(parts, pairs))
+    bounds = [round(pairs * k / parts) for k in range(parts + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(parts) if bounds[k + 1] > bounds[k]]
+
+
+def diff_range(snapshots: List[Dict[str, str]], workers: Optional[int] = None) -> List[Changes]:
+    """并行计算全部相邻快照对的变化，结果与快照对一一对应（按时间升序）"""
+    if len(snapshots) < 2:
+        return []
+    paths = [s["path"] for s in snapshots]
+    workers = workers or os.cpu_count() or 1
+    segments = [paths[start:end + 1] for start, end in split_chain(len(snapshots), workers)]
+    if len(segments) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(segments)) as pool:
+            chunks = list(pool.map(diff_chain, segments))
+    else:
+        chunks = [diff_chain(segment) for segment in segments]
+    return [result for chunk in chunks for result in chunk]
+
+
+def backfill(archive_dir: str = "archive", changelog_file: str = CHANGELOG_FILE,
+             changelog_archive_dir: str = CHANGELOG_ARCHIVE_DIR, since: str = '', until: str = '',
+             workers: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """回填入口：重写 CHANGELOG 存储并渲染，返回各季度条目数；范围内没有快照时返回 None，不改动任何文件"""
+    start = time.perf_counter()
+    snapshots = select_snapshots(archive_dir, since, until)
+    if len(snapshots) < 2:
+        log.error(f"❌ {archive_dir} 中可对比的快照不足两份（范围: {since or '最早'} ~ {until or '最新'}）")
+        return None
+    log.info(f"🔄 对比 {len(snapshots) - 1} 对相邻快照（{snapshots[0]['timestamp']} ~ {snapshots[-1]['timestamp']}）")
+
+    results = diff_range(snapshots, workers)
+    records: List[Dict[str, Any]] = []
+    for snapshot, changes in zip(snapshots[1:], results):
+        if changes is None:
+            log.warning(f"⚠️ 快照无法读取，跳过: {snapshot['path']}")
+            continue
+        records.append({"date": snapshot_date(snapshot["timestamp"]), "changes": changes})
+    elapsed = time.perf_counter() - start
+    log.info(f"✅ 生成 {len(records)} 个条目，共 {sum(len(r['changes']) for r in records)} 项变化（{elapsed:.2f}s）")
+
+    store = ChangelogStore(changelog_file=changelog_file, archive_dir=changelog_archive_dir)
+    if since or until:
+        kept = [record for record in store.all_entries() if not in_range(record["date"], since, until)]
+        log.info(f"📝 保留范围外的现有条目 {len(kept)} 个")
+        # 同一时间的条目只保留一条，新生成的优先
+        dates = {record["date"] for record in records}
+        records += [record for record in kept if record["date"] not in dates]
+    store.replace(records)
+    store.render(force=True)
+    counts = {quarter: meta["entries"] for quarter, meta in store.quarters.items()}
+    for quarter, count in sorted(counts.items(), reverse=True):
+        log.info(f"  {quarter}: {count} 个条目")
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """回填命令行入口（python max_backfill.py / python max_cli.py backfill）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max CHANGELOG 回填：由归档快照重新生成全部变化记录")
+    parser.add_argument("--archive-dir", default="archive", help="快照归档目录")
+    parser.add_argument("--since", default="", help="起始时间（含），如 2026-01-01 或 20260101_120000")
+    parser.add_argument("--until", default="", help="结束时间（含）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认 CPU 数）")
+    parser.add_argument("--output-dir", default=".", help="CHANGELOG.md 和 changelog_archive/ 的输出目录")
+    args = parser.parse_args(argv)
+
+    try:
+        since, until = normalize_bound(args.since) if args.since else '', normalize_bound(args.until) if args.until else ''
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output_dir != ".":
+        os.makedirs(args.output_dir, exist_ok=True)
+    counts = backfill(args.archive_dir, os.path.join(args.output_dir, CHANGELOG_FILE),
+                      os.path.join(args.output_dir, CHANGELOG_ARCHIVE_DIR), since, until, args.workers)
+    return 0 if counts is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 性能基准测试
+对热路径和日志等基础设施做微基准测试，结果可保存为 JSON 便于在两个提交之间对比
+
+用法:
+  python max_benchmark.py logging                  # 各日志级别的调用开销
+  python max_benchmark.py hotpaths --save          # 解析/标准化热路径，结果存到 benchmarks/results/<commit>.json
+  python max_benchmark.py leaderboard              # 排行榜生成：原实现与单次遍历引擎对比（100000 套餐）
+  python max_benchmark.py diff                     # 价格变化对比引擎在 1000 / 10000 / 100000 套餐上的每套餐耗时
+  python max_benchmark.py backfill                 # CHANGELOG 回填：相邻快照对比的单进程与多进程耗时
+  python max_benchmark.py history                  # 价格历史库：按国家 / 套餐查询历史的耗时
+  python max_benchmark.py archive-links            # CHANGELOG 归档链接表：无索引与命中归档索引的耗时
+  python max_benchmark.py startup                  # 各脚本启动（导入）耗时与参考数据加载耗时
+  python max_benchmark.py cli-startup              # max_cli 各子命令的导入耗时，超出启动预算时返回 1
+  python max_benchmark.py compare base.json head.json --threshold 10
+  python max_benchmark.py scale --scales 96x450,1000x10000  # 合成数据规模基准（耗时 + 峰值内存）
+  python max_benchmark.py profile-overhead         # --profile 各模式的开销
+  python max_benchmark.py snapshot-store           # 归档快照：完整 JSON、快照存储与差量存储的占用空间和还原耗时
+  python max_benchmark.py pipeline                 # 进程内流水线与逐步执行（独立进程 + cp 归档）的耗时对比
+  python max_benchmark.py build-corpus             # 由当前价格快照重新生成 benchmarks/corpus/
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import max_logger
+
+BENCHMARK_DIR = "benchmarks"
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpus")
+PAGES_DIR = os.path.join(CORPUS_DIR, "pages")
+PRICE_STRINGS_FILE = os.path.join(CORPUS_DIR, "price_strings.json")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+DEFAULT_THRESHOLD = 10.0  # 回归阈值（百分比）
+
+# 已注册的基准测试套件：名称 -> 函数（返回 {case_name: stats}）
+SUITES: Dict[str, Callable[[argparse.Namespace], Dict[str, Dict[str, float]]]] = {}
+
+
+def suite(name: str):
+    """注册基准测试套件"""
+    def decorator(func):
+        SUITES[name] = func
+        return func
+    return decorator
+
+
+def measure(func: Callable[[], Any], number: int = 1000, repeat: int = 5, items: int = 1) -> Dict[str, float]:
+    """
+    重复执行 func，返回每个单位的耗时统计（纳秒）
+    func 一次处理整个语料时，items 为语料条数，结果折算为每条的耗时
+    """
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter_ns() - start) / (number * items))
+    return {
+        "min_ns": round(min(samples), 1),
+        "median_ns": round(statistics.median(samples), 1),
+        "max_ns": round(max(samples), 1),
+        "number": number,
+        "repeat": repeat,
+        "items": items,
+    }
+
+
+def print_table(title: str, results: Dict[str, Dict[str, float]]):
+    """以表格形式输出结果"""
+    print(f"\n📊 {title}")
+    width = max((len(name) for name in results), default=10) + 2
+    print(f"{'用例'.ljust(width)} {'min(ns)':>12} {'median(ns)':>12} {'max(ns)':>12}")
+    for name, stats in results.items():
+        print(f"{name.ljust(width)} {stats['min_ns']:>12.1f} {stats['median_ns']:>12.1f} {stats['max_ns']:>12.1f}")
+
+
+@suite("logging")
+def bench_logging(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """日志开销：禁用级别、控制台输出、JSONL 缓冲输出，与直接 print 对比"""
+    number = args.number or 20000
+    log = max_logger.get_logger("benchmark")
+    results: Dict[str, Dict[str, float]] = {}
+    plan_name, normalized = "Estándar", "Standard"
+
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    tmpdir = tempfile.mkdtemp(prefix="max_bench_")
+    saved_level = max_logger.get_level()
+    try:
+        results["noop_call"] = measure(lambda: None, number)
+        results["print_fstring"] = measure(
+            lambda: print(f"    📋 套餐名映射: '{plan_name}' -> '{normalized}'", file=devnull), number)
+
+        max_logger.configure(level=max_logger.INFO, console=True, stream=devnull, jsonl_path="")
+        results["debug_disabled"] = measure(
+            lambda: log.debug("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized), number)
+
+        max_logger.configure(level=max_logger.WARNING)
+        results["info_quiet"] = measure(
+            lambda: log.info("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized), number)
+
+        max_logger.configure(level=max_logger.DEBUG)
+        results["debug_console"] = measure(
+            lambda: log.debug("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized), number)
+
+        max_logger.configure(jsonl_path=os.path.join(tmpdir, "events.jsonl"))
+        results["debug_console_jsonl"] = measure(
+            lambda: log.debug("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized,
+                              country="AR", plan=normalized), number)
+
+        max_logger.configure(console=False)
+        results["debug_jsonl_only"] = measure(
+            lambda: log.debug("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized,
+                              country="AR", plan=normalized), number)
+    finally:
+        max_logger.configure(level=saved_level, console=True, stream=None, jsonl_path="")
+        devnull.close()
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+    return results
+
+
+# 语料页面使用的国家：覆盖 parse_max_prices 的四种页面结构和主要价格格式
+CORPUS_COUNTRIES = [
+    "PK", "AR", "BR", "CO", "MX", "CL",   # Next.js JSON（方法0）
+    "US", "GB", "DE", "CZ", "HU", "SE", "CH", "ES",  # data-plan-group（方法1）
+    "TR", "PL",                            # 基于 class 的区域（方法2）
+    "HK", "TW", "SG", "AU",                # 备用解析（方法3）
+]
+CLASS_BASED_COUNTRIES = {"TR", "PL"}
+
+# 页面的公共骨架：导航、页脚和无关脚本，让解析器处理接近真实页面规模的 DOM
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+<meta charset="utf-8">
+<title>HBO Max | {country}</title>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+</head>
+<body>
+<header class="site-header"><nav><ul>
+{nav}
+</ul></nav></header>
+<main>
+<h1>HBO Max</h1>
+{body}
+</main>
+<footer class="site-footer"><ul>
+{footer}
+</ul></footer>
+{scripts}
+</body>
+</html>
+"""
+_PLAN_GROUP_KEYS = {"monthly": "Monthly", "yearly": "Yearly", "bundle": "Bundle"}
+
+
+def _page_chrome() -> Dict[str, str]:
+    nav = "\n".join(f'<li><a class="nav-link" href="/browse/{i}">Browse {i}</a></li>' for i in range(40))
+    footer = "\n".join(f'<li><a href="/help/{i}">Help article {i}</a></li>' for i in range(30))
+    return {"nav": nav, "footer": footer}
+
+
+def _nextjs_body(country: str, plans: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """方法0 页面：套餐放在 __NEXT_DATA__ JSON 中，价格串形如 'ARS 7.390,00/mes'"""
+    items: Dict[str, List[Dict[str, Any]]] = {}
+    for plan in plans:
+        code, _, rest = plan["price"].partition(" ")
+        amount, _, period = rest.partition("/")
+        price = {"amount": {"plainText": amount}, "currencyCode": code}
+        if period:
+            price["period"] = {"plainText": period}
+        items.setdefault(_PLAN_GROUP_KEYS.get(plan["plan_group"], "Monthly"), []).append({
+            "content": {"planCard": {"productName": {"plainText": plan["original_name"]}, "price": price}}
+        })
+    data = {"props": {"pageProps": {"mappedData": {"planPicker": {"items": items}}}}}
+    script = ('<script id="__NEXT_DATA__" type="application/json">'
+              + json.dumps(data, ensure_ascii=False) + '</script>')
+    body = '<div id="__next"><div class="plan-picker-placeholder"></div></div>'
+    return body, script
+
+
+def _card(plan: Dict[str, Any]) -> str:
+    return ('<div class="max-plan-picker-group__card">'
+            f'<h3>{plan["original_name"]}</h3><h4>{plan["price"]}</h4>'
+            '<ul><li>Feature A</li><li>Feature B</li></ul></div>')
+
+
+def _sections_body(plans: List[Dict[str, Any]], class_based: bool) -> str:
+    """方法1/方法2 页面：按 plan_group 分区的套餐卡片"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for plan in plans:
+        groups.setdefault(plan["plan_group"], []).append(plan)
+    sections = []
+    for group, group_plans in groups.items():
+        cards = "\n".join(_card(plan) for plan in group_plans)
+        if class_based:
+            sections.append(f'<section class="max-plan-picker-group max-plan-picker-group-{group}">\n{cards}\n</section>')
+        else:
+            sections.append(f'<section data-plan-group="{group}">\n{cards}\n</section>')
+    return "\n".join(sections)
+
+
+def _fallback_body(plans: List[Dict[str, Any]]) -> str:
+    """方法3 页面：没有标准结构，只有带 price class 的元素"""
+    return "\n".join(f'<div class="plan-tile"><div class="price">${plan["price"].strip()}</div></div>'
+                     for plan in plans)
+
+
+def build_corpus_page(country: str, plans: List[Dict[str, Any]]) -> str:
+    """按该国快照中的价格格式还原对应结构的页面"""
+    script = ""
+    if plans and all(plan["original_name"] == "HBO Max Plan" for plan in plans):
+        body = _fallback_body(plans)
+    elif plans and all(re.match(r"^[A-Z]{3} ", plan["price"]) for plan in plans):
+        body, script = _nextjs_body(country, plans)
+    else:
+        body = _sections_body(plans, class_based=country in CLASS_BASED_COUNTRIES)
+    filler = "\n".join(f'<script>window.__chunk{i} = "{"x" * 200}";</script>' for i in range(10))
+    return _PAGE_TEMPLATE.format(lang=country.lower(), country=country, body=body,
+                                 scripts=script + "\n" + filler, **_page_chrome())
+
+
+def cmd_build_corpus(args: argparse.Namespace) -> int:
+    """由价格快照生成语料：全部价格字符串 + 选定国家的页面"""
+    with open(args.snapshot, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    price_strings = []
+    for country, data in sorted(snapshot.items()):
+        for plan in data.get("plans", []):
+            price_strings.append({
+                "country": country,
+                "price": plan["price"],
+                "original_name": plan["original_name"],
+                "price_number": plan["price_number"],
+            })
+
+    if not os.path.exists(PAGES_DIR):
+        os.makedirs(PAGES_DIR)
+    with open(PRICE_STRINGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(price_strings, f, ensure_ascii=False, indent=1)
+
+    written = 0
+    for country in CORPUS_COUNTRIES:
+        plans = snapshot.get(country, {}).get("plans", [])
+        if not plans:
+            print(f"⚠️ 快照中没有 {country} 的套餐，跳过")
+            continue
+        with open(os.path.join(PAGES_DIR, f"{country.lower()}.html"), 'w', encoding='utf-8') as f:
+            f.write(build_corpus_page(country, plans))
+        written += 1
+
+    print(f"✅ 写入 {len(price_strings)} 条价格字符串和 {written} 个页面到 {CORPUS_DIR}")
+    return 0
+
+
+def load_corpus() -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """读取语料：价格字符串列表和 {国家: 页面 HTML}"""
+    if not os.path.exists(PRICE_STRINGS_FILE):
+        raise SystemExit(f"❌ 语料不存在: {PRICE_STRINGS_FILE}，请先运行 build-corpus")
+    with open(PRICE_STRINGS_FILE, 'r', encoding='utf-8') as f:
+        price_strings = json.load(f)
+    pages = {}
+    for filename in sorted(os.listdir(PAGES_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(PAGES_DIR, filename), 'r', encoding='utf-8') as f:
+                pages[filename[:-5].upper()] = f.read()
+    return price_strings, pages
+
+
+def run_sync(coro):
+    """同步驱动不含真实 await 的协程，避免事件循环开销计入结果"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("协程意外挂起")
+
+
+@suite("hotpaths")
+def bench_hotpaths(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """解析/标准化热路径：在语料上逐条运行，结果为每条（每页）的耗时"""
+    import max_scraper
+    from max_metrics import SCRAPER_METRICS
+
+    price_strings, pages = load_corpus()
+    prices = [(item["price"], item["country"], item["price_number"]) for item in price_strings]
+    names = [item["original_name"] for item in price_strings]
+
+    families: Dict[str, List[Tuple[str, str]]] = {"nextjs": [], "plan_group": [], "class": [], "fallback": []}
+    for country, html in pages.items():
+        if 'type="application/json"' in html:
+            families["nextjs"].append((country, html))
+        elif 'data-plan-group=' in html:
+            families["plan_group"].append((country, html))
+        elif 'max-plan-picker-group-' in html:
+            families["class"].append((country, html))
+        else:
+            families["fallback"].append((country, html))
+
+    number = args.number or 0
+    results: Dict[str, Dict[str, float]] = {}
+    saved_level = max_logger.get_level()
+    saved_metrics = SCRAPER_METRICS.enabled
+    # 基准测试只测解析本身：关闭日志和 span 记录
+    max_logger.configure(level=max_logger.SILENT)
+    SCRAPER_METRICS.enabled = False
+    try:
+        def over_prices(func):
+            return lambda: [func(price, country, number_) for price, country, number_ in prices]
+
+        results["extract_price_number"] = measure(
+            lambda: [max_scraper.extract_price_number(price) for price, _, _ in prices],
+            number or 20, items=len(prices))
+        results["detect_currency"] = measure(
+            over_prices(lambda price, country, _: max_scraper.detect_currency(price, country)),
+            number or 20, items=len(prices))
+        results["detect_billing_cycle_globally"] = measure(
+            over_prices(lambda price, country, value: max_scraper.detect_billing_cycle_globally(price, value, country)),
+            number or 20, items=len(prices))
+        results["normalize_plan_name"] = measure(
+            lambda: [max_scraper.normalize_plan_name(name) for name in names],
+            number or 20, items=len(names))
+
+        nextjs_pages = families["nextjs"]
+        if nextjs_pages:
+            results["extract_plans_from_nextjs_json"] = measure(
+                lambda: [max_scraper._extract_plans_from_nextjs_json(html, country) for country, html in nextjs_pages],
+                number or 20, items=len(nextjs_pages))
+
+        for family, family_pages in families.items():
+            if not family_pages:
+                continue
+            results[f"parse_max_prices[{family}]"] = measure(
+                lambda family_pages=family_pages: [run_sync(max_scraper.parse_max_prices(html, country))
+                                                   for country, html in family_pages],
+                number or 3, repeat=5, items=len(family_pages))
+    finally:
+        max_logger.configure(level=saved_level)
+        SCRAPER_METRICS.enabled = saved_metrics
+
+    return results
+
+
+LEADERBOARD_LEGACY_CALLS = [("all", None), ("mobile", None), ("standard", None), ("ultimate", None),
+                            ("monthly", None), ("yearly", None), ("ultimate", "yearly")]
+
+
+def converted_plans(countries: int, plans: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """合成快照经转换器处理后的套餐列表（与 main 中的 all_plans 相同）"""
+    import max_rate_converter
+    from max_conversion import ConversionEngine
+    from max_synthetic import generate_snapshot, snapshot_rates
+
+    snapshot = generate_snapshot(countries, plans, seed)
+    rates = snapshot_rates()
+    engine = ConversionEngine(rates)
+    converted = max_rate_converter.convert_all_plans(snapshot, engine)
+    all_plans: List[Dict[str, Any]] = []
+    for country_code, country_data in snapshot.items():
+        all_plans.extend(max_rate_converter.process_country_data(country_data, rates, converted[country_code]))
+    return all_plans
+
+
+@suite("leaderboard")
+def bench_leaderboard(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """排行榜：原先 7 次过滤 + 全排序 与单次遍历定长堆引擎对比（10000 国家 / 100000 套餐）"""
+    import max_rate_converter
+    from max_leaderboard import LeaderboardEngine
+
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    try:
+        all_plans = converted_plans(10000, 100000)
+    finally:
+        max_logger.configure(level=saved_level)
+
+    def legacy():
+        results = {}
+        for plan_type, cycle in LEADERBOARD_LEGACY_CALLS:
+            plans = all_plans
+            if cycle == "yearly":
+                plans = [p for p in all_plans if p.get('plan_group') == 'yearly' or '每年' in p.get('billing_cycle', '')]
+            results[(plan_type, cycle)] = max_rate_converter.generate_top_cheapest(plans, plan_type, 10)
+        return results
+
+    def engine():
+        return LeaderboardEngine().add_all(all_plans).results()
+
+    # 两种实现的结果（含同价时的排名顺序）必须一致
+    if list(legacy().values()) != list(engine().values()):
+        raise RuntimeError("排行榜引擎结果与原实现不一致")
+
+    number = args.number or 1
+    return {
+        "legacy_filter_sort_x7": measure(legacy, number, repeat=5, items=len(all_plans)),
+        "engine_single_pass": measure(engine, number, repeat=5, items=len(all_plans)),
+    }
+
+
+DIFF_SCALES = [(100, 1000), (1000, 10000), (10000, 100000)]
+
+
+@suite("diff")
+def bench_diff(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """价格变化对比：归并对比引擎在 1000 / 10000 / 100000 套餐上的每套餐耗时（线性时应基本持平）"""
+    import max_rate_converter
+    import max_synthetic
+    from max_diff import diff_snapshots
+
+    results = {}
+    for countries, plans in DIFF_SCALES:
+        saved_level = max_logger.get_level()
+        max_logger.configure(level=max_logger.SILENT)
+        try:
+            snapshot = max_synthetic.generate_snapshot(countries, plans)
+            converted, _ = max_rate_converter.convert(snapshot, max_synthetic.snapshot_rates(), incremental=False)
+        finally:
+            max_logger.configure(level=saved_level)
+        previous = max_synthetic.perturb_converted(converted, cycle_ratio=0.01)
+        if diff_snapshots(converted, converted):
+            raise RuntimeError("相同快照的对比结果不为空")
+        number = args.number or max(1, 100000 // plans)
+        results[f"diff_snapshots({plans})"] = measure(lambda: diff_snapshots(previous, converted), number,
+                                                      repeat=5, items=plans)
+    return results
+
+
+BACKFILL_SNAPSHOTS = 24
+BACKFILL_SCALE = (200, 2000)
+
+
+@suite("backfill")
+def bench_backfill(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """CHANGELOG 回填：24 份合成快照（每份 2000 套餐）的相邻对比，单进程与每核一个进程的每对耗时"""
+    import shutil
+    import max_rate_converter
+    import max_synthetic
+    from max_backfill import diff_range
+
+    countries, plans = BACKFILL_SCALE
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    workdir = tempfile.mkdtemp(prefix="max_backfill_")
+    try:
+        snapshot = max_synthetic.generate_snapshot(countries, plans)
+        data, _ = max_rate_converter.convert(snapshot, max_synthetic.snapshot_rates(), incremental=False)
+        snapshots = []
+        for index in range(BACKFILL_SNAPSHOTS):
+            timestamp = f"2000{index // 28 + 1:02d}{index % 28 + 1:02d}_000000"
+            path = os.path.join(workdir, f"max_prices_cny_sorted_{timestamp}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            snapshots.append({"path": path, "timestamp": timestamp})
+            data = max_synthetic.perturb_converted(data, seed=index, cycle_ratio=0.01)
+        pairs = len(snapshots) - 1
+        results = {}
+        for workers in sorted({1, os.cpu_count() or 1}):
+            results[f"diff_range(workers={workers})"] = measure(lambda: diff_range(snapshots, workers),
+                                                                 args.number or 1, repeat=3, items=pairs)
+    finally:
+        max_logger.configure(level=saved_level)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+HISTORY_SNAPSHOTS = 36
+HISTORY_SCALE = (200, 2000)
+
+
+@suite("history")
+def bench_history(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """价格历史库：36 份合成快照（每份 2000 套餐）导入内存库后，单个国家 / 单个套餐历史查询的耗时"""
+    import max_rate_converter
+    import max_synthetic
+    from max_history_store import HistoryStore
+
+    countries, plans = HISTORY_SCALE
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    try:
+        snapshot = max_synthetic.generate_snapshot(countries, plans)
+        data, _ = max_rate_converter.convert(snapshot, max_synthetic.snapshot_rates(), incremental=False)
+    finally:
+        max_logger.configure(level=saved_level)
+    store = HistoryStore(":memory:")
+    try:
+        with store.conn:
+            for index in range(HISTORY_SNAPSHOTS):
+                timestamp = f"{2000 + index // 12}{index % 12 + 1:02d}01_000000"
+                store.add_snapshot({"path": f"{timestamp}.json", "timestamp": timestamp, "sha256": ""}, data)
+                data = max_synthetic.perturb_converted(data, seed=index, remove_ratio=0.0)
+        country = max_synthetic.synthetic_country_code(0)
+        plan = store.history(country=country)[0]["plan"]
+        number = args.number or 100
+        return {
+            "history(country, plan)": measure(lambda: store.history(country=country, plan=plan), number, repeat=5),
+            "history(country)": measure(lambda: store.history(country=country), number, repeat=5),
+        }
+    finally:
+        store.close()
+
+
+ARCHIVE_LINK_QUARTERS = 40
+ARCHIVE_LINK_ENTRIES = 30
+
+
+@suite("archive-links")
+def bench_archive_links(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """CHANGELOG 归档链接表：40 个季度归档文件（每个 30 个条目），无索引逐个读取与命中索引的耗时"""
+    import shutil
+    from max_changelog_archiver import MaxChangelogArchiver
+
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    workdir = tempfile.mkdtemp(prefix="max_archive_links_")
+    try:
+        writer = MaxChangelogArchiver(os.path.join(workdir, "CHANGELOG.md"), workdir)
+        entry = "\n".join(f"- **Country {k} - Ultimate** (每月)\n  - 原价: ¥49.78 | 现价: ¥43.89" for k in range(20))
+        for index in range(ARCHIVE_LINK_QUARTERS):
+            year, quarter = 2000 + index // 4, index % 4 + 1
+            month = (quarter - 1) * 3 + 1
+            entries = [f"## {year}-{month + day // 28:02d}-{day % 28 + 1:02d} 00:00:00\n\n{entry}"
+                       for day in range(ARCHIVE_LINK_ENTRIES)]
+            writer.create_quarterly_archive(entries, f"{year}-Q{quarter}")
+
+        def cold():
+            os.remove(os.path.join(workdir, "index.json"))
+            MaxChangelogArchiver(os.path.join(workdir, "CHANGELOG.md"), workdir).get_existing_archives()
+
+        number = args.number or 20
+        return {
+            "get_existing_archives(无索引)": measure(cold, number, repeat=5),
+            "get_existing_archives(索引)": measure(
+                lambda: MaxChangelogArchiver(os.path.join(workdir, "CHANGELOG.md"), workdir).get_existing_archives(),
+                number, repeat=5),
+        }
+    finally:
+        max_logger.configure(level=saved_level)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+STARTUP_MODULES = ["max_scraper", "max_rate_converter", "max_price_change_detector", "max_changelog_archiver"]
+
+
+@suite("startup")
+def bench_startup(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """启动耗时：各脚本在新进程中的导入耗时，参考数据从编译缓存/源表加载的耗时"""
+    def run_python(code: str, env: Optional[Dict[str, str]] = None):
+        return lambda: subprocess.run([sys.executable, "-c", code], check=True, env=env)
+
+    number = args.number or 1
+    results: Dict[str, Dict[str, float]] = {"python_baseline": measure(run_python("pass"), number, repeat=7)}
+    for module in STARTUP_MODULES:
+        results[f"import[{module}]"] = measure(run_python(f"import {module}"), number, repeat=7)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = os.path.join(workdir, "reference.pickle")
+        env = dict(os.environ, MAX_REFERENCE_CACHE=cache)
+        load = "import max_reference; max_reference.load()"
+        subprocess.run([sys.executable, "-c", load], check=True, env=env)
+        results["reference_load[compiled]"] = measure(run_python(load, env), number, repeat=7)
+
+        def from_source():
+            os.remove(cache)
+            subprocess.run([sys.executable, "-c", load], check=True, env=env)
+        results["reference_load[source]"] = measure(from_source, number, repeat=7)
+
+    # 进程内查找：加载后每次调用的耗时
+    import max_reference
+    max_reference.load()
+    names = list(max_reference.country_names().items())
+    results["chinese_name"] = measure(
+        lambda: [max_reference.chinese_name(name, code) for code, name in names],
+        args.number or 200, items=len(names))
+    return results
+
+
+IMPORTTIME_DIR = os.path.join(BENCHMARK_DIR, "importtime")
+CLI_STARTUP_REPEAT = 5
+
+
+def importtime_blocks(argv: List[str]) -> List[Tuple[str, int, List[str]]]:
+    """
+    以 -X importtime 运行 argv，按顶层导入分组：[(模块名, 累计耗时 us, 该模块及其子模块的行)]
+    importtime 先输出子模块，再输出父模块，顶层模块的行没有缩进
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime"] + argv,
+                            capture_output=True, text=True, encoding='utf-8')
+    blocks: List[Tuple[str, int, List[str]]] = []
+    pending: List[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        pending.append(line)
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            blocks.append((name.strip(), int(cumulative), pending))
+            pending = []
+    return blocks
+
+
+def cli_startup_profile(command: str, baseline: set) -> Tuple[float, List[Tuple[str, int, List[str]]]]:
+    """子命令 --help 的导入耗时（毫秒，不含解释器自身启动时的导入）及对应的 importtime 分组"""
+    blocks = [block for block in importtime_blocks(["max_cli.py", command, "--help"]) if block[0] not in baseline]
+    return sum(cumulative for _, cumulative, _ in blocks) / 1000, blocks
+
+
+def write_import_graph(command: str, blocks: List[Tuple[str, int, List[str]]]):
+    """
+    把子命令的导入图写入 IMPORTTIME_DIR/<子命令>.txt：只保留模块名和嵌套缩进，不含耗时，
+    因此只有导入图变化时文件才会变化（耗时由 cli-startup 与预算对比，不提交）
+    """
+    os.makedirs(IMPORTTIME_DIR, exist_ok=True)
+    with open(os.path.join(IMPORTTIME_DIR, f"{command}.txt"), 'w', encoding='utf-8') as f:
+        f.write(f"# python -X importtime max_cli.py {command} --help 的导入图（不含解释器自身的导入）\n")
+        f.write("# 子模块在前、父模块在后，缩进表示嵌套；耗时见 python max_benchmark.py cli-startup\n")
+        for _, _, lines in blocks:
+            for line in lines:
+                f.write(line.split("|", 2)[2][1:] + "\n")
+
+
+def cmd_cli_startup(args: argparse.Namespace) -> int:
+    """各子命令的启动耗时与 max_cli.STARTUP_BUDGET_MS 对比，超出预算时返回 1"""
+    from max_cli import COMMANDS, STARTUP_BUDGET_MS
+
+    baseline = {name for name, _, _ in importtime_blocks(["-c", "pass"])}
+    commands = args.commands or list(COMMANDS)
+    rows: Dict[str, Dict[str, Any]] = {}
+    over_budget = []
+    for command in commands:
+        samples = []
+        for _ in range(args.repeat):
+            total_ms, blocks = cli_startup_profile(command, baseline)
+            samples.append(total_ms)
+        heaviest = sorted(blocks, key=lambda block: block[1], reverse=True)[:3]
+        budget = STARTUP_BUDGET_MS.get(command)
+        median = statistics.median(samples)
+        rows[command] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(samples), 1),
+            "budget_ms": budget,
+            "heaviest": [f"{name} {cumulative / 1000:.1f}ms" for name, cumulative, _ in heaviest],
+        }
+        if budget is not None and median > budget:
+            over_budget.append(command)
+        if args.update_profiles:
+            write_import_graph(command, blocks)
+
+    print(f"\n📊 cli-startup（-X importtime，{args.repeat} 次中位数）")
+    print(f"{'子命令'.ljust(12)} {'导入(ms)':>10} {'预算(ms)':>10}  最重的顶层导入")
+    for command, row in rows.items():
+        status = "❌" if command in over_budget else "✅"
+        budget = f"{row['budget_ms']:.0f}" if row['budget_ms'] is not None else "-"
+        print(f"{command.ljust(12)} {row['median_ms']:>10.1f} {budget:>10}  {status} {', '.join(row['heaviest'])}")
+    if args.update_profiles:
+        print(f"\n✅ 导入图已更新: {IMPORTTIME_DIR}/")
+    if args.json_path:
+        save_results("cli-startup", rows, args.json_path)
+    if over_budget:
+        print(f"\n❌ 超出启动预算: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+# 规模基准：国家数x套餐数，从当前规模到目标规模
+DEFAULT_SCALES = "96x450,1000x10000,10000x100000"
+SCALE_STAGES = ["generate", "convert", "detect"]
+SCALE_TIMEOUT = 900  # 单个阶段的超时（秒）
+# 相邻两档之间 耗时增长倍数 与 套餐数增长倍数 的对数比，超过该值视为超线性
+SUPERLINEAR_EXPONENT = 1.3
+
+
+def parse_scales(text: str) -> List[Tuple[int, int]]:
+    scales = []
+    for item in text.split(","):
+        countries, _, plans = item.strip().lower().partition("x")
+        scales.append((int(countries), int(plans)))
+    return scales
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def cmd_scale_stage(args: argparse.Namespace) -> int:
+    """在独立子进程中执行单个阶段，最后一行输出 JSON 结果，峰值内存互不干扰"""
+    import max_synthetic
+
+    workdir = args.workdir
+    snapshot_path = os.path.join(workdir, "snapshot.json")
+    rates_path = os.path.join(workdir, "rates.json")
+    converted_path = os.path.join(workdir, "converted.json")
+    previous_path = os.path.join(workdir, "previous.json")
+    result: Dict[str, Any] = {"stage": args.stage}
+
+    if args.stage == "generate":
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        snapshot = max_synthetic.generate_snapshot(args.countries, args.plans, seed=args.seed)
+        with open(snapshot_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        elapsed = time.perf_counter() - start
+        with open(rates_path, 'w', encoding='utf-8') as f:
+            json.dump(max_synthetic.snapshot_rates(), f)
+        result["plans"] = sum(len(c["plans"]) for c in snapshot.values())
+
+    elif args.stage == "convert":
+        import max_rate_converter
+        with open(rates_path, 'r', encoding='utf-8') as f:
+            rates = json.load(f)
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        max_rate_converter.main(snapshot_path, converted_path, rates)
+        elapsed = time.perf_counter() - start
+        result["peak_rss_mb"] = peak_rss_mb()
+        # 为 detect 阶段准备"上一期"数据，不计入本阶段耗时和内存
+        with open(converted_path, 'r', encoding='utf-8') as f:
+            converted = json.load(f)
+        with open(previous_path, 'w', encoding='utf-8') as f:
+            json.dump(max_synthetic.perturb_converted(converted, seed=args.seed), f, ensure_ascii=False, indent=2)
+
+    elif args.stage == "detect":
+        from max_price_change_detector import MaxPriceChangeDetector
+        detector = MaxPriceChangeDetector()
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        old_data = detector.load_price_data(previous_path)
+        new_data = detector.load_price_data(converted_path)
+        changes = detector.compare_prices(old_data, new_data)
+        elapsed = time.perf_counter() - start
+        result["changes"] = len(changes)
+
+    else:
+        raise SystemExit(f"❌ 未知阶段: {args.stage}")
+
+    result["seconds"] = round(elapsed, 4)
+    result.setdefault("peak_rss_mb", peak_rss_mb())
+    result["baseline_rss_mb"] = baseline
+    print(json.dumps(result))
+    return 0
+
+
+def run_scale_stage(stage: str, workdir: str, countries: int, plans: int, seed: int, timeout: int) -> Dict[str, Any]:
+    cmd = [sys.executable, os.path.abspath(__file__), "scale-stage", stage, workdir,
+           "--countries", str(countries), "--plans", str(plans), "--seed", str(seed)]
+    # 子进程只保留警告，关闭 span 记录
+    env = dict(os.environ, MAX_LOG_LEVEL="warning", MAX_METRICS="0")
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, env=env,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.TimeoutExpired:
+        return {"stage": stage, "status": "timeout", "seconds": float(timeout)}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"stage": stage, "status": "error", "error": proc.stderr.strip()[-500:]}
+    result = json.loads(lines[-1])
+    result["status"] = "ok"
+    return result
+
+
+def scaling_exponents(runs: List[Dict[str, Any]]) -> None:
+    """为相邻两档计算各阶段的增长指数 log(t2/t1) / log(n2/n1)，写回 runs"""
+    import math
+    for prev, cur in zip(runs, runs[1:]):
+        ratio_n = cur["plans"] / prev["plans"] if prev["plans"] else 0
+        for stage in SCALE_STAGES:
+            a, b = prev["stages"].get(stage, {}), cur["stages"].get(stage, {})
+            if ratio_n <= 1 or a.get("status") != "ok" or b.get("status") != "ok" or a["seconds"] <= 0:
+                continue
+            exponent = math.log(b["seconds"] / a["seconds"]) / math.log(ratio_n)
+            b["exponent"] = round(exponent, 2)
+            b["superlinear"] = exponent > SUPERLINEAR_EXPONENT
+
+
+def cmd_scale(args: argparse.Namespace) -> int:
+    """规模基准：合成快照 → 汇率转换 → 价格变化检测，逐档报告耗时和峰值内存"""
+    runs: List[Dict[str, Any]] = []
+    for countries, plans in parse_scales(args.scales):
+        workdir = tempfile.mkdtemp(prefix=f"max_scale_{countries}x{plans}_")
+        run: Dict[str, Any] = {"countries": countries, "plans": plans, "stages": {}}
+        print(f"🔄 规模 {countries} 国家 / {plans} 套餐 ...")
+        try:
+            for stage in SCALE_STAGES:
+                result = run_scale_stage(stage, workdir, countries, plans, args.seed, args.timeout)
+                run["stages"][stage] = result
+                if result["status"] != "ok":
+                    print(f"  ❌ {stage}: {result['status']} {result.get('error', '')}")
+                    break
+                print(f"  ✅ {stage}: {result['seconds']:.3f}s, 峰值 {result['peak_rss_mb']} MB")
+        finally:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+        runs.append(run)
+
+    scaling_exponents(runs)
+    print(f"\n📊 规模基准（增长指数 > {SUPERLINEAR_EXPONENT} 标记为超线性）")
+    print(f"{'规模':<16} {'阶段':<10} {'耗时(s)':>10} {'峰值RSS(MB)':>12} {'增长指数':>9}")
+    superlinear = []
+    for run in runs:
+        label = f"{run['countries']}x{run['plans']}"
+        for stage, result in run["stages"].items():
+            if result.get("status") != "ok":
+                print(f"{label:<16} {stage:<10} {result.get('status'):>10}")
+                continue
+            exponent = result.get("exponent")
+            flag = ""
+            if result.get("superlinear"):
+                flag = " ⚠️"
+                superlinear.append(f"{stage}@{label}")
+            exponent_text = f"{exponent:.2f}" if exponent is not None else "-"
+            print(f"{label:<16} {stage:<10} {result['seconds']:>10.3f} {str(result['peak_rss_mb']):>12} {exponent_text:>9}{flag}")
+
+    path = args.json_path or (os.path.join(RESULTS_DIR, f"scale_{git_commit()}.json") if args.save else "")
+    if path:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"suite": "scale", "environment": environment_info(), "runs": runs}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存到: {path}")
+
+    if superlinear:
+        print(f"\n⚠️ 超线性增长: {', '.join(superlinear)}")
+        return 1 if args.strict else 0
+    return 0
+
+
+def cmd_profile_overhead(args: argparse.Namespace) -> int:
+    """测量 --profile 各模式的开销：合成数据上的转换器 + 语料上的并发解析"""
+    import asyncio
+
+    import max_rate_converter
+    import max_scraper
+    import max_synthetic
+    from max_metrics import SCRAPER_METRICS
+    from max_profiler import profiling
+
+    countries, plans = parse_scales(args.scale)[0]
+    _, pages = load_corpus()
+    workdir = tempfile.mkdtemp(prefix="max_profile_")
+    snapshot_path = os.path.join(workdir, "snapshot.json")
+    converted_path = os.path.join(workdir, "converted.json")
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(max_synthetic.generate_snapshot(countries, plans), f, ensure_ascii=False)
+    rates = max_synthetic.snapshot_rates()
+
+    async def parse_all():
+        async def parse_country(country_code: str, html: str):
+            for _ in range(5):
+                await max_scraper.parse_max_prices(html, country_code)
+                await asyncio.sleep(0)
+        await asyncio.gather(*(parse_country(c, h) for c, h in pages.items()))
+
+    workloads = {
+        f"converter({countries}x{plans})": lambda: max_rate_converter.main(snapshot_path, converted_path, rates),
+        "scraper.parse(corpus)": lambda: asyncio.run(parse_all()),
+    }
+    saved_level = max_logger.get_level()
+    saved_metrics = SCRAPER_METRICS.enabled
+    max_logger.configure(level=max_logger.SILENT)
+    SCRAPER_METRICS.enabled = False
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for name, workload in workloads.items():
+            row: Dict[str, float] = {}
+            for mode in (None, "sampling", "cprofile"):
+                timings = []
+                for _ in range(args.repeat):
+                    with profiling(name.split("(")[0], mode, directory=workdir):
+                        start = time.perf_counter()
+                        workload()
+                        timings.append(time.perf_counter() - start)
+                row[mode or "off"] = statistics.median(timings)
+            results[name] = row
+    finally:
+        max_logger.configure(level=saved_level)
+        SCRAPER_METRICS.enabled = saved_metrics
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    print(f"\n📊 剖析开销（{args.repeat} 次取中位数）")
+    print(f"{'负载':<28} {'off(s)':>9} {'sampling':>10} {'cprofile':>10}")
+    for name, row in results.items():
+        sampling = (row["sampling"] / row["off"] - 1) * 100
+        cprofile = (row["cprofile"] / row["off"] - 1) * 100
+        print(f"{name:<28} {row['off']:>9.3f} {sampling:>+9.1f}% {cprofile:>+9.1f}%")
+    return 0
+
+
+SNAPSHOT_SERIES = 24
+# 每一期改价的国家数：季度快照之间通常只有少数国家调价
+SNAPSHOT_CHANGED_COUNTRIES = 4
+
+
+def snapshot_series(count: int, countries: int, plans: int, seed: int) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    合成 count 期 (原始快照, 转换结果)：每期所有国家的 scraped_at 都变化，
+    少数国家调价（原始价格和人民币价格同时变化），转换结果的元数据（生成时间）每期不同
+    """
+    import copy
+    import random
+    import max_rate_converter
+    import max_synthetic
+
+    rng = random.Random(seed)
+    raw = max_synthetic.generate_snapshot(countries, plans, seed=seed)
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    try:
+        converted, _ = max_rate_converter.convert(raw, max_synthetic.snapshot_rates(), incremental=False)
+    finally:
+        max_logger.configure(level=saved_level)
+    codes = [code for code in raw if not code.startswith('_')]
+    series = []
+    for index in range(count):
+        raw, converted = copy.deepcopy(raw), copy.deepcopy(converted)
+        moment = f"{2000 + index // 4}-{index % 4 * 3 + 1:02d}-01T00:00:00"
+        for code in codes:
+            raw[code]["scraped_at"] = moment
+        for code in rng.sample(codes, min(SNAPSHOT_CHANGED_COUNTRIES, len(codes))) if index else []:
+            factor = rng.uniform(0.8, 1.2)
+            for plan in raw[code]["plans"]:
+                plan["price_number"] = round((plan.get("price_number") or 0) * factor, 2)
+            for plan in converted.get(code, {}).get("plans", []):
+                plan["price_cny"] = round(plan["price_cny"] * factor, 2)
+        converted.setdefault("_metadata", {})["generated_at"] = moment
+        series.append((raw, converted))
+    return series
+
+
+def cmd_snapshot_store(args: argparse.Namespace) -> int:
+    """
+    归档快照的存储方式对比：完整 indent=2 JSON、每期完整目录的快照存储与关键帧 + 差量目录的快照存储，
+    比较占用空间、还原一份快照的耗时和读取单个国家全部历史的耗时
+    """
+    import gzip
+    import shutil
+    import max_snapshot_store
+    from max_snapshot_store import SnapshotStore, load_snapshot
+
+    countries, plans = parse_scales(args.scale)[0]
+    series = snapshot_series(args.snapshots, countries, plans, args.seed)
+    country = next(code for code in series[0][1] if not code.startswith('_'))
+    workdir = tempfile.mkdtemp(prefix="max_snapshot_store_")
+    try:
+        full_dir = os.path.join(workdir, "full")
+        os.makedirs(full_dir)
+        stores = {
+            "keyframe": SnapshotStore(os.path.join(workdir, "keyframe"), codec=args.codec, keyframe_interval=1),
+            "delta": SnapshotStore(os.path.join(workdir, "delta"), codec=args.codec,
+                                   keyframe_interval=args.keyframe_interval),
+        }
+        full_bytes = gzip_bytes = 0
+        paths: Dict[str, List[str]] = {"full": [], "keyframe": [], "delta": []}
+        for index, pair in enumerate(series):
+            for kind, data in zip(("all_countries", "cny_sorted"), pair):
+                name = f"max_prices_{kind}_{2000 + index // 4}{index % 4 * 3 + 1:02d}01_000000.json"
+                content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+                with open(os.path.join(full_dir, name), 'wb') as f:
+                    f.write(content)
+                full_bytes += len(content)
+                gzip_bytes += len(gzip.compress(content, compresslevel=9))
+                paths["full"].append(os.path.join(full_dir, name))
+                for label, store in stores.items():
+                    path = os.path.join(store.archive_dir, name[-20:-16], name)
+                    store.write(path, data, content)
+                    paths[label].append(path)
+        stored = {label: store.stats()["stored_bytes"] for label, store in stores.items()}
+
+        def read_all(kind: str, cold: bool):
+            def run():
+                if cold:
+                    max_snapshot_store.clear_cache()
+                for path in paths[kind]:
+                    load_snapshot(path)
+            return run
+
+        def read_deepest():
+            # 随机访问：冷缓存下按索引取离关键帧最远的一期，需要读取关键帧和其后的全部差量
+            max_snapshot_store.clear_cache()
+            stores["delta"].snapshot("cny_sorted", deepest["timestamp"])
+
+        deepest = max(stores["delta"].chain("cny_sorted"), key=lambda item: item["depth"])
+
+        def read_country_full():
+            for path in paths["full"]:
+                if "cny_sorted" in path:
+                    with open(path, 'rb') as f:
+                        json.loads(f.read()).get(country)
+
+        def read_country_store(label: str):
+            def run():
+                max_snapshot_store.clear_cache()
+                stores[label].country_history("cny_sorted", country)
+            return run
+
+        items = len(paths["full"])
+        number = args.number or 1
+        results = {
+            "完整 JSON": measure(read_all("full", False), number, repeat=3, items=items),
+            "每期完整目录（冷缓存）": measure(read_all("keyframe", True), number, repeat=3, items=items),
+            "关键帧 + 差量（冷缓存）": measure(read_all("delta", True), number, repeat=3, items=items),
+            "关键帧 + 差量（热缓存）": measure(read_all("delta", False), number, repeat=3, items=items),
+            f"关键帧 + 差量（冷缓存，按索引取第 {deepest['depth']} 个差量）": measure(read_deepest, number, repeat=3),
+        }
+        history = {
+            "完整 JSON（逐份解析）": measure(read_country_full, number, repeat=3, items=args.snapshots),
+            "每期完整目录（冷缓存）": measure(read_country_store("keyframe"), number, repeat=3, items=args.snapshots),
+            "关键帧 + 差量（冷缓存）": measure(read_country_store("delta"), number, repeat=3, items=args.snapshots),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    codec, interval = stores["delta"].codec, stores["delta"].keyframe_interval
+    print(f"\n📦 {args.snapshots} 期快照（{countries} 国家 / {plans} 套餐，每期 {SNAPSHOT_CHANGED_COUNTRIES} 个国家调价，"
+          f"编码 {codec}，每 {interval} 期一个关键帧）")
+    print(f"  完整 JSON:         {full_bytes / 1024:>8.0f} KB")
+    print(f"  逐个文件 gzip:     {gzip_bytes / 1024:>8.0f} KB（{full_bytes / gzip_bytes:.1f}x）")
+    print(f"  每期完整目录:      {stored['keyframe'] / 1024:>8.0f} KB（{full_bytes / stored['keyframe']:.1f}x）")
+    print(f"  关键帧 + 差量:     {stored['delta'] / 1024:>8.0f} KB（{full_bytes / stored['delta']:.1f}x）")
+    print_table("还原一份快照（ns）", results)
+    print_table(f"读取 {country} 的全部历史（cny_sorted，每期 ns）", history)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"suite": "snapshot-store", "environment": environment_info(), "scale": args.scale,
+                       "snapshots": args.snapshots, "codec": codec, "keyframe_interval": interval,
+                       "full_bytes": full_bytes, "gzip_bytes": gzip_bytes, "keyframe_bytes": stored["keyframe"],
+                       "delta_bytes": stored["delta"], "read": results, "country_history": history},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存到: {args.json_path}")
+    return 0
+
+
+PIPELINE_REPEAT = 5
+
+
+def seed_pipeline_workdir(workdir: str, countries: int, plans: int, seed: int):
+    """
+    准备流水线对比的工作目录：合成快照、上一期归档（扰动后的转换结果）和已缓存的汇率表
+    汇率表覆盖流水线预取的全部货币，两种方式都命中缓存，不访问网络
+    """
+    import max_pipeline
+    import max_rate_converter
+    import max_synthetic
+    from max_rate_store import RateStore
+
+    snapshot = max_synthetic.generate_snapshot(countries, plans, seed=seed)
+    rates = max_synthetic.snapshot_rates()
+    for symbol in max_pipeline.prefetch_symbols():
+        rates.setdefault(symbol, 1.0)
+    RateStore(os.path.join(workdir, "rates")).save(rates, max_rate_converter.BASE_CURRENCY)
+    with open(os.path.join(workdir, max_rate_converter.INPUT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+    saved_level = max_logger.get_level()
+    max_logger.configure(level=max_logger.SILENT)
+    try:
+        converted, _ = max_rate_converter.convert(snapshot, rates, incremental=False)
+    finally:
+        max_logger.configure(level=saved_level)
+    year_dir = os.path.join(workdir, "archive", "2000")
+    os.makedirs(year_dir)
+    with open(os.path.join(year_dir, "max_prices_cny_sorted_20000101_000000.json"), 'w', encoding='utf-8') as f:
+        json.dump(max_synthetic.perturb_converted(converted, seed=seed), f, ensure_ascii=False, indent=2)
+
+
+def run_step_by_step(workdir: str, env: Dict[str, str]) -> float:
+    """按 workflow 原来的步骤执行：转换器进程 → cp 归档 → 检测器进程（不含抓取）"""
+    import shutil
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(here, "max_rate_converter.py")],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    year_dir = os.path.join(workdir, "archive", timestamp[:4])
+    os.makedirs(year_dir, exist_ok=True)
+    for name in ("max_prices_all_countries", "max_prices_cny_sorted"):
+        shutil.copy(os.path.join(workdir, f"{name}.json"), os.path.join(year_dir, f"{name}_{timestamp}.json"))
+    subprocess.run([sys.executable, os.path.join(here, "max_price_change_detector.py")],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def run_pipeline_process(workdir: str, env: Dict[str, str]) -> float:
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(here, "max_pipeline.py"), "--input", "max_prices_all_countries.json"],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def cmd_pipeline(args: argparse.Namespace) -> int:
+    """进程内流水线与逐步执行的端到端耗时对比（离线：读取合成快照，不含抓取）"""
+    import shutil
+
+    countries, plans = parse_scales(args.scale)[0]
+    seed_dir = tempfile.mkdtemp(prefix="max_pipeline_seed_")
+    seed_pipeline_workdir(seed_dir, countries, plans, args.seed)
+    runners = {"step-by-step": run_step_by_step, "pipeline": run_pipeline_process}
+    timings: Dict[str, List[float]] = {name: [] for name in runners}
+    try:
+        for _ in range(args.repeat):
+            # 交替执行，每次都从同一份种子目录开始，CHANGELOG 和归档不会越积越多
+            for name, runner in runners.items():
+                workdir = tempfile.mkdtemp(prefix="max_pipeline_run_")
+                try:
+                    shutil.copytree(seed_dir, workdir, dirs_exist_ok=True)
+                    env = dict(os.environ, MAX_LOG_LEVEL="warning", MAX_METRICS_DIR=os.path.join(workdir, "output"),
+                               MAX_RATES_DIR=os.path.join(workdir, "rates"), GITHUB_OUTPUT="")
+                    timings[name].append(runner(workdir, env))
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        shutil.rmtree(seed_dir, ignore_errors=True)
+
+    step, pipeline = statistics.median(timings["step-by-step"]), statistics.median(timings["pipeline"])
+    saved = step - pipeline
+    print(f"\n📊 流水线对比（{countries} 国家 / {plans} 套餐，{args.repeat} 次取中位数，不含抓取）")
+    print(f"  逐步执行: {step:.3f}s")
+    print(f"  流水线:   {pipeline:.3f}s")
+    print(f"  节省:     {saved:.3f}s ({saved / step * 100:.1f}%)")
+    print("  实际运行中，流水线还会把汇率请求与抓取重叠，节省的时间见 output/pipeline_run_report.json")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"suite": "pipeline", "environment": environment_info(), "scale": args.scale,
+                       "timings": timings, "step_by_step": step, "pipeline": pipeline, "saved": saved},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存到: {args.json_path}")
+    return 0
+
+
+def git_commit() -> str:
+    """当前提交的短哈希，不在 git 仓库中时返回 unknown"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def environment_info() -> Dict[str, Any]:
+    """记录运行环境，便于对比不同机器/提交的结果"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "commit": git_commit(),
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+def save_results(suite_name: str, results: Dict[str, Dict[str, float]], path: str) -> str:
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    payload = {"suite": suite_name, "environment": environment_info(), "results": results}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_results(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """按 median 对比两份结果，返回每个用例的变化（regression 为 True 表示超过阈值）"""
+    rows = []
+    base_results = base.get("results", {})
+    head_results = head.get("results", {})
+    for case in sorted(set(base_results) | set(head_results)):
+        old = base_results.get(case)
+        new = head_results.get(case)
+        if not old or not new or not old.get("median_ns"):
+            rows.append({"case": case, "base": old and old.get("median_ns"), "head": new and new.get("median_ns"),
+                         "change_percent": None, "regression": False})
+            continue
+        change = (new["median_ns"] - old["median_ns"]) / old["median_ns"] * 100
+        rows.append({"case": case, "base": old["median_ns"], "head": new["median_ns"],
+                     "change_percent": round(change, 1), "regression": change > threshold})
+    return rows
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.head, 'r', encoding='utf-8') as f:
+        head = json.load(f)
+    rows = compare_results(base, head, args.threshold)
+
+    base_label = base.get("environment", {}).get("commit", os.path.basename(args.base))
+    head_label = head.get("environment", {}).get("commit", os.path.basename(args.head))
+    print(f"\n📊 基准对比 {base_label} → {head_label}（阈值 {args.threshold:.1f}%）")
+    width = max((len(r["case"]) for r in rows), default=10) + 2
+    print(f"{'用例'.ljust(width)} {'base(ns)':>12} {'head(ns)':>12} {'变化':>9}")
+    for row in rows:
+        if row["change_percent"] is None:
+            print(f"{row['case'].ljust(width)} {str(row['base']):>12} {str(row['head']):>12} {'n/a':>9}")
+            continue
+        flag = " ❌" if row["regression"] else ""
+        print(f"{row['case'].ljust(width)} {row['base']:>12.1f} {row['head']:>12.1f} {row['change_percent']:>+8.1f}%{flag}")
+
+    regressions = [r for r in rows if r["regression"]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} 个用例退化超过 {args.threshold:.1f}%")
+        return 1
+    print("\n✅ 没有超过阈值的退化")
+    return 0
+
+
+def run_suite(args: argparse.Namespace) -> int:
+    results = SUITES[args.command](args)
+    print_table(args.command, results)
+
+    path = args.json_path
+    if not path and args.save:
+        path = os.path.join(RESULTS_DIR, f"{args.command}_{git_commit()}.json")
+    if path:
+        save_results(args.command, results, path)
+        print(f"\n✅ 结果已保存到: {path}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="HBO Max 性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, func in sorted(SUITES.items()):
+        sub = subparsers.add_parser(name, help=(func.__doc__ or "").strip().splitlines()[0])
+        sub.add_argument("--number", type=int, default=0, help="每轮调用次数（0 表示使用套件默认值）")
+        sub.add_argument("--json", dest="json_path", default="", help="将结果保存为指定 JSON 文件")
+        sub.add_argument("--save", action="store_true", help=f"将结果保存到 {RESULTS_DIR}/<套件>_<commit>.json")
+        sub.set_defaults(handler=run_suite)
+
+    compare = subparsers.add_parser("compare", help="对比两份结果，超过阈值的退化返回非零退出码")
+    compare.add_argument("base", help="基准结果 JSON")
+    compare.add_argument("head", help="新结果 JSON")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="退化阈值（百分比）")
+    compare.set_defaults(handler=cmd_compare)
+
+    scale = subparsers.add_parser("scale", help="合成数据规模基准：转换和检测各阶段的耗时与峰值内存")
+    scale.add_argument("--scales", default=DEFAULT_SCALES, help="逗号分隔的 国家数x套餐数 列表")
+    scale.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    scale.add_argument("--timeout", type=int, default=SCALE_TIMEOUT, help="单个阶段的超时（秒）")
+    scale.add_argument("--strict", action="store_true", help="出现超线性增长时返回非零退出码")
+    scale.add_argument("--json", dest="json_path", default="", help="将结果保存为指定 JSON 文件")
+    scale.add_argument("--save", action="store_true", help=f"将结果保存到 {RESULTS_DIR}/scale_<commit>.json")
+    scale.set_defaults(handler=cmd_scale)
+
+    stage = subparsers.add_parser("scale-stage", help="（内部）在子进程中执行单个规模基准阶段")
+    stage.add_argument("stage", choices=SCALE_STAGES)
+    stage.add_argument("workdir")
+    stage.add_argument("--countries", type=int, required=True)
+    stage.add_argument("--plans", type=int, required=True)
+    stage.add_argument("--seed", type=int, default=42)
+    stage.set_defaults(handler=cmd_scale_stage)
+
+    overhead = subparsers.add_parser("profile-overhead", help="测量 --profile 各模式的运行开销")
+    overhead.add_argument("--scale", default="1000x10000", help="转换器负载的 国家数x套餐数")
+    overhead.add_argument("--repeat", type=int, default=5, help="每种模式重复次数")
+    overhead.set_defaults(handler=cmd_profile_overhead)
+
+    startup = subparsers.add_parser("cli-startup", help="max_cli 各子命令的启动耗时（-X importtime），超出预算时返回非零退出码")
+    startup.add_argument("commands", nargs="*", help="要检查的子命令（默认全部）")
+    startup.add_argument("--repeat", type=int, default=CLI_STARTUP_REPEAT, help="每个子命令的运行次数")
+    startup.add_argument("--update-profiles", action="store_true",
+                         help=f"把导入图（不含耗时）写入 {IMPORTTIME_DIR}/<子命令>.txt")
+    startup.add_argument("--json", dest="json_path", default="", help="将结果保存为指定 JSON 文件")
+    startup.set_defaults(handler=cmd_cli_startup)
+
+    pipeline = subparsers.add_parser("pipeline", help="进程内流水线与逐步执行的端到端耗时对比（离线，不含抓取）")
+    pipeline.add_argument("--scale", default="96x450", help="合成快照的 国家数x套餐数")
+    pipeline.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    pipeline.add_argument("--repeat", type=int, default=PIPELINE_REPEAT, help="每种方式的运行次数")
+    pipeline.add_argument("--json", dest="json_path", default="", help="将结果保存为指定 JSON 文件")
+    pipeline.set_defaults(handler=cmd_pipeline)
+
+    snapshots = subparsers.add_parser("snapshot-store", help="归档快照存储：完整 JSON、快照存储与差量存储的占用空间和还原耗时")
+    snapshots.add_argument("--scale", default="96x450", help="合成快照的 国家数x套餐数")
+    snapshots.add_argument("--snapshots", type=int, default=SNAPSHOT_SERIES, help="快照期数")
+    snapshots.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    snapshots.add_argument("--codec", default=None, help="压缩编码：auto / zstd / gzip")
+    snapshots.add_argument("--keyframe-interval", type=int, default=None, help="每隔多少期一个关键帧（默认 8）")
+    snapshots.add_argument("--number", type=int, default=0, help="每轮读取全部快照的次数（0 表示 1 次）")
+    snapshots.add_argument("--json", dest="json_path", default="", help="将结果保存为指定 JSON 文件")
+    snapshots.set_defaults(handler=cmd_snapshot_store)
+
+    corpus = subparsers.add_parser("build-corpus", help="由价格快照重新生成基准语料")
+    corpus.add_argument("--snapshot", default="max_prices_all_countries.json", help="原始价格快照")
+    corpus.set_defaults(handler=cmd_build_corpus)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,18 +4,40 @@
 HBO Max CHANGELOG 归档管理器
 每季度自动归档 CHANGELOG，保持主文件的可读性
 基于Spotify项目改编，适配HBO Max三个月运行频率
+归档文件的条目数和时间范围缓存在 changelog_archive/index.json，按文件的 mtime 和大小校验，
+生成归档链接表时不再重新读取未变化的归档文件
 """
 
+import json
 import os
 import re
-from datetime import datetime, timedelta
-from typing import List, Tuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 import calendar
+from max_logger import get_logger
+
+log = get_logger("archiver")
+
+ARCHIVE_INDEX = "index.json"
+# 索引格式版本：修改统计字段时递增，旧版本索引会被丢弃并重新统计
+ARCHIVE_INDEX_VERSION = 1
+ARCHIVE_NAME_PATTERN = re.compile(r'^changelog_(\d{4}-Q[1-4])\.md$')
+ARCHIVE_ENTRY_PATTERN = re.compile(r'^## (\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?)', re.MULTILINE)
+
+
+def archive_stats(content: str) -> Dict[str, Any]:
+    """归档文件内容 -> {"entries", "first", "last"}（统计 ## YYYY-MM-DD 格式的条目）"""
+    dates = ARCHIVE_ENTRY_PATTERN.findall(content)
+    return {"entries": len(dates), "first": min(dates, default=None), "last": max(dates, default=None)}
+
 
 class MaxChangelogArchiver:
-    def __init__(self):
-        self.changelog_file = "CHANGELOG.md"
-        self.archive_dir = "changelog_archive"
+    def __init__(self, changelog_file: str = "CHANGELOG.md", archive_dir: str = "changelog_archive"):
+        self.changelog_file = changelog_file
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, ARCHIVE_INDEX)
+        # {文件名: {"mtime_ns", "size", "entries", "first", "last"}}，首次使用时才加载
+        self._stats: Optional[Dict[str, Dict[str, Any]]] = None
         self.header_template = """# HBO Max 价格变化记录
 
 此文件记录 HBO Max 各国套餐价格的变化历史。
@@ -39,102 +61,12 @@ class MaxChangelogArchiver:
         """确保归档目录存在"""
         if not os.path.exists(self.archive_dir):
             os.makedirs(self.archive_dir)
-            print(f"✅ 创建归档目录: {self.archive_dir}")
-    
-    def parse_changelog_entries(self) -> Tuple[List[str], List[str]]:
-        """解析 CHANGELOG 中的条目，分离需要归档的和保留的"""
-        if not os.path.exists(self.changelog_file):
-            print(f"⚠️ CHANGELOG 文件不存在: {self.changelog_file}")
-            return [], []
-        
-        with open(self.changelog_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找所有日期条目
-        # 匹配格式如: ## 2025-08-05 14:30:22 或 ## 2025-08-05
-        date_pattern = r'^## (\d{4}-\d{2}-\d{2})(?:\s+\d{2}:\d{2}:\d{2})?'
-        
-        lines = content.split('\n')
-        entries_to_archive = []
-        entries_to_keep = []
-        current_entry = []
-        current_date = None
-        in_entry = False
-        
-        # 获取当前日期和上个季度的最后一天
-        now = datetime.now()
-        current_quarter = (now.month - 1) // 3 + 1
-        
-        if current_quarter == 1:
-            # 如果是Q1，上个季度是去年Q4
-            last_quarter_year = now.year - 1
-            last_quarter = 4
-            cutoff_date = datetime(last_quarter_year, 12, 31).date()
-        else:
-            # 其他情况
-            last_quarter_year = now.year
-            last_quarter = current_quarter - 1
-            last_quarter_end_month = last_quarter * 3
-            cutoff_date = datetime(last_quarter_year, last_quarter_end_month, 
-                                 calendar.monthrange(last_quarter_year, last_quarter_end_month)[1]).date()
-        
-        print(f"📅 归档截止日期: {cutoff_date.strftime('%Y-%m-%d')} (上季度结束)")
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            
-            # 检查是否是日期标题行
-            match = re.match(date_pattern, line, re.MULTILINE)
-            if match:
-                # 保存上一个条目
-                if current_entry and current_date:
-                    entry_content = '\n'.join(current_entry)
-                    if current_date <= cutoff_date:
-                        entries_to_archive.append(entry_content)
-                    else:
-                        entries_to_keep.append(entry_content)
-                
-                # 开始新条目
-                current_date = datetime.strptime(match.group(1), '%Y-%m-%d').date()
-                current_entry = [line]
-                in_entry = True
-            elif in_entry and (line.startswith('## ') or line.startswith('# ')):
-                # 遇到新的标题，结束当前条目
-                if current_entry and current_date:
-                    entry_content = '\n'.join(current_entry)
-                    if current_date <= cutoff_date:
-                        entries_to_archive.append(entry_content)
-                    else:
-                        entries_to_keep.append(entry_content)
-                
-                # 重置状态，这行不是日期条目
-                current_entry = []
-                current_date = None
-                in_entry = False
-                
-                # 如果这是非日期的标题，需要跳过
-                continue
-            elif in_entry:
-                # 添加到当前条目
-                current_entry.append(line)
-            
-            i += 1
-        
-        # 处理最后一个条目
-        if current_entry and current_date:
-            entry_content = '\n'.join(current_entry)
-            if current_date <= cutoff_date:
-                entries_to_archive.append(entry_content)
-            else:
-                entries_to_keep.append(entry_content)
-        
-        return entries_to_archive, entries_to_keep
+            log.info(f"✅ 创建归档目录: {self.archive_dir}")
     
     def create_quarterly_archive(self, entries: List[str], year_quarter: str) -> str:
         """创建季度归档文件"""
         if not entries:
-            print(f"⚠️ {year_quarter} 没有需要归档的条目")
+            log.warning(f"⚠️ {year_quarter} 没有需要归档的条目")
             return ""
         
         archive_filename = f"changelog_{year_quarter}.md"
@@ -179,34 +111,73 @@ class MaxChangelogArchiver:
         # 写入归档文件
         with open(archive_path, 'w', encoding='utf-8') as f:
             f.write(archive_content)
+        self.archive_stats()[archive_filename] = self._file_stats(archive_path, archive_content)
+        self.save_archive_index()
         
-        print(f"✅ 创建季度归档: {archive_path} ({len(entries)} 个条目)")
+        log.info(f"✅ 创建季度归档: {archive_path} ({len(entries)} 个条目)")
         return archive_filename
     
+    def archive_stats(self) -> Dict[str, Dict[str, Any]]:
+        """已缓存的归档文件统计（不校验文件是否变化）"""
+        if self._stats is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+            except FileNotFoundError:
+                payload = None
+            except (OSError, json.JSONDecodeError) as e:
+                log.warning(f"⚠️ 归档索引无法读取，重新统计: {self.index_path} - {e}")
+                payload = None
+            valid = isinstance(payload, dict) and payload.get("version") == ARCHIVE_INDEX_VERSION
+            self._stats = payload.get("archives", {}) if valid else {}
+        return self._stats
+
+    def save_archive_index(self):
+        """原子写入归档索引"""
+        payload = {"version": ARCHIVE_INDEX_VERSION, "archives": dict(sorted(self.archive_stats().items()))}
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _file_stats(path: str, content: str) -> Dict[str, Any]:
+        info = os.stat(path)
+        return {"mtime_ns": info.st_mtime_ns, "size": info.st_size, **archive_stats(content)}
+
     def get_existing_archives(self) -> List[Tuple[str, str, int]]:
-        """获取现有归档文件信息"""
+        """获取现有归档文件信息；只重新读取 mtime 或大小与索引不一致的文件"""
         archives = []
         
         if not os.path.exists(self.archive_dir):
             return archives
         
+        stats = self.archive_stats()
+        changed = False
+        present = set()
         # 扫描归档目录
         for filename in os.listdir(self.archive_dir):
-            if filename.startswith('changelog_') and filename.endswith('.md'):
-                # 提取年季度信息
-                year_quarter = filename.replace('changelog_', '').replace('.md', '')
-                if re.match(r'\d{4}-Q[1-4]', year_quarter):
-                    # 统计该归档文件中的条目数量
-                    archive_path = os.path.join(self.archive_dir, filename)
-                    try:
-                        with open(archive_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        # 统计 ## YYYY-MM-DD 格式的条目
-                        entry_count = len(re.findall(r'^## \d{4}-\d{2}-\d{2}', content, re.MULTILINE))
-                        archives.append((year_quarter, filename, entry_count))
-                    except Exception as e:
-                        print(f"⚠️ 读取归档文件失败: {filename} - {e}")
-                        archives.append((year_quarter, filename, 0))
+            match = ARCHIVE_NAME_PATTERN.match(filename)
+            if not match:
+                continue
+            present.add(filename)
+            archive_path = os.path.join(self.archive_dir, filename)
+            cached = stats.get(filename)
+            try:
+                info = os.stat(archive_path)
+                if not cached or cached["mtime_ns"] != info.st_mtime_ns or cached["size"] != info.st_size:
+                    with open(archive_path, 'r', encoding='utf-8') as f:
+                        cached = stats[filename] = self._file_stats(archive_path, f.read())
+                    changed = True
+                archives.append((match.group(1), filename, cached["entries"]))
+            except Exception as e:
+                log.warning(f"⚠️ 读取归档文件失败: {filename} - {e}")
+                archives.append((match.group(1), filename, 0))
+        for filename in set(stats) - present:
+            del stats[filename]
+            changed = True
+        if changed:
+            self.save_archive_index()
         
         # 按年季度排序（最新的在前）
         archives.sort(key=lambda x: x[0], reverse=True)
@@ -217,45 +188,17 @@ class MaxChangelogArchiver:
         if not archives:
             return "| - | 暂无归档 | - |"
         
+        # 链接相对于 CHANGELOG 所在目录（回填到其他目录时同样有效）
+        link_dir = os.path.relpath(self.archive_dir, os.path.dirname(self.changelog_file) or '.').replace(os.sep, '/')
         links = []
         for year_quarter, filename, count in archives:
             year, quarter = year_quarter.split('-Q')
             display_name = f"{year}年Q{quarter}"
-            link = f"| {display_name} | [changelog_{year_quarter}.md]({self.archive_dir}/{filename}) | {count} |"
+            link = f"| {display_name} | [changelog_{year_quarter}.md]({link_dir}/{filename}) | {count} |"
             links.append(link)
         
         return '\n'.join(links)
     
-    def update_main_changelog(self, entries_to_keep: List[str], new_archives: List[str]):
-        """更新主 CHANGELOG 文件"""
-        # 获取所有归档信息
-        existing_archives = self.get_existing_archives()
-        archive_links = self.generate_archive_links(existing_archives)
-        
-        # 生成当前季度标题
-        now = datetime.now()
-        quarter = (now.month - 1) // 3 + 1
-        current_quarter_header = f"### {now.year}年Q{quarter}"
-        
-        # 生成新的 CHANGELOG 内容
-        new_content = self.header_template.format(
-            archive_links=archive_links,
-            current_quarter_header=current_quarter_header
-        )
-        
-        # 添加保留的条目
-        if entries_to_keep:
-            for entry in entries_to_keep:
-                new_content += entry + "\n\n"
-        else:
-            new_content += "\n*本季度暂无价格变化记录*\n\n"
-        
-        # 写入文件
-        with open(self.changelog_file, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        
-        print(f"✅ 更新主 CHANGELOG: {self.changelog_file}")
-    
     def should_archive(self) -> bool:
         """判断是否应该执行归档（每季度第一个月前7天内）"""
         now = datetime.now()
@@ -263,60 +206,32 @@ class MaxChangelogArchiver:
         return now.day <= 7 and now.month in [1, 4, 7, 10]
     
     def archive_last_quarter(self) -> Tuple[int, List[str]]:
-        """归档上个季度的记录"""
-        print("🗂️ 开始执行 HBO Max CHANGELOG 季度归档...")
-        
-        # 确保归档目录存在
-        self.ensure_archive_directory()
-        
-        # 解析现有记录
-        entries_to_archive, entries_to_keep = self.parse_changelog_entries()
-        
-        if not entries_to_archive:
-            print("📝 没有需要归档的历史记录")
+        """归档上个季度及更早尚未归档的记录（条目来自 changelog_data/ 结构化存储，不再解析 CHANGELOG.md）"""
+        from max_changelog_store import ChangelogStore
+
+        log.info("🗂️ 开始执行 HBO Max CHANGELOG 季度归档...")
+        total_archived, archived_files = ChangelogStore(changelog_file=self.changelog_file,
+                                                        archive_dir=self.archive_dir).archive()
+        if not total_archived:
+            log.info("📝 没有需要归档的历史记录")
             return 0, []
-        
-        # 按季度分组归档条目
-        quarterly_entries = {}
-        for entry in entries_to_archive:
-            # 提取日期
-            match = re.search(r'^## (\d{4}-\d{2})-\d{2}', entry, re.MULTILINE)
-            if match:
-                year = int(match.group(1)[:4])
-                month = int(match.group(1)[5:7])
-                quarter = (month - 1) // 3 + 1
-                year_quarter = f"{year}-Q{quarter}"
-                
-                if year_quarter not in quarterly_entries:
-                    quarterly_entries[year_quarter] = []
-                quarterly_entries[year_quarter].append(entry)
-        
-        # 创建季度归档文件
-        archived_files = []
-        total_archived = 0
-        
-        for year_quarter, entries in quarterly_entries.items():
-            archive_filename = self.create_quarterly_archive(entries, year_quarter)
-            if archive_filename:
-                archived_files.append(archive_filename)
-                total_archived += len(entries)
-        
-        # 更新主 CHANGELOG
-        self.update_main_changelog(entries_to_keep, archived_files)
-        
-        print(f"🎉 归档完成！共归档 {total_archived} 个条目到 {len(archived_files)} 个文件")
+        log.info(f"🎉 归档完成！共归档 {total_archived} 个条目到 {len(archived_files)} 个文件")
         return total_archived, archived_files
 
 
-def main():
-    """主函数"""
+def main(argv: Optional[List[str]] = None):
+    """主函数（python max_changelog_archiver.py / python max_cli.py archive）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max CHANGELOG 季度归档（每季度首月 1-7 日执行）")
+    parser.parse_args(argv)
+
     archiver = MaxChangelogArchiver()
     
     # 检查是否应该执行归档
     if not archiver.should_archive():
         now = datetime.now()
-        print(f"⏰ 当前日期 {now.strftime('%Y-%m-%d')} 不在归档窗口期（每季度首月1-7日）")
-        print("跳过归档操作")
+        log.info(f"⏰ 当前日期 {now.strftime('%Y-%m-%d')} 不在归档窗口期（每季度首月1-7日）")
+        log.info("跳过归档操作")
         return
     
     # 执行归档
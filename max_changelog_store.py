@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max CHANGELOG 结构化存储
+价格变化条目按季度保存在 changelog_data/<YYYY-QN>.jsonl（每行一条：{"date", "changes"}），
+changelog_data/index.json 记录每个季度的条目数、时间范围、文件大小、是否已归档和上次渲染时的文件大小：
+- 检测器只追加一行并更新索引，不再拆分、正则查找和整体重写 CHANGELOG.md
+- CHANGELOG.md 和 changelog_archive/changelog_YYYY-QN.md 都由存储渲染：主文件只读取未归档季度的条目，
+  季度归档文件只在该季度的条目变化后重新渲染
+- 季度归档只是把季度标记为已归档并渲染一次归档文件，不再逐行解析 CHANGELOG.md
+- 首次使用时从现有的 CHANGELOG.md 和季度归档文件导入条目；无法还原为结构化变化的旧条目保留原 markdown
+
+用法:
+  python max_changelog_store.py show      # 各季度的条目数和归档状态
+  python max_changelog_store.py render    # 重新渲染 CHANGELOG.md 和全部季度归档文件
+  python max_changelog_store.py migrate   # 丢弃存储，从现有 markdown 重新导入
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from max_logger import get_logger
+
+log = get_logger("changelog")
+
+STORE_DIR = "changelog_data"
+INDEX_NAME = "index.json"
+CHANGELOG_FILE = "CHANGELOG.md"
+CHANGELOG_ARCHIVE_DIR = "changelog_archive"
+# 索引格式版本：修改索引结构时递增，旧版本索引会由季度文件重建
+INDEX_VERSION = 1
+QUARTER_FILE_PATTERN = re.compile(r'^(\d{4}-Q[1-4])\.jsonl$')
+ARCHIVE_FILE_PATTERN = re.compile(r'^changelog_\d{4}-Q[1-4]\.md$')
+ENTRY_PATTERN = re.compile(r'^## (\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?)\s*$')
+# markdown 条目在以下行处结束：非日期的一二级标题、季度标题、分隔线（季度归档的页脚）
+ENTRY_END_PATTERN = re.compile(r'^(?:#{1,2} |### \d{4}年Q[1-4]|---\s*$)')
+EMPTY_QUARTER_NOTE = "*本季度暂无价格变化记录*"
+NO_CHANGE_TEXT = "✅ **无价格变化** - 所有套餐价格保持稳定"
+
+
+def quarter_of(date: str) -> str:
+    """条目时间 YYYY-MM-DD[ HH:MM:SS] -> 2026-Q1"""
+    return f"{date[:4]}-Q{(int(date[5:7]) - 1) // 3 + 1}"
+
+
+def current_quarter(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    return f"{now.year}-Q{(now.month - 1) // 3 + 1}"
+
+
+def quarter_header(quarter: str) -> str:
+    """2026-Q1 -> ### 2026年Q1"""
+    year, number = quarter.split('-Q')
+    return f"### {year}年Q{number}"
+
+
+def render_changes(changes: List[Dict[str, Any]], date: str) -> str:
+    """由变化事件生成一个 CHANGELOG 条目"""
+    if not changes:
+        return f"## {date}\n\n{NO_CHANGE_TEXT}\n\n"
+
+    content = f"## {date}\n\n"
+
+    # 统计变化
+    price_increases = [c for c in changes if c['type'] == 'price_change' and c['change_amount'] > 0]
+    price_decreases = [c for c in changes if c['type'] == 'price_change' and c['change_amount'] < 0]
+    new_plans = [c for c in changes if c['type'] == 'new_plan']
+    removed_plans = [c for c in changes if c['type'] == 'removed_plan']
+    cycle_changes = [c for c in changes if c['type'] == 'cycle_change']
+
+    content += f"📊 **变化概览**: {len(changes)} 项变化\n"
+    if price_increases:
+        content += f"- 📈 涨价: {len(price_increases)} 个套餐\n"
+    if price_decreases:
+        content += f"- 📉 降价: {len(price_decreases)} 个套餐\n"
+    if new_plans:
+        content += f"- 🆕 新增: {len(new_plans)} 个套餐\n"
+    if removed_plans:
+        content += f"- ❌ 移除: {len(removed_plans)} 个套餐\n"
+    if cycle_changes:
+        content += f"- 🔁 周期变化: {len(cycle_changes)} 个套餐\n"
+    content += "\n"
+
+    # 涨价详情
+    if price_increases:
+        content += "### 📈 价格上涨\n\n"
+        price_increases.sort(key=lambda x: x['change_percent'], reverse=True)
+        for change in price_increases:
+            content += f"- **{change['country']} - {change['plan']}** ({change['billing_cycle']})\n"
+            content += f"  - 原价: ¥{change['old_price_cny']:.2f} | 现价: ¥{change['new_price_cny']:.2f}\n"
+            content += f"  - 涨幅: ¥{change['change_amount']:.2f} (+{change['change_percent']:.1f}%)\n"
+            content += f"  - 当地价格: {change['original_price']} {change['currency']}\n\n"
+
+    # 降价详情
+    if price_decreases:
+        content += "### 📉 价格下降\n\n"
+        price_decreases.sort(key=lambda x: x['change_percent'])
+        for change in price_decreases:
+            content += f"- **{change['country']} - {change['plan']}** ({change['billing_cycle']})\n"
+            content += f"  - 原价: ¥{change['old_price_cny']:.2f} | 现价: ¥{change['new_price_cny']:.2f}\n"
+            content += f"  - 降幅: ¥{abs(change['change_amount']):.2f} ({change['change_percent']:.1f}%)\n"
+            content += f"  - 当地价格: {change['original_price']} {change['currency']}\n\n"
+
+    # 新增套餐
+    if new_plans:
+        content += "### 🆕 新增套餐\n\n"
+        for change in new_plans:
+            content += f"- **{change['country']} - {change['plan']}** ({change['billing_cycle']})\n"
+            content += f"  - 价格: ¥{change['new_price_cny']:.2f}\n"
+            content += f"  - 当地价格: {change['original_price']} {change['currency']}\n\n"
+
+    # 移除套餐
+    if removed_plans:
+        content += "### ❌ 移除套餐\n\n"
+        for change in removed_plans:
+            content += f"- **{change['country']} - {change['plan']}** ({change['billing_cycle']})\n"
+            content += f"  - 原价格: ¥{change['old_price_cny']:.2f}\n"
+            content += f"  - 当地价格: {change['original_price']} {change['currency']}\n\n"
+
+    # 计费周期变化
+    if cycle_changes:
+        content += "### 🔁 计费周期变化\n\n"
+        for change in cycle_changes:
+            content += f"- **{change['country']} - {change['plan']}** ({change['old_billing_cycle']} → {change['billing_cycle']})\n"
+            content += f"  - 原价: ¥{change['old_price_cny']:.2f} | 现价: ¥{change['new_price_cny']:.2f}\n"
+            content += f"  - 当地价格: {change['original_price']} {change['currency']}\n\n"
+
+    return content
+
+
+def render_entry(entry: Dict[str, Any]) -> str:
+    """存储中的一条记录 -> markdown 条目（导入的旧条目直接使用原 markdown）"""
+    if "markdown" in entry:
+        return f"## {entry['date']}\n\n{entry['markdown']}".rstrip() + "\n\n"
+    return render_changes(entry.get("changes") or [], entry["date"])
+
+
+def read_markdown_entries(path: str) -> List[Tuple[str, str]]:
+    """读取 CHANGELOG 或季度归档文件中的日期条目 -> [(时间, 标题之后的内容)]"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    entries: List[Tuple[str, str]] = []
+    date, current = None, []
+    for line in lines + ['---']:
+        match = ENTRY_PATTERN.match(line)
+        if match or (date and ENTRY_END_PATTERN.match(line)):
+            if date:
+                body = '\n'.join(l for l in current if l.strip() != EMPTY_QUARTER_NOTE).strip()
+                entries.append((date, body))
+            date, current = (match.group(1), []) if match else (None, [])
+        elif date:
+            current.append(line)
+    return entries
+
+
+def markdown_record(date: str, body: str) -> Dict[str, Any]:
+    """旧 markdown 条目 -> 存储记录；无变化条目还原为空的变化列表"""
+    if body == NO_CHANGE_TEXT:
+        return {"date": date, "changes": []}
+    return {"date": date, "markdown": body}
+
+
+class ChangelogStore:
+    """按季度保存的 CHANGELOG 条目及渲染；首次访问时才加载索引"""
+
+    def __init__(self, directory: Optional[str] = None, changelog_file: str = CHANGELOG_FILE,
+                 archive_dir: str = CHANGELOG_ARCHIVE_DIR):
+        # 默认与 CHANGELOG.md 放在同一目录
+        self.directory = directory or os.path.join(os.path.dirname(changelog_file), STORE_DIR)
+        self.index_path = os.path.join(self.directory, INDEX_NAME)
+        self.changelog_file = changelog_file
+        self.archive_dir = archive_dir
+        self._quarters: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @property
+    def quarters(self) -> Dict[str, Dict[str, Any]]:
+        """{年季度: {"entries", "first", "last", "size", "archived", "rendered_size"}}"""
+        if self._quarters is None:
+            self._quarters = self._load()
+        return self._quarters
+
+    def quarter_path(self, quarter: str) -> str:
+        return os.path.join(self.directory, f"{quarter}.jsonl")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            payload = None
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"⚠️ CHANGELOG 索引无法读取，重新扫描: {self.index_path} - {e}")
+            payload = None
+        if isinstance(payload, dict) and payload.get("version") == INDEX_VERSION:
+            return payload.get("quarters", {})
+        if os.path.isdir(self.directory):
+            return self.rebuild_index()
+        return self.migrate()
+
+    def save_index(self):
+        """原子写入索引"""
+        os.makedirs(self.directory, exist_ok=True)
+        payload = {"version": INDEX_VERSION, "updated_at": datetime.now().isoformat(),
+                   "quarters": dict(sorted(self.quarters.items()))}
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _describe(self, quarter: str, archived: bool, rendered_size: Optional[int]) -> Dict[str, Any]:
+        dates = [entry["date"] for entry in self.entries(quarter)]
+        return {"entries": len(dates), "first": min(dates, default=None), "last": max(dates, default=None),
+                "size": os.path.getsize(self.quarter_path(quarter)), "archived": archived,
+                "rendered_size": rendered_size}
+
+    def rebuild_index(self) -> Dict[str, Dict[str, Any]]:
+        """扫描季度文件重建索引；季度归档文件已存在的季度视为已归档（需要时重新渲染）"""
+        quarters: Dict[str, Dict[str, Any]] = {}
+        self._quarters = quarters
+        for name in sorted(os.listdir(self.directory)):
+            match = QUARTER_FILE_PATTERN.match(name)
+            if match:
+                quarter = match.group(1)
+                archived = os.path.exists(os.path.join(self.archive_dir, f"changelog_{quarter}.md"))
+                quarters[quarter] = self._describe(quarter, archived, None)
+        self.save_index()
+        log.info(f"🗂️ CHANGELOG 索引已重建: {self.index_path}（{len(quarters)} 个季度）")
+        return quarters
+
+    def migrate(self) -> Dict[str, Dict[str, Any]]:
+        """
+        从现有的 CHANGELOG.md 和季度归档文件导入条目（同一时间的条目只保留一条）
+        季度归档文件中的季度记为已归档且无需重新渲染，现有归档文件保持原样
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        archived = set()
+        sources = [self.changelog_file]
+        if os.path.isdir(self.archive_dir):
+            for name in sorted(os.listdir(self.archive_dir)):
+                if ARCHIVE_FILE_PATTERN.match(name):
+                    sources.append(os.path.join(self.archive_dir, name))
+                    archived.add(name[len("changelog_"):-len(".md")])
+        for path in sources:
+            for date, body in read_markdown_entries(path):
+                records.setdefault(date, markdown_record(date, body))
+        self._write_quarters(list(records.values()), archived)
+        for quarter in archived & set(self.quarters):
+            self.quarters[quarter]["rendered_size"] = self.quarters[quarter]["size"]
+        self.save_index()
+        if records:
+            log.info(f"✅ 已从 markdown 导入 {len(records)} 个 CHANGELOG 条目（{len(self.quarters)} 个季度）")
+        return self.quarters
+
+    def _write_quarters(self, records: List[Dict[str, Any]], archived: Optional[set] = None):
+        """
+        按季度重写全部季度文件（按时间升序），删除不再有条目的季度文件
+        archived 为已归档的季度（默认早于当前季度的全部季度），均记为待渲染
+        """
+        by_quarter: Dict[str, List[Dict[str, Any]]] = {}
+        for record in sorted(records, key=lambda record: record["date"]):
+            by_quarter.setdefault(quarter_of(record["date"]), []).append(record)
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            match = QUARTER_FILE_PATTERN.match(name)
+            if match and match.group(1) not in by_quarter:
+                os.remove(os.path.join(self.directory, name))
+        current = current_quarter()
+        self._quarters = {}
+        for quarter, items in by_quarter.items():
+            path = self.quarter_path(quarter)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in items:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, path)
+            is_archived = quarter in archived if archived is not None else quarter < current
+            self._quarters[quarter] = self._describe(quarter, is_archived, None)
+
+    def entries(self, quarter: str) -> List[Dict[str, Any]]:
+        """季度内的全部条目（按写入顺序）"""
+        path = self.quarter_path(quarter)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def all_entries(self) -> List[Dict[str, Any]]:
+        return [entry for quarter in sorted(self.quarters) for entry in self.entries(quarter)]
+
+    def add(self, date: str, changes: List[Dict[str, Any]]) -> str:
+        """追加一条检测结果，返回所属季度"""
+        quarter = quarter_of(date)
+        # 先加载（必要时重建）索引再追加，否则重建时会把这一行也算进去，条目数多计一次
+        meta = self.quarters.setdefault(quarter, {"entries": 0, "first": None, "last": None, "size": 0,
+                                                  "archived": False, "rendered_size": None})
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.quarter_path(quarter), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"date": date, "changes": changes}, ensure_ascii=False) + "\n")
+        meta["entries"] += 1
+        meta["first"] = min(filter(None, (meta["first"], date)))
+        meta["last"] = max(filter(None, (meta["last"], date)))
+        meta["size"] = os.path.getsize(self.quarter_path(quarter))
+        self.save_index()
+        return quarter
+
+    def replace(self, records: List[Dict[str, Any]]):
+        """用给定的条目重写整个存储（回填）；早于当前季度的季度记为已归档"""
+        self._write_quarters(records)
+        self.save_index()
+
+    def archive(self, before: Optional[str] = None) -> Tuple[int, List[str]]:
+        """把早于 before（默认当前季度）的未归档季度标记为已归档并渲染，返回 (归档条目数, 归档文件名)"""
+        before = before or current_quarter()
+        pending = [quarter for quarter, meta in sorted(self.quarters.items())
+                   if quarter < before and not meta["archived"] and meta["entries"]]
+        for quarter in pending:
+            self.quarters[quarter]["archived"] = True
+        self.save_index()
+        files = self.render() if pending else []
+        return sum(self.quarters[quarter]["entries"] for quarter in pending), files
+
+    def render(self, force: bool = False) -> List[str]:
+        """
+        渲染条目有变化的已归档季度文件，再渲染 CHANGELOG.md；返回重新渲染的季度归档文件名
+        force 时删除季度归档目录中不属于存储的文件并重新渲染全部季度
+        """
+        from max_changelog_archiver import MaxChangelogArchiver
+
+        archiver = MaxChangelogArchiver(self.changelog_file, self.archive_dir)
+        archiver.ensure_archive_directory()
+        rendered = []
+        archived = {quarter for quarter, meta in self.quarters.items() if meta["archived"]}
+        if force:
+            for name in os.listdir(self.archive_dir):
+                if ARCHIVE_FILE_PATTERN.match(name) and name[len("changelog_"):-len(".md")] not in archived:
+                    os.remove(os.path.join(self.archive_dir, name))
+        for quarter in sorted(archived):
+            meta = self.quarters[quarter]
+            if force or meta["rendered_size"] != meta["size"]:
+                bodies = [render_entry(entry).rstrip() for entry in self.sorted_entries(quarter)]
+                filename = archiver.create_quarterly_archive(bodies, quarter)
+                if filename:
+                    rendered.append(filename)
+                meta["rendered_size"] = meta["size"]
+        if rendered:
+            self.save_index()
+        self.render_main(archiver)
+        return rendered
+
+    def sorted_entries(self, quarter: str) -> List[Dict[str, Any]]:
+        """季度内的条目，最新的在前"""
+        return sorted(self.entries(quarter), key=lambda entry: entry["date"], reverse=True)
+
+    def render_main(self, archiver):
+        """渲染 CHANGELOG.md：归档链接表 + 当前季度及尚未归档的季度（最新的在前）"""
+        open_quarters = {quarter for quarter, meta in self.quarters.items() if not meta["archived"]}
+        open_quarters.add(current_quarter())
+        content = ""
+        for quarter in sorted(open_quarters, reverse=True):
+            if content:
+                content += f"{quarter_header(quarter)}\n"
+            bodies = [render_entry(entry) for entry in self.sorted_entries(quarter)]
+            content += "".join(body.rstrip() + "\n\n" for body in bodies) if bodies else f"\n{EMPTY_QUARTER_NOTE}\n\n"
+        header = archiver.header_template.format(
+            archive_links=archiver.generate_archive_links(archiver.get_existing_archives()),
+            current_quarter_header=quarter_header(max(open_quarters)))
+        with open(self.changelog_file, 'w', encoding='utf-8') as f:
+            f.write(header + content)
+        log.info(f"✅ Changelog已更新: {self.changelog_file}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CHANGELOG 存储命令行入口（python max_changelog_store.py / python max_cli.py changelog）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max CHANGELOG 结构化存储（changelog_data/）")
+    parser.add_argument("action", choices=["show", "render", "migrate"], nargs="?", default="show")
+    args = parser.parse_args(argv)
+
+    store = ChangelogStore()
+    if args.action == "migrate":
+        shutil.rmtree(store.directory, ignore_errors=True)
+        store.migrate()
+    elif args.action == "render":
+        rendered = store.render(force=True)
+        log.info(f"✅ 已渲染 {len(rendered)} 个季度归档文件和 {store.changelog_file}")
+    for quarter, meta in sorted(store.quarters.items(), reverse=True):
+        state = "已归档" if meta["archived"] else "当前"
+        print(f"{quarter}: {meta['entries']} 个条目（{meta['first']} ~ {meta['last']}），{state}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
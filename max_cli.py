@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 统一命令行入口
+
+用法:
+  python max_cli.py scrape      # 抓取全球价格（同 python max_scraper.py）
+  python max_cli.py convert     # 汇率转换（同 python max_rate_converter.py）
+  python max_cli.py detect      # 价格变化检测（同 python max_price_change_detector.py）
+  python max_cli.py pipeline    # 抓取 → 转换 → 检测 → 归档（单进程，同 python max_pipeline.py）
+  python max_cli.py archive     # CHANGELOG 季度归档
+  python max_cli.py changelog   # CHANGELOG 结构化存储（show / render / migrate）
+  python max_cli.py backfill    # 由归档快照重新生成 CHANGELOG 和季度归档
+  python max_cli.py manifest    # 归档清单（show / rebuild）
+  python max_cli.py snapshots   # 快照存储（stats / pack / verify / gc）
+  python max_cli.py history     # 价格历史库（ingest / query / stats）
+  python max_cli.py summary     # 变化摘要日志（show / migrate / rebuild）
+  python max_cli.py reprice     # 历史快照批量重算
+  python max_cli.py reference   # 重新编译参考数据
+  python max_cli.py benchmark   # 性能基准测试
+  python max_cli.py <子命令> --help
+
+子命令只在被调用时才导入对应模块；httpx/BeautifulSoup/requests 等重依赖由各模块在真正用到时再导入。
+各子命令的启动预算见 STARTUP_BUDGET_MS，由 python max_benchmark.py cli-startup 检查
+"""
+
+import importlib
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# 子命令 -> (模块, 入口函数, 说明)；入口函数接收剩余的命令行参数
+COMMANDS: Dict[str, Tuple[str, str, str]] = {
+    "scrape": ("max_scraper", "cli", "抓取全球 HBO Max 订阅价格"),
+    "convert": ("max_rate_converter", "cli", "汇率转换，生成排行榜和 CNY 排序文件"),
+    "detect": ("max_price_change_detector", "cli", "检测价格变化并更新 CHANGELOG"),
+    "pipeline": ("max_pipeline", "cli", "单进程流水线：抓取 → 转换 → 检测 → 归档"),
+    "archive": ("max_changelog_archiver", "main", "CHANGELOG 季度归档"),
+    "changelog": ("max_changelog_store", "main", "CHANGELOG 结构化存储：查看各季度条目，重新渲染 markdown"),
+    "backfill": ("max_backfill", "main", "由归档快照并行重算全部变化，重新生成 CHANGELOG"),
+    "manifest": ("max_archive", "main", "查看或重建归档清单 archive/manifest.json"),
+    "snapshots": ("max_snapshot_store", "main", "快照存储：把归档快照转换为压缩去重的对象，检查和清理对象"),
+    "history": ("max_history_store", "main", "价格历史库：导入归档快照，按国家或套餐查询历史价格"),
+    "summary": ("max_summary_log", "main", "变化摘要日志：按时间范围查看，导入旧的摘要文件"),
+    "reprice": ("max_repricing", "main", "按历史汇率批量重算归档快照"),
+    "reference": ("max_reference.__main__", "main", "重新编译参考数据"),
+    "benchmark": ("max_benchmark", "main", "性能基准测试"),
+}
+
+# 各子命令的启动预算（毫秒）：导入子命令模块及其依赖的耗时（-X importtime 累计，不含解释器自身）
+# convert/reprice 的换算需要 numpy，scrape 需要 asyncio，其余子命令只读写 JSON
+STARTUP_BUDGET_MS: Dict[str, float] = {
+    "scrape": 120,
+    "convert": 200,
+    "detect": 30,
+    "pipeline": 30,
+    "archive": 30,
+    "changelog": 30,
+    "backfill": 30,
+    "manifest": 30,
+    "snapshots": 30,
+    "history": 30,
+    "summary": 30,
+    "reprice": 200,
+    "reference": 30,
+    "benchmark": 50,
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS) + 2
+    lines = ["用法: python max_cli.py <子命令> [参数]", "", "子命令:"]
+    lines += [f"  {name.ljust(width)}{help_text}" for name, (_, _, help_text) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"❌ 未知子命令: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    module_name, func_name, _ = COMMANDS[command]
+    module = importlib.import_module(module_name)
+    # 各脚本的入口函数把 sys.argv[0] 用作帮助信息中的程序名
+    sys.argv = [f"max_cli.py {command}"] + rest
+    result = getattr(module, func_name)(rest)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
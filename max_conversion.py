@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 向量化汇率转换
+按货币建立一次汇率向量，再用一次 NumPy 运算把所有套餐价格同时换算成多个目标货币
+缺失的汇率统一收集，转换结束后只报告一次
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from max_logger import get_logger
+
+log = get_logger("conversion")
+
+BASE_CURRENCY = 'USD'
+# 默认目标货币；MAX_EXTRA_TARGETS 可追加（逗号分隔，如 "JPY,GBP"）
+DEFAULT_TARGETS = ('CNY', 'USD', 'EUR')
+
+
+def configured_targets() -> List[str]:
+    targets = list(DEFAULT_TARGETS)
+    for code in os.getenv("MAX_EXTRA_TARGETS", "").split(","):
+        code = code.strip().upper()
+        if code and code not in targets:
+            targets.append(code)
+    return targets
+
+
+def price_field(currency: str) -> str:
+    """目标货币对应的输出字段名，如 CNY -> price_cny"""
+    return f"price_{currency.lower()}"
+
+
+class ConversionEngine:
+    """
+    rates 为以 USD 为基准的汇率表（1 USD = rates[X] 单位 X）
+    换算：amount / rate[源货币] * rate[目标货币]；汇率缺失的结果为 NaN
+    """
+
+    def __init__(self, rates: Dict[str, float], targets: Optional[Sequence[str]] = None,
+                 base: str = BASE_CURRENCY):
+        self.base = base
+        self.rates = dict(rates)
+        self.rates.setdefault(base, 1.0)
+        self.targets = list(targets) if targets else configured_targets()
+        # 缺失汇率的货币 -> 受影响的价格数量，convert 结束后统一报告
+        self.missing: Dict[str, int] = {}
+
+    def rate_vector(self, currencies: Sequence[str]) -> np.ndarray:
+        """每种货币查一次汇率，再按索引展开成与价格等长的向量"""
+        unique, inverse = np.unique(np.asarray(currencies, dtype=object).astype(str), return_inverse=True)
+        table = np.array([self.rates.get(code, np.nan) for code in unique], dtype=float)
+        table[table <= 0] = np.nan
+        for code, rate, count in zip(unique, table, np.bincount(inverse, minlength=len(unique))):
+            if np.isnan(rate):
+                self.missing[code] = self.missing.get(code, 0) + int(count)
+        return table[inverse]
+
+    def convert(self, amounts: Iterable[float], currencies: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        一次换算全部价格到所有目标货币，返回 {目标货币: 结果数组}
+        非正数价格和缺失汇率的结果为 NaN（与逐条转换时返回 None 一致）
+        """
+        values = np.asarray(list(amounts), dtype=float)
+        if values.size == 0:
+            return {target: values.copy() for target in self.targets}
+        values = np.where(values > 0, values, np.nan)
+        base_amounts = values / self.rate_vector(currencies)
+        results = {}
+        for target in self.targets:
+            target_rate = self.rates.get(target)
+            if not target_rate or target_rate <= 0:
+                self.missing[target] = self.missing.get(target, 0) + int(values.size)
+                results[target] = np.full(values.size, np.nan)
+                continue
+            converted = base_amounts * target_rate
+            # 源货币与目标货币相同时直接保留原价，避免浮点往返误差
+            same = np.asarray(currencies, dtype=object) == target
+            results[target] = np.where(same, values, converted)
+        return results
+
+    def report_missing(self):
+        """统一报告缺失的汇率（每种货币一行）"""
+        for code, count in sorted(self.missing.items()):
+            log.warning(f"⚠️ 未找到货币汇率: {code}（影响 {count} 个价格）")
+
+
+def to_optional(value: float, digits: int = 2) -> Optional[float]:
+    """NaN -> None，其他四舍五入为普通 float（便于写入 JSON）"""
+    if value != value:  # NaN
+        return None
+    return round(float(value), digits)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 快照对比引擎
+两份转换结果（max_prices_cny_sorted*.json）之间的套餐变化：
+- 套餐以 (国家, 套餐名, 计费周期分组, 货币) 为键；同一国家同名套餐分属月付和年付时不再互相覆盖
+  （如 TW/HK 的 Mobile），同一个键出现多次时按在快照中的先后顺序依次配对
+- 每份快照只抽取一次紧凑记录（键 + 价格 + 原套餐引用，三列平行存放），排序后单次归并，
+  只为产生事件的套餐读取展示字段，不再复制两整份字典
+- 记录中不为每个套餐创建元组：键是字符串，排序的是下标，10 万套餐时也不会因为大量新建容器对象
+  反复触发分代垃圾回收，每套餐耗时随规模基本持平
+- 事件类型：price_change（涨价/降价）、new_plan、removed_plan、cycle_change（同名同货币套餐换了计费周期）
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import max_reference
+
+# 人民币价格变化超过该值才算变化
+PRICE_THRESHOLD = 0.01
+
+# 对比键：国家、套餐名、周期分组、货币以 \x00 拼接成一个字符串
+# \x00 小于任何可见字符，字符串的排序与按 (国家, 套餐名, 周期分组, 货币) 元组排序一致
+KEY_SEP = "\x00"
+
+# 一份快照按对比键排序后的紧凑记录：(对比键, 人民币价格, 原套餐) 三列平行的列表
+Records = Tuple[List[str], List[float], List[Dict[str, Any]]]
+
+
+def country_display_name(country_code: str) -> str:
+    """旧快照的套餐记录中没有 country_name 时，按国家代码从参考数据中取英文名"""
+    return max_reference.country_names().get(country_code.lower(), country_code)
+
+
+def plan_records(data: Dict[str, Any]) -> Records:
+    """抽取快照中带人民币价格的套餐，按对比键排序"""
+    keys: List[str] = []
+    prices: List[float] = []
+    plans: List[Dict[str, Any]] = []
+    for country, country_data in data.items():
+        if country.startswith('_') or not isinstance(country_data, dict):  # 跳过元数据
+            continue
+        for plan in country_data.get('plans', ()):
+            if isinstance(plan, dict) and 'price_cny' in plan:
+                keys.append(KEY_SEP.join((country, plan.get('plan_name') or '', plan.get('plan_group') or '',
+                                          plan.get('original_currency') or '')))
+                prices.append(float(plan['price_cny']))
+                plans.append(plan)
+    # 稳定排序：同一个键的多个套餐保持快照中的先后顺序，归并时按顺序依次配对
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return [keys[i] for i in order], [prices[i] for i in order], [plans[i] for i in order]
+
+
+def _plan_fields(key: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+    country, plan_name, plan_group, _ = key.split(KEY_SEP)
+    return {
+        'country': plan.get('country_name') or country_display_name(country),
+        'plan': plan_name,
+        'original_price': plan.get('original_price', 'N/A'),
+        'currency': plan.get('original_currency', 'N/A'),
+        'billing_cycle': plan.get('billing_cycle', '未知周期'),
+        'plan_group': plan_group,
+    }
+
+
+def _price_delta(old_cny: float, new_cny: float) -> Dict[str, float]:
+    change_amount = new_cny - old_cny
+    return {
+        'old_price_cny': old_cny,
+        'new_price_cny': new_cny,
+        'change_amount': change_amount,
+        'change_percent': (change_amount / old_cny) * 100 if old_cny > 0 else 0,
+    }
+
+
+def diff_records(old_records: Records, new_records: Records,
+                 threshold: float = PRICE_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    对两份已排序的记录做归并，返回变化事件列表
+    同一个键在两边各有多条时依次配对，多出的部分成为新增或移除
+    """
+    old_keys, old_prices, old_plans = old_records
+    new_keys, new_prices, new_plans = new_records
+    changes: List[Dict[str, Any]] = []
+    unmatched_old: List[int] = []
+    unmatched_new: List[int] = []
+    i = j = 0
+    while i < len(old_keys) and j < len(new_keys):
+        old_key, new_key = old_keys[i], new_keys[j]
+        if old_key == new_key:
+            if abs(old_prices[i] - new_prices[j]) > threshold:
+                changes.append({**_plan_fields(new_key, new_plans[j]), **_price_delta(old_prices[i], new_prices[j]),
+                                'type': 'price_change'})
+            i += 1
+            j += 1
+        elif old_key < new_key:
+            unmatched_old.append(i)
+            i += 1
+        else:
+            unmatched_new.append(j)
+            j += 1
+    unmatched_old.extend(range(i, len(old_keys)))
+    unmatched_new.extend(range(j, len(new_keys)))
+
+    # 未配对的套餐中，同一国家、同名、同货币但周期分组不同的视为计费周期变化
+    # （同一个完整键不会在两边同时未配对，因此候选的周期分组一定不同）
+    removed_by_plan: Dict[Tuple[str, str, str], List[int]] = {}
+    for i in unmatched_old:
+        country, plan_name, _, currency = old_keys[i].split(KEY_SEP)
+        removed_by_plan.setdefault((country, plan_name, currency), []).append(i)
+    added = []
+    for j in unmatched_new:
+        country, plan_name, _, currency = new_keys[j].split(KEY_SEP)
+        candidates = removed_by_plan.get((country, plan_name, currency))
+        if candidates:
+            i = candidates.pop(0)
+            changes.append({**_plan_fields(new_keys[j], new_plans[j]), **_price_delta(old_prices[i], new_prices[j]),
+                            'old_billing_cycle': old_plans[i].get('billing_cycle', '未知周期'),
+                            'old_plan_group': old_keys[i].split(KEY_SEP)[2], 'type': 'cycle_change'})
+        else:
+            added.append(j)
+
+    for j in added:
+        changes.append({**_plan_fields(new_keys[j], new_plans[j]), 'new_price_cny': new_prices[j], 'type': 'new_plan'})
+    for candidates in removed_by_plan.values():
+        for i in candidates:
+            changes.append({**_plan_fields(old_keys[i], old_plans[i]), 'old_price_cny': old_prices[i],
+                            'type': 'removed_plan'})
+    return changes
+
+
+def diff_snapshots(old_data: Dict[str, Any], new_data: Dict[str, Any],
+                   threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """对比两份转换结果，返回变化事件列表"""
+    return diff_records(plan_records(old_data), plan_records(new_data),
+                        PRICE_THRESHOLD if threshold is None else threshold)
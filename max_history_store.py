@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 价格历史库
+把 archive/ 中的全部转换结果（cny_sorted）导入一个 SQLite 文件（默认 max_prices_history.db），
+每个套餐价格一行：(时间戳, 国家, 套餐, 周期分组, 货币, 本币价格, 人民币价格)
+- 导入以归档清单为准且是增量的：只导入新增或内容哈希变化的快照，清单中已删除的快照一并删除
+- 流水线写出新归档后直接把内存中的转换结果写入历史库，不再重新读取 JSON
+- (国家, 套餐, 时间戳) 和 (套餐, 时间戳) 上有索引，单个国家或单个套餐的历史查询只读取相关的行；
+  国家和套餐名比较时不区分大小写
+
+用法:
+  python max_history_store.py ingest                              # 按归档清单增量导入
+  python max_history_store.py query --country AR --plan Ultimate   # 阿根廷 Ultimate 的价格历史
+  python max_history_store.py query --plan Ultimate --cycle yearly --since 2025
+  python max_history_store.py stats
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from max_logger import get_logger
+
+log = get_logger("history")
+
+HISTORY_DB = os.getenv("MAX_HISTORY_DB") or "max_prices_history.db"
+# 库结构版本：修改表结构时递增，旧版本的库会被清空后重新导入
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    plans INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    country TEXT NOT NULL COLLATE NOCASE,
+    plan TEXT NOT NULL COLLATE NOCASE,
+    cycle TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    price_number REAL,
+    price_cny REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prices_by_country ON prices (country, plan, timestamp);
+CREATE INDEX IF NOT EXISTS prices_by_plan ON prices (plan, timestamp);
+CREATE INDEX IF NOT EXISTS prices_by_snapshot ON prices (snapshot_id);
+"""
+COLUMNS = ("timestamp", "country", "plan", "cycle", "currency", "price_number", "price_cny")
+
+# prices 表的一行（不含 snapshot_id）
+Row = Tuple[str, str, str, str, str, Optional[float], float]
+
+
+def price_rows(timestamp: str, data: Dict[str, Any]) -> Iterator[Row]:
+    """转换结果中带人民币价格的套餐 -> prices 行"""
+    for country, country_data in data.items():
+        if country.startswith('_') or not isinstance(country_data, dict):  # 跳过元数据
+            continue
+        for plan in country_data.get('plans', ()):
+            if isinstance(plan, dict) and 'price_cny' in plan:
+                yield (timestamp, country, plan.get('plan_name') or '', plan.get('plan_group') or '',
+                       plan.get('original_currency') or '', plan.get('original_price_number'),
+                       float(plan['price_cny']))
+
+
+def timestamp_bound(text: str, upper: bool = False) -> str:
+    """时间范围参数（2025、2025-07、20250701、20250701_120000 等）-> 可与归档时间戳直接比较的边界"""
+    digits = ''.join(ch for ch in text if ch.isdigit())
+    if not digits or len(digits) > 14 or len(digits) % 2:
+        raise ValueError(f"无法识别的时间: {text}")
+    digits = digits.ljust(14, '9' if upper else '0')
+    return f"{digits[:8]}_{digits[8:]}"
+
+
+class HistoryStore:
+    """价格历史 SQLite 库"""
+
+    def __init__(self, path: str = HISTORY_DB):
+        import sqlite3
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS prices")
+                self.conn.execute("DROP TABLE IF EXISTS snapshots")
+                self.conn.executescript(SCHEMA)
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_snapshot(self, entry: Dict[str, Any], data: Dict[str, Any]) -> int:
+        """写入一份快照（归档清单条目 + 转换结果），返回写入的行数；调用方负责提交事务"""
+        cursor = self.conn.execute(
+            "INSERT INTO snapshots (path, timestamp, sha256, plans) VALUES (?, ?, ?, 0)",
+            (entry["path"], entry["timestamp"], entry["sha256"]))
+        snapshot_id = cursor.lastrowid
+        count = self.conn.executemany(
+            "INSERT INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((snapshot_id,) + row for row in price_rows(entry["timestamp"], data))).rowcount
+        self.conn.execute("UPDATE snapshots SET plans = ? WHERE id = ?", (count, snapshot_id))
+        return count
+
+    def sync(self, manifest, loaded: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+        """
+        按归档清单增量导入 cny_sorted 快照，返回 {"added", "removed", "rows"}
+        loaded 为 {清单路径: 已在内存中的转换结果}，这些快照不再重新读取
+        """
+        from max_snapshot_store import load_snapshot
+
+        loaded = loaded or {}
+        entries = {entry["path"]: entry for entry in manifest.entries["cny_sorted"]}
+        known = {path: (snapshot_id, sha256) for snapshot_id, path, sha256
+                 in self.conn.execute("SELECT id, path, sha256 FROM snapshots")}
+        removed = [snapshot_id for path, (snapshot_id, sha256) in known.items()
+                   if path not in entries or entries[path]["sha256"] != sha256]
+        added = [entry for path, entry in entries.items() if path not in known or known[path][1] != entry["sha256"]]
+        rows = 0
+        with self.conn:
+            self.conn.executemany("DELETE FROM snapshots WHERE id = ?", ((snapshot_id,) for snapshot_id in removed))
+            for entry in added:
+                data = loaded.get(entry["path"])
+                if data is None:
+                    try:
+                        data = load_snapshot(manifest.resolve(entry))
+                    except (OSError, ValueError) as e:
+                        log.warning(f"⚠️ 跳过无法读取的快照: {entry['path']} - {e}")
+                        continue
+                rows += self.add_snapshot(entry, data)
+        return {"added": len(added), "removed": len(removed), "rows": rows}
+
+    def history(self, country: Optional[str] = None, plan: Optional[str] = None, cycle: Optional[str] = None,
+                currency: Optional[str] = None, since: Optional[str] = None,
+                until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按条件查询价格历史（按时间升序）；since/until 为 timestamp_bound 的结果"""
+        conditions, params = [], []
+        for column, value in (("country", country), ("plan", plan), ("cycle", cycle), ("currency", currency)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT {', '.join(COLUMNS)} FROM prices {where} ORDER BY timestamp, country, plan, cycle"
+        return [dict(zip(COLUMNS, row)) for row in self.conn.execute(query, params)]
+
+    def stats(self) -> Dict[str, Any]:
+        snapshots, first, last = self.conn.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM snapshots").fetchone()
+        rows = self.conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+        return {"snapshots": snapshots, "rows": rows, "first": first, "last": last,
+                "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+def resolve_country(text: str) -> str:
+    """国家代码或英文国家名 -> 快照中的国家代码（大写）"""
+    import max_reference
+
+    if len(text) == 2:
+        return text.upper()
+    for code, name in max_reference.country_names().items():
+        if name.lower() == text.lower():
+            return code.upper()
+    return text
+
+
+def print_history(rows: List[Dict[str, Any]], limit: int):
+    print(f"{'时间戳':<16} {'国家':<6} {'套餐':<24} {'周期':<8} {'货币':<5} {'本币价格':>12} {'人民币':>10}")
+    for row in rows[-limit:] if limit else rows:
+        number = f"{row['price_number']:,.2f}" if row['price_number'] is not None else '-'
+        print(f"{row['timestamp']:<16} {row['country']:<6} {row['plan'][:24]:<24} {row['cycle']:<8} "
+              f"{row['currency']:<5} {number:>12} {row['price_cny']:>10.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """价格历史库命令行入口（python max_history_store.py / python max_cli.py history）"""
+    import argparse
+    from max_archive import ARCHIVE_DIR, ArchiveManifest
+
+    parser = argparse.ArgumentParser(description="HBO Max 价格历史库（由归档快照导入的 SQLite）")
+    parser.add_argument("action", choices=["ingest", "query", "stats"], nargs="?", default="query")
+    parser.add_argument("--db", default=HISTORY_DB, help="历史库路径（也可用 MAX_HISTORY_DB）")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="归档目录")
+    parser.add_argument("--country", default="", help="国家代码或英文国家名，如 AR / Argentina")
+    parser.add_argument("--plan", default="", help="套餐名，如 Ultimate（不区分大小写）")
+    parser.add_argument("--cycle", default="", help="周期分组：monthly / yearly / unknown")
+    parser.add_argument("--currency", default="", help="本币代码")
+    parser.add_argument("--since", default="", help="起始时间（含），如 2025 或 2025-07-01")
+    parser.add_argument("--until", default="", help="结束时间（含）")
+    parser.add_argument("--limit", type=int, default=50, help="最多显示最近的多少行（0 表示全部）")
+    parser.add_argument("--json", dest="json_path", default="", help="把查询结果保存为 JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        since = timestamp_bound(args.since) if args.since else None
+        until = timestamp_bound(args.until, upper=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    with HistoryStore(args.db) as store:
+        if args.action == "ingest":
+            start = time.perf_counter()
+            result = store.sync(ArchiveManifest(args.archive_dir))
+            log.info(f"✅ 导入 {result['added']} 份快照（{result['rows']} 行），删除 {result['removed']} 份，"
+                     f"耗时 {time.perf_counter() - start:.2f}s")
+        if args.action in ("ingest", "stats"):
+            stats = store.stats()
+            print(f"{args.db}: {stats['snapshots']} 份快照，{stats['rows']} 行，"
+                  f"{stats['first'] or '-'} ~ {stats['last'] or '-'}，{stats['size_bytes'] / 1024:.0f} KB")
+            return 0
+
+        start = time.perf_counter()
+        rows = store.history(resolve_country(args.country) if args.country else None, args.plan or None,
+                             args.cycle or None, args.currency.upper() or None, since, until)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    print_history(rows, args.limit)
+    print(f"\n共 {len(rows)} 行，查询耗时 {elapsed_ms:.1f} ms")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+        log.info(f"✅ 查询结果已保存到: {args.json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
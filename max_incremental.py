@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 增量转换
+为每个国家记录指纹：原始套餐内容的哈希 + 该国用到的源货币汇率。
+再次转换时只有指纹变化的国家需要重新换算，其余国家直接沿用上一次输出中的条目：
+- 原始套餐（名称、价格、周期等）有任何变化 -> 重新换算
+- 源货币或目标货币的汇率变化超过容差（相对值，MAX_RATE_TOLERANCE，默认 0.1%）-> 重新换算
+- 目标货币列表变化 -> 全量转换；排行榜定义变化 -> 国家仍按指纹增量处理，排行榜全部重新生成
+指纹保存在输出文件的 _metadata.fingerprints 中
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from max_logger import get_logger
+
+log = get_logger("incremental")
+
+RATE_TOLERANCE = float(os.getenv("MAX_RATE_TOLERANCE", "0.001"))
+FINGERPRINT_VERSION = 1
+
+
+def plans_fingerprint(country_data: Dict[str, Any]) -> str:
+    """原始国家数据中影响转换结果的部分（国家名和套餐列表）的哈希"""
+    payload = {
+        "country_code": country_data.get('country_code', ''),
+        "country_name": country_data.get('country_name', ''),
+        "plans": country_data.get('plans', []),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def country_fingerprint(country_data: Dict[str, Any], rates: Dict[str, float]) -> Dict[str, Any]:
+    currencies = sorted({plan.get('currency', 'USD') for plan in country_data.get('plans', [])})
+    return {
+        "plans": plans_fingerprint(country_data),
+        "rates": {currency: rates.get(currency) for currency in currencies},
+    }
+
+
+def rates_moved(old: Dict[str, Optional[float]], new: Dict[str, Optional[float]],
+                tolerance: float = RATE_TOLERANCE) -> bool:
+    """任一货币的汇率相对变化超过容差，或汇率从有到无/从无到有"""
+    for currency in set(old) | set(new):
+        before, after = old.get(currency), new.get(currency)
+        if not before or not after:
+            if before != after:
+                return True
+            continue
+        if abs(after / before - 1) > tolerance:
+            return True
+    return False
+
+
+def build_fingerprints(price_data: Dict[str, Any], rates: Dict[str, float], targets: List[str],
+                       leaderboards: str) -> Dict[str, Any]:
+    return {
+        "version": FINGERPRINT_VERSION,
+        "targets": list(targets),
+        "target_rates": {target: rates.get(target) for target in targets},
+        "leaderboards": leaderboards,
+        "countries": {code: country_fingerprint(data, rates) for code, data in price_data.items()},
+    }
+
+
+def load_previous(output_file: str) -> Optional[Dict[str, Any]]:
+    """读取上一次的输出文件；没有指纹（旧格式或全量文件缺失）时返回 None"""
+    if not os.path.exists(output_file):
+        return None
+    from max_snapshot_store import load_snapshot
+
+    try:
+        previous = load_snapshot(output_file)
+    except (OSError, ValueError) as e:
+        log.warning(f"⚠️ 无法读取上一次的输出，改为全量转换: {output_file} - {e}")
+        return None
+    fingerprints = previous.get("_metadata", {}).get("fingerprints")
+    if not isinstance(fingerprints, dict) or fingerprints.get("version") != FINGERPRINT_VERSION:
+        log.info("ℹ️ 上一次的输出没有指纹，改为全量转换")
+        return None
+    return previous
+
+
+def dirty_countries(previous: Optional[Dict[str, Any]], current: Dict[str, Any],
+                    tolerance: float = RATE_TOLERANCE) -> Set[str]:
+    """
+    需要重新换算的国家；previous 为 None、目标货币变化或目标汇率超出容差时返回全部国家
+    上一次转换失败（输出中没有条目）的国家总是重新处理
+    """
+    countries = set(current["countries"])
+    if previous is None:
+        return countries
+    old = previous["_metadata"]["fingerprints"]
+    if old.get("targets") != current["targets"]:
+        log.info("ℹ️ 目标货币变化，全量转换")
+        return countries
+    if rates_moved(old.get("target_rates", {}), current["target_rates"], tolerance):
+        log.info("ℹ️ 目标货币汇率变化超过容差，全量转换")
+        return countries
+
+    old_countries = old.get("countries", {})
+    dirty = set()
+    for code, fingerprint in current["countries"].items():
+        before = old_countries.get(code)
+        if (before is None or code not in previous
+                or before.get("plans") != fingerprint["plans"]
+                or rates_moved(before.get("rates", {}), fingerprint["rates"], tolerance)):
+            dirty.add(code)
+    return dirty
+
+
+def carried_fingerprints(previous: Optional[Dict[str, Any]], current: Dict[str, Any],
+                         reused: Iterable[str], tolerance: float = RATE_TOLERANCE) -> Dict[str, Any]:
+    """
+    沿用的国家保留上一次的汇率指纹：容差内的小幅波动不会逐次累积，
+    一直与实际换算时使用的汇率比较
+    """
+    if previous is None:
+        return current
+    old_countries = previous["_metadata"]["fingerprints"].get("countries", {})
+    countries = dict(current["countries"])
+    for code in reused:
+        if code in old_countries:
+            countries[code] = old_countries[code]
+    target_rates = previous["_metadata"]["fingerprints"].get("target_rates", {})
+    if not target_rates or rates_moved(target_rates, current["target_rates"], tolerance):
+        # 目标汇率超出容差时已全量转换，以本次汇率为新的比较基准
+        target_rates = current["target_rates"]
+    return dict(current, countries=countries, target_rates=target_rates)
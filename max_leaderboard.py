@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 排行榜引擎
+一次遍历全部套餐：按分类字段的取值把套餐放入定长堆（只保留最便宜的 K 个），
+每种取值组合只计算一次分类标签
+价格相同时按套餐出现顺序排名（与原先的稳定排序一致）
+
+分类由"标签"组合而成：
+- 标签规则：{"name_contains": [...], "plan_group": [...], "billing_cycle_contains": [...],
+  "country_code": [...], "currency": [...]}，任意一个字段命中即打上该标签
+- 排行榜：{"key", "description", "tags": [...], "limit"}，需同时带有全部标签（空列表表示全部套餐）
+可通过 leaderboards.json（或 MAX_LEADERBOARD_CONFIG 指定的文件）追加地区、档位 × 周期等自定义排行榜，
+并覆盖各排行榜的 K 值
+"""
+
+import hashlib
+import heapq
+import json
+import os
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from max_logger import get_logger
+
+log = get_logger("leaderboard")
+
+CONFIG_FILE = os.getenv("MAX_LEADERBOARD_CONFIG", "leaderboards.json")
+DEFAULT_LIMIT = 10
+
+# 内置标签：注意一些国家（如 PH、TR）已将 Ultimate 改名为 Premium，两者是同级别的最高套餐
+DEFAULT_TAGS: Dict[str, Dict[str, List[str]]] = {
+    "monthly": {"plan_group": ["monthly"], "billing_cycle_contains": ["每月"]},
+    "yearly": {"plan_group": ["yearly"], "billing_cycle_contains": ["每年"]},
+    "mobile": {"name_contains": ["mobile"]},
+    "standard": {"name_contains": ["standard"]},
+    "ultimate": {"name_contains": ["ultimate", "premium"]},
+    "premium": {"name_contains": ["premium", "ultimate"]},
+    "basic": {"name_contains": ["basic"]},
+}
+
+# 内置排行榜（输出文件中的键名和顺序保持不变）
+DEFAULT_CATEGORIES: List[Dict[str, Any]] = [
+    {"key": "_top_10_cheapest_all", "description": "最便宜的10个HBO Max套餐（所有类型）", "tags": []},
+    {"key": "_top_10_cheapest_mobile", "description": "最便宜的10个Mobile套餐", "tags": ["mobile"]},
+    {"key": "_top_10_cheapest_standard", "description": "最便宜的10个Standard套餐", "tags": ["standard"]},
+    {"key": "_top_10_cheapest_ultimate", "description": "最便宜的10个Ultimate套餐", "tags": ["ultimate"]},
+    {"key": "_top_10_cheapest_monthly", "description": "最便宜的10个按月付费套餐", "tags": ["monthly"]},
+    {"key": "_top_10_cheapest_yearly", "description": "最便宜的10个按年付费套餐", "tags": ["yearly"]},
+    {"key": "_top_10_cheapest_ultimate_yearly", "description": "最便宜的10个Ultimate年付套餐",
+     "tags": ["yearly", "ultimate"]},
+]
+
+# 标签规则字段 -> (套餐字段, 是否子串匹配)
+RULE_FIELDS = {
+    "name_contains": ("name", True),
+    "billing_cycle_contains": ("billing_cycle", True),
+    "plan_group": ("plan_group", False),
+    "country_code": ("country_code", False),
+    "currency": ("original_currency", False),
+}
+
+
+class Category:
+    """一个排行榜：所需标签和 K 值"""
+
+    __slots__ = ("key", "description", "tags", "limit")
+
+    def __init__(self, key: str, description: str, tags: Iterable[str], limit: int = DEFAULT_LIMIT):
+        self.key = key
+        self.description = description
+        self.tags: FrozenSet[str] = frozenset(tags)
+        self.limit = limit
+
+
+def compile_rule(rule: Dict[str, List[str]]) -> List[Tuple[str, bool, Tuple[str, ...]]]:
+    compiled = []
+    for field, values in rule.items():
+        if field not in RULE_FIELDS:
+            raise ValueError(f"未知的标签规则字段: {field}")
+        plan_field, substring = RULE_FIELDS[field]
+        if substring:
+            values = [value.lower() for value in values]
+        elif field == "country_code":
+            values = [value.upper() for value in values]
+        compiled.append((plan_field, substring, tuple(values)))
+    return compiled
+
+
+def rank_plans(plans: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按顺序附加 rank 和字符串形式的 price_number（输出格式与原 generate_top_cheapest 一致）"""
+    top_plans = []
+    for i, plan in enumerate(plans):
+        top_plan = plan.copy()
+        top_plan['rank'] = i + 1
+        top_plan['price_number'] = str(plan.get('original_price_number', 0))
+        top_plans.append(top_plan)
+    return top_plans
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """读取自定义排行榜配置；文件不存在时返回空配置"""
+    path = path or CONFIG_FILE
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        log.warning(f"⚠️ 排行榜配置读取失败，使用内置排行榜: {path} - {e}")
+        return {}
+
+
+class LeaderboardEngine:
+    """
+    单次遍历生成全部排行榜
+    标签只取决于规则用到的字段（名称、周期等），取值相同的套餐属于同一组排行榜，
+    因此按这些字段的取值（分类签名）各保留一个定长堆：每个套餐只做一次字典查找和一次堆比较，
+    输出时再把属于同一排行榜的签名堆合并取前 K 个
+    堆中元素为 (-价格, -序号, 套餐)：堆顶是当前第 K 名（最贵、同价时最晚出现），
+    新套餐只有严格更便宜时才替换堆顶，因此同价时先出现的套餐排名靠前
+    """
+
+    def __init__(self, categories: Optional[List[Dict[str, Any]]] = None,
+                 tags: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 default_limit: int = DEFAULT_LIMIT, limits: Optional[Dict[str, int]] = None):
+        tag_rules = dict(DEFAULT_TAGS)
+        tag_rules.update(tags or {})
+        limits = limits or {}
+        self.categories = [
+            Category(c["key"], c.get("description", ""), c.get("tags", []),
+                     limits.get(c["key"], c.get("limit", default_limit)))
+            for c in (categories if categories is not None else DEFAULT_CATEGORIES)
+        ]
+        # 只编译排行榜实际用到的标签
+        used = set().union(*(category.tags for category in self.categories)) if self.categories else set()
+        unknown = used - set(tag_rules)
+        if unknown:
+            raise ValueError(f"排行榜引用了未定义的标签: {', '.join(sorted(unknown))}")
+        self.rules = [(tag, compile_rule(tag_rules[tag])) for tag in sorted(used)]
+        self.fields = tuple(sorted({field for _, rule in self.rules for field, _, _ in rule}))
+        # 分类签名（规则字段的取值）-> 所属排行榜 / [定长堆, K]
+        self.members: Dict[Tuple[Any, ...], Tuple[Category, ...]] = {}
+        self.slots: Dict[Tuple[Any, ...], list] = {}
+        self.seen = 0
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None) -> "LeaderboardEngine":
+        """
+        内置排行榜 + 配置文件：
+        {"default_limit": 10, "limits": {键: K}, "tags": {标签: 规则}, "categories": [排行榜, ...]}
+        """
+        config = load_config(path)
+        categories = list(DEFAULT_CATEGORIES)
+        if config.get("replace_defaults"):
+            categories = []
+        categories.extend(config.get("categories", []))
+        return cls(categories, config.get("tags"), config.get("default_limit", DEFAULT_LIMIT),
+                   config.get("limits"))
+
+    def tag(self, plan: Dict[str, Any]) -> FrozenSet[str]:
+        """计算套餐的全部标签"""
+        tags = []
+        lowered: Dict[str, str] = {}
+        for tag, rule in self.rules:
+            for field, substring, values in rule:
+                if substring:
+                    text = lowered.get(field)
+                    if text is None:
+                        text = lowered[field] = str(plan.get(field, '') or '').lower()
+                    if any(value in text for value in values):
+                        break
+                elif plan.get(field) in values:
+                    break
+            else:
+                continue
+            tags.append(tag)
+        return frozenset(tags)
+
+    def _slot(self, signature: Tuple[Any, ...], plan: Dict[str, Any]) -> list:
+        """分类签名对应的定长堆：[堆, K]，K 取该签名所属排行榜中最大的 limit"""
+        tags = self.tag(plan)
+        members = tuple(c for c in self.categories if c.tags <= tags)
+        self.members[signature] = members
+        slot = self.slots[signature] = [[], max((c.limit for c in members), default=0)]
+        return slot
+
+    def members_of(self, plan: Dict[str, Any]) -> Tuple[Category, ...]:
+        """套餐所属的排行榜"""
+        signature = tuple(map(plan.get, self.fields))
+        if signature not in self.members:
+            self._slot(signature, plan)
+        return self.members[signature]
+
+    def fingerprint(self) -> str:
+        """排行榜定义（键名、描述、标签规则、K 值）的指纹；定义变化时增量模式需要重建全部排行榜"""
+        definition = [[c.key, c.description, sorted(c.tags), c.limit] for c in self.categories]
+        definition.append([[tag, [list(part) for part in rule]] for tag, rule in self.rules])
+        return hashlib.sha1(json.dumps(definition, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+    def add(self, plan: Dict[str, Any]):
+        self.add_all((plan,))
+
+    def add_all(self, plans: Iterable[Dict[str, Any]]) -> "LeaderboardEngine":
+        fields, slots = self.fields, self.slots
+        heappush, heapreplace = heapq.heappush, heapq.heapreplace
+        inf = float('inf')
+        seq = self.seen
+        for plan in plans:
+            signature = tuple(map(plan.get, fields))
+            slot = slots.get(signature)
+            if slot is None:
+                slot = self._slot(signature, plan)
+            heap, limit = slot
+            price = plan.get('price_cny')
+            if price is None:
+                price = inf
+            if len(heap) < limit:
+                heappush(heap, (-price, -seq, plan))
+            elif limit and -price > heap[0][0]:
+                heapreplace(heap, (-price, -seq, plan))
+            seq += 1
+        self.seen = seq
+        return self
+
+    def ranked(self, key: str) -> List[Dict[str, Any]]:
+        """
+        排行榜结果：合并所属签名的堆后取前 K 个，按价格升序（同价按出现顺序），
+        附加 rank 和字符串形式的 price_number
+        """
+        category = next(c for c in self.categories if c.key == key)
+        entries = [entry for signature, members in self.members.items() if category in members
+                   for entry in self.slots[signature][0]]
+        entries = heapq.nsmallest(category.limit, entries, key=lambda entry: (-entry[0], -entry[1]))
+        return rank_plans(plan for _, _, plan in entries)
+
+    def results(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {category.key: self.ranked(category.key) for category in self.categories}
+
+    def patch(self, previous: Dict[str, Dict[str, Any]], dirty: Iterable[str],
+              plans_by_country: Dict[str, List[Dict[str, Any]]],
+              updated_at: str) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str]]:
+        """
+        增量更新排行榜：只有重新转换的国家（dirty）会改变排行榜
+        - 排行榜中没有 dirty 国家的套餐、也没有 dirty 国家的新套餐进入 -> 原样保留（包括 updated_at）
+        - 否则去掉 dirty 国家的旧条目，与 dirty 国家的新套餐合并后重新取前 K 个
+        - 排行榜原本已满且有条目被移除时，第 K 名之后的套餐可能补位，只有这种情况才遍历全部套餐重建
+        返回 (段落, 修补的键, 重建的键)；同价排名与完整生成一致（按国家顺序、国家内套餐顺序）
+        """
+        dirty = set(dirty)
+        order = {country: i for i, country in enumerate(plans_by_country)}
+        inf = float('inf')
+
+        def sort_key(country: str, index: int, plan: Dict[str, Any]) -> Tuple[float, int, int]:
+            price = plan.get('price_cny')
+            return (inf if price is None else price, order[country], index)
+
+        candidates: Dict[str, List[Tuple[Tuple[float, int, int], Dict[str, Any]]]] = {
+            c.key: [] for c in self.categories}
+        for country in dirty:
+            for index, plan in enumerate(plans_by_country.get(country, [])):
+                for category in self.members_of(plan):
+                    candidates[category.key].append((sort_key(country, index, plan), plan))
+
+        sections: Dict[str, Dict[str, Any]] = {}
+        patched: List[str] = []
+        rebuilt: List[str] = []
+        for category in self.categories:
+            section = previous.get(category.key)
+            data = section.get("data", []) if isinstance(section, dict) else None
+            entries = candidates[category.key]
+            if data is not None:
+                kept = [entry for entry in data if entry.get('country_code') not in dirty]
+                if len(kept) == len(data) and not entries:
+                    sections[category.key] = section
+                    continue
+                full_rebuild = len(kept) < len(data) and len(data) >= category.limit
+                if not full_rebuild:
+                    for entry in kept:
+                        plan = {k: v for k, v in entry.items() if k not in ('rank', 'price_number')}
+                        country_plans = plans_by_country.get(plan.get('country_code'))
+                        if not country_plans or plan not in country_plans:
+                            full_rebuild = True
+                            break
+                        entries.append((sort_key(plan['country_code'], country_plans.index(plan), plan), plan))
+            else:
+                full_rebuild = True
+
+            if full_rebuild:
+                entries = [(sort_key(country, index, plan), plan)
+                           for country, country_plans in plans_by_country.items()
+                           for index, plan in enumerate(country_plans)
+                           if category in self.members_of(plan)]
+            top = heapq.nsmallest(category.limit, entries, key=lambda item: item[0])
+            ranked = rank_plans(plan for _, plan in top)
+            if data is not None and ranked == data:
+                sections[category.key] = section
+                continue
+            (rebuilt if full_rebuild else patched).append(category.key)
+            sections[category.key] = {"description": category.description, "updated_at": updated_at, "data": ranked}
+        return sections, patched, rebuilt
+
+    def sections(self, updated_at: str) -> Dict[str, Dict[str, Any]]:
+        """输出文件中的排行榜段落（键名 -> {description, updated_at, data}）"""
+        return {
+            category.key: {
+                "description": category.description,
+                "updated_at": updated_at,
+                "data": self.ranked(category.key),
+            }
+            for category in self.categories
+        }
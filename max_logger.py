@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 结构化日志
+四个脚本共用的日志子系统：分级、延迟格式化、缓冲 JSONL 事件输出和紧凑控制台渲染
+热路径使用 log.debug("... %s", arg) 形式，级别未启用时不做任何字符串格式化
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, TextIO
+
+# 日志级别（与标准库 logging 数值一致，便于理解）
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+SILENT = 100
+
+LEVEL_NAMES: Dict[int, str] = {
+    DEBUG: "DEBUG",
+    INFO: "INFO",
+    WARNING: "WARNING",
+    ERROR: "ERROR",
+    SILENT: "SILENT",
+}
+
+# 环境变量可用的级别别名，quiet 只保留警告和错误
+LEVEL_ALIASES: Dict[str, int] = {
+    "debug": DEBUG,
+    "verbose": DEBUG,
+    "info": INFO,
+    "warning": WARNING,
+    "warn": WARNING,
+    "quiet": WARNING,
+    "error": ERROR,
+    "silent": SILENT,
+    "off": SILENT,
+}
+
+DEFAULT_LEVEL = INFO
+DEFAULT_BUFFER_SIZE = 512
+
+# 复用同一个编码器实例，避免 json.dumps 每次按参数重建
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+def parse_level(value: Optional[str], default: int = DEFAULT_LEVEL) -> int:
+    """解析级别字符串（名称或数字），无法识别时返回默认值"""
+    if not value:
+        return default
+    value = value.strip().lower()
+    if value.isdigit():
+        return int(value)
+    return LEVEL_ALIASES.get(value, default)
+
+
+class JsonlEventSink:
+    """缓冲的 JSONL 事件输出，达到缓冲上限或进程退出时批量写盘"""
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = max(1, buffer_size)
+        self._buffer: List[str] = []
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def write(self, record: Dict[str, Any]):
+        self._buffer.append(_JSON_ENCODER.encode(record))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(self._buffer))
+            f.write("\n")
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+
+
+class ConsoleRenderer:
+    """紧凑控制台渲染：只输出消息本身（消息自带 emoji 级别标记），不逐行 flush"""
+
+    def __init__(self, stream: Optional[TextIO] = None, show_level: bool = False):
+        self._stream = stream
+        self.show_level = show_level
+
+    def render(self, level: int, message: str):
+        # 每次取 sys.stdout，兼容重定向/捕获
+        stream = self._stream or sys.stdout
+        if self.show_level:
+            stream.write(f"{LEVEL_NAMES.get(level, level)[0]} {message}\n")
+        else:
+            stream.write(message + "\n")
+
+    def flush(self):
+        stream = self._stream or sys.stdout
+        try:
+            stream.flush()
+        except (AttributeError, ValueError):
+            pass
+
+
+class _LogConfig:
+    """全局日志配置，由所有 MaxLogger 共享"""
+
+    def __init__(self):
+        self.level = DEFAULT_LEVEL
+        self.console: Optional[ConsoleRenderer] = ConsoleRenderer()
+        self.sink: Optional[JsonlEventSink] = None
+
+
+_config = _LogConfig()
+_loggers: Dict[str, "MaxLogger"] = {}
+
+
+class MaxLogger:
+    """轻量日志器：级别检查在最前面，未启用时只付出一次属性比较"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= _config.level
+
+    @property
+    def debug_enabled(self) -> bool:
+        return DEBUG >= _config.level
+
+    def debug(self, msg: str, *args: Any, **fields: Any):
+        if DEBUG < _config.level:
+            return
+        self._emit(DEBUG, msg, args, fields)
+
+    def info(self, msg: str, *args: Any, **fields: Any):
+        if INFO < _config.level:
+            return
+        self._emit(INFO, msg, args, fields)
+
+    def warning(self, msg: str, *args: Any, **fields: Any):
+        if WARNING < _config.level:
+            return
+        self._emit(WARNING, msg, args, fields)
+
+    def error(self, msg: str, *args: Any, **fields: Any):
+        if ERROR < _config.level:
+            return
+        self._emit(ERROR, msg, args, fields)
+
+    def event(self, event: str, level: int = INFO, **fields: Any):
+        """只写入 JSONL 的结构化事件，不在控制台显示"""
+        if level < _config.level or _config.sink is None:
+            return
+        record = {"ts": round(time.time(), 6), "level": LEVEL_NAMES.get(level, level),
+                  "logger": self.name, "event": event}
+        record.update(fields)
+        _config.sink.write(record)
+
+    def _emit(self, level: int, msg: str, args: tuple, fields: Dict[str, Any]):
+        if args:
+            try:
+                message = msg % args
+            except (TypeError, ValueError):
+                message = f"{msg} {args}"
+        else:
+            message = msg
+        if _config.console is not None:
+            _config.console.render(level, message)
+        if _config.sink is not None:
+            record = {"ts": round(time.time(), 6), "level": LEVEL_NAMES.get(level, level),
+                      "logger": self.name, "msg": message}
+            if fields:
+                record.update(fields)
+            _config.sink.write(record)
+
+
+def get_logger(name: str) -> MaxLogger:
+    """获取（或创建）指定名称的日志器"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = MaxLogger(name)
+    return logger
+
+
+def configure(level: Optional[Any] = None, jsonl_path: Optional[str] = None,
+              console: Optional[bool] = None, show_level: Optional[bool] = None,
+              buffer_size: int = DEFAULT_BUFFER_SIZE, stream: Optional[TextIO] = None):
+    """调整全局日志配置；未传入的参数保持不变"""
+    if level is not None:
+        _config.level = parse_level(level) if isinstance(level, str) else int(level)
+    if jsonl_path is not None:
+        if _config.sink is not None:
+            _config.sink.close()
+        _config.sink = JsonlEventSink(jsonl_path, buffer_size) if jsonl_path else None
+    if console is not None:
+        _config.console = ConsoleRenderer(stream) if console else None
+    if show_level is not None and _config.console is not None:
+        _config.console.show_level = show_level
+
+
+def set_quiet(quiet: bool = True):
+    """安静模式：只输出警告和错误，热路径日志几乎零开销"""
+    _config.level = WARNING if quiet else DEFAULT_LEVEL
+
+
+def get_level() -> int:
+    return _config.level
+
+
+def flush():
+    """刷新 JSONL 缓冲和控制台输出"""
+    if _config.sink is not None:
+        _config.sink.flush()
+    if _config.console is not None:
+        _config.console.flush()
+
+
+def configure_from_env():
+    """从环境变量读取配置：MAX_LOG_LEVEL、MAX_LOG_JSONL、MAX_LOG_SHOW_LEVEL"""
+    configure(
+        level=parse_level(os.getenv("MAX_LOG_LEVEL"), DEFAULT_LEVEL),
+        jsonl_path=os.getenv("MAX_LOG_JSONL", ""),
+        show_level=os.getenv("MAX_LOG_SHOW_LEVEL", "").lower() in ("1", "true", "yes"),
+    )
+
+
+configure_from_env()
+atexit.register(flush)
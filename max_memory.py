@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 内存峰值跟踪
+按阶段（fetch / parse / output）和国家采集常驻内存（RSS），可选 tracemalloc 精确统计 Python 分配；
+设置内存预算后，超出预算时暂停接纳新的国家任务（背压），直到在途任务完成释放内存
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from max_logger import get_logger
+
+log = get_logger("memory")
+
+MB = 1024 * 1024
+# 背压等待时重新检查内存的间隔（秒），在途任务完成时也会立即唤醒
+BUDGET_POLL_INTERVAL = 0.5
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name, "").strip()
+    try:
+        return float(value) if value else None
+    except ValueError:
+        log.warning(f"⚠️ 无效的 {name}: {value}")
+        return None
+
+
+def current_rss() -> Optional[int]:
+    """当前常驻内存（字节）；只在有 /proc 的平台可用，否则返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """进程启动以来的峰值常驻内存（字节）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryStage:
+    """单个阶段的内存观测值；with 块内可设置 size（如页面字节数）"""
+
+    __slots__ = ("stage", "country", "size", "rss_start", "rss_end", "traced_start", "traced_peak")
+
+    def __init__(self, stage: str, country: Optional[str]):
+        self.stage = stage
+        self.country = country
+        self.size = 0
+        self.rss_start: Optional[int] = None
+        self.rss_end: Optional[int] = None
+        self.traced_start = 0
+        # 阶段内 Python 分配的峰值（相对阶段开始时的增量）
+        self.traced_peak: Optional[int] = None
+
+
+class MemoryTracker:
+    """
+    记录各阶段的内存观测，并提供基于内存预算的准入控制
+    - RSS 开销很小，始终记录
+    - MAX_MEMORY_TRACE=1 时启用 tracemalloc：独占阶段（中间没有 await 的 parse、output）
+      在开始时重置峰值，结束时得到该阶段精确的 Python 分配峰值；tracemalloc 会让解析慢 2-3 倍，只用于排查
+    - MAX_MEMORY_BUDGET_MB 设置预算：内存超出时 acquire() 等待，至少保证一个任务在途，不会死锁
+    """
+
+    def __init__(self, name: str, budget_mb: Optional[float] = None, trace: Optional[bool] = None):
+        self.name = name
+        self.enabled = os.getenv("MAX_MEMORY", "1") != "0"
+        self.budget_mb = budget_mb if budget_mb is not None else _env_float("MAX_MEMORY_BUDGET_MB")
+        self.trace = trace if trace is not None else os.getenv("MAX_MEMORY_TRACE", "0") == "1"
+        self.records: List[MemoryStage] = []
+        self.in_flight = 0
+        self.budget_waits = 0
+        self.budget_wait_seconds = 0.0
+        self.max_in_flight = 0
+        self._released: Optional[asyncio.Event] = None
+        self._started_tracing = False
+
+    def start(self):
+        """开始一次运行：清空记录，按配置开启 tracemalloc"""
+        self.records.clear()
+        self.in_flight = self.max_in_flight = self.budget_waits = 0
+        self.budget_wait_seconds = 0.0
+        # Event 在 Python 3.9 上会绑定到首次使用时的事件循环，每次运行（每个 asyncio.run）重新创建
+        self._released = None
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def current_bytes(self) -> Optional[int]:
+        """预算判断使用的内存量：tracemalloc 开启时用 Python 分配量，否则用 RSS"""
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return current_rss()
+
+    @contextmanager
+    def stage(self, stage: str, country: Optional[str] = None, exclusive: bool = False) -> Iterator[MemoryStage]:
+        """
+        记录一个阶段的内存；exclusive 表示阶段内没有 await，可以安全地重置 tracemalloc 峰值，
+        否则并发任务交错，只记录阶段结束时的 RSS
+        """
+        record = MemoryStage(stage, country.upper() if country else None)
+        if not self.enabled:
+            yield record
+            return
+        tracing = exclusive and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            record.traced_start = tracemalloc.get_traced_memory()[0]
+        record.rss_start = current_rss()
+        try:
+            yield record
+        finally:
+            record.rss_end = current_rss()
+            if tracing:
+                record.traced_peak = tracemalloc.get_traced_memory()[1] - record.traced_start
+            self.records.append(record)
+
+    def over_budget(self) -> bool:
+        if not self.budget_mb:
+            return False
+        used = self.current_bytes()
+        return used is not None and used > self.budget_mb * MB
+
+    async def acquire(self, country: Optional[str] = None):
+        """准入控制：超出预算且已有任务在途时等待，直到有任务释放或内存回落"""
+        if self.budget_mb and self.in_flight > 0 and self.over_budget():
+            self.budget_waits += 1
+            start = time.perf_counter()
+            log.warning(f"⚠️ {country or ''}: 内存超出预算 {self.budget_mb:.0f} MB，等待在途任务完成"
+                        f"（在途 {self.in_flight}）")
+            if self._released is None:
+                self._released = asyncio.Event()
+            while self.in_flight > 0 and self.over_budget():
+                self._released.clear()
+                try:
+                    await asyncio.wait_for(self._released.wait(), BUDGET_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self.budget_wait_seconds += time.perf_counter() - start
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        if self._released is not None:
+            self._released.set()
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        summary: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            stats = summary.setdefault(record.stage, {"count": 0, "max_rss_mb": 0.0, "max_traced_peak_mb": None,
+                                                      "max_size_kb": 0.0})
+            stats["count"] += 1
+            if record.rss_end is not None:
+                stats["max_rss_mb"] = max(stats["max_rss_mb"], round(record.rss_end / MB, 1))
+            if record.traced_peak is not None:
+                stats["max_traced_peak_mb"] = max(stats["max_traced_peak_mb"] or 0.0,
+                                                  round(record.traced_peak / MB, 2))
+            stats["max_size_kb"] = max(stats["max_size_kb"], round(record.size / 1024, 1))
+        return summary
+
+    def country_summary(self) -> Dict[str, Dict[str, Any]]:
+        """每个国家各阶段的峰值：页面大小、阶段结束时 RSS、独占阶段的分配峰值"""
+        countries: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            if not record.country:
+                continue
+            entry = countries.setdefault(record.country, {"size_kb": 0.0, "rss_mb": 0.0, "parse_peak_mb": None,
+                                                          "parse_rss_delta_mb": None})
+            entry["size_kb"] = max(entry["size_kb"], round(record.size / 1024, 1))
+            if record.rss_end is not None:
+                entry["rss_mb"] = max(entry["rss_mb"], round(record.rss_end / MB, 1))
+            if record.stage == "parse":
+                if record.traced_peak is not None:
+                    entry["parse_peak_mb"] = max(entry["parse_peak_mb"] or 0.0, round(record.traced_peak / MB, 2))
+                if record.rss_start is not None and record.rss_end is not None:
+                    delta = round((record.rss_end - record.rss_start) / MB, 2)
+                    previous = entry["parse_rss_delta_mb"]
+                    entry["parse_rss_delta_mb"] = delta if previous is None else max(previous, delta)
+        return dict(sorted(countries.items()))
+
+    def report(self) -> Dict[str, Any]:
+        peak = peak_rss()
+        return {
+            "peak_rss_mb": round(peak / MB, 1) if peak else None,
+            "tracemalloc": self.trace,
+            "budget_mb": self.budget_mb,
+            "budget_waits": self.budget_waits,
+            "budget_wait_seconds": round(self.budget_wait_seconds, 3),
+            "max_in_flight": self.max_in_flight,
+            "stages": self.stage_summary(),
+            "countries": self.country_summary(),
+        }
+
+    def log_table(self, report: Optional[Dict[str, Any]] = None, top: int = 10):
+        """输出内存占用最高的国家"""
+        report = report or self.report()
+        countries = report["countries"]
+        if not countries:
+            return
+        key = "parse_peak_mb" if report["tracemalloc"] else "size_kb"
+        ranked = sorted(countries.items(), key=lambda item: item[1][key] or 0, reverse=True)[:top]
+        log.info(f"\n🧠 内存峰值（进程峰值 RSS {report['peak_rss_mb']} MB，最大在途 {report['max_in_flight']}，"
+                 f"预算等待 {report['budget_waits']} 次）")
+        log.info(f"{'国家':<6} {'页面KB':>8} {'RSS(MB)':>9} {'解析峰值MB':>11}")
+        for country, entry in ranked:
+            parse_peak = entry["parse_peak_mb"] if entry["parse_peak_mb"] is not None else "-"
+            log.info(f"{country:<6} {entry['size_kb']:>8} {entry['rss_mb']:>9} {parse_peak:>11}")
+
+
+# 爬虫使用的全局跟踪器
+SCRAPER_MEMORY = MemoryTracker("scraper")
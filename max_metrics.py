@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 运行性能指标
+轻量 span 计时（按阶段、按国家归类），httpx 事件钩子采集连接/TLS/首字节/下载耗时，
+运行结束时输出 JSON 报告和 Prometheus textfile；
+每个套餐都会调用的高频步骤（套餐名标准化）用 tally 按 (阶段, 国家) 只累计总耗时和次数，不保留逐次记录
+"""
+
+import contextvars
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# 报告输出目录（workflow 中已有 output/ 目录，且不提交到仓库）
+METRICS_DIR = os.getenv("MAX_METRICS_DIR", "output")
+
+# 当前正在处理的国家，asyncio 任务之间自动隔离
+current_country: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_country", default=None)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位数，输入必须已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """计算一组耗时（秒）的统计值"""
+    values = sorted(durations)
+    return {
+        "count": len(values),
+        "total": round(sum(values), 6),
+        "p50": round(percentile(values, 50), 6),
+        "p95": round(percentile(values, 95), 6),
+        "max": round(values[-1], 6) if values else 0.0,
+    }
+
+
+class Span:
+    """计时区间，可用作 with 上下文，也可手动 stop()"""
+
+    __slots__ = ("recorder", "stage", "country", "start", "stopped")
+
+    def __init__(self, recorder: "SpanRecorder", stage: str, country: Optional[str]):
+        self.recorder = recorder
+        self.stage = stage
+        self.country = country
+        self.start = time.perf_counter()
+        self.stopped = False
+
+    def stop(self, ok: bool = True) -> float:
+        if self.stopped:
+            return 0.0
+        self.stopped = True
+        duration = time.perf_counter() - self.start
+        self.recorder.record(self.stage, duration, self.country, ok)
+        return duration
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop(ok=exc_type is None)
+        return False
+
+
+class SpanRecorder:
+    """收集各阶段耗时记录 (stage, country, duration, ok)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.records: List[Tuple[str, Optional[str], float, bool]] = []
+        # tally 的累计值：(阶段, 国家) -> [总耗时, 次数]
+        self.totals: Dict[Tuple[str, Optional[str]], List[float]] = {}
+        self.started_at = time.time()
+        # 基准测试等场景可关闭记录，避免记录列表无限增长
+        self.enabled = os.getenv("MAX_METRICS", "1") != "0"
+
+    def span(self, stage: str, country: Optional[str] = None) -> Span:
+        return Span(self, stage, country if country is not None else current_country.get())
+
+    def record(self, stage: str, duration: float, country: Optional[str] = None, ok: bool = True):
+        if not self.enabled:
+            return
+        if country is None:
+            country = current_country.get()
+        self.records.append((stage, country.upper() if country else None, duration, ok))
+
+    def tally(self, stage: str, duration: float, country: Optional[str] = None):
+        """高频调用的累计计时：调用方直接传入国家（不查 current_country），只累加总耗时和次数"""
+        if not self.enabled:
+            return
+        entry = self.totals.get((stage, country))
+        if entry is None:
+            self.totals[(stage, country)] = [duration, 1]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+
+    def _tally_summary(self, by_country: bool) -> Dict[Any, Dict[str, float]]:
+        """累计值 -> {阶段 或 (国家, 阶段): {"count", "total", "mean"}}（没有逐次记录，不含百分位数）"""
+        merged: Dict[Any, List[float]] = {}
+        for (stage, country), (total, count) in self.totals.items():
+            if by_country and not country:
+                continue
+            key = (country.upper(), stage) if by_country else stage
+            entry = merged.setdefault(key, [0.0, 0])
+            entry[0] += total
+            entry[1] += count
+        return {key: {"count": int(count), "total": round(total, 6), "mean": round(total / count, 9)}
+                for key, (total, count) in merged.items()}
+
+    def reset(self):
+        self.records.clear()
+        self.totals.clear()
+        self.started_at = time.time()
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        grouped: Dict[str, List[float]] = {}
+        failures: Dict[str, int] = {}
+        for stage, _, duration, ok in self.records:
+            grouped.setdefault(stage, []).append(duration)
+            if not ok:
+                failures[stage] = failures.get(stage, 0) + 1
+        result = {}
+        for stage in sorted(grouped):
+            stats = summarize(grouped[stage])
+            stats["failures"] = failures.get(stage, 0)
+            result[stage] = stats
+        for stage, stats in sorted(self._tally_summary(by_country=False).items()):
+            result[stage] = {**stats, "failures": 0}
+        return result
+
+    def country_summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        grouped: Dict[str, Dict[str, List[float]]] = {}
+        for stage, country, duration, _ in self.records:
+            if country:
+                grouped.setdefault(country, {}).setdefault(stage, []).append(duration)
+        result = {
+            country: {stage: summarize(durations) for stage, durations in sorted(stages.items())}
+            for country, stages in grouped.items()
+        }
+        for (country, stage), stats in self._tally_summary(by_country=True).items():
+            result.setdefault(country, {})[stage] = stats
+        return {country: result[country] for country in sorted(result)}
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "generated_at": datetime.now().isoformat(),
+            "wall_time": round(time.time() - self.started_at, 3),
+            "unit": "seconds",
+            "stages": self.stage_summary(),
+            "countries": self.country_summary(),
+        }
+        if extra:
+            data.update(extra)
+        return data
+
+    def write_report(self, directory: str = METRICS_DIR, extra: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """写出 JSON 报告和 Prometheus textfile，返回两个文件路径"""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        report = self.report(extra)
+        json_path = os.path.join(directory, f"{self.name}_run_report.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        prom_path = os.path.join(directory, f"{self.name}.prom")
+        tmp_path = prom_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(report))
+        # textfile collector 要求原子替换
+        os.replace(tmp_path, prom_path)
+        return json_path, prom_path
+
+    def to_prometheus(self, report: Optional[Dict[str, Any]] = None) -> str:
+        report = report or self.report()
+        prefix = f"hbo_max_{self.name}"
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Duration of pipeline stages.",
+            f"# TYPE {prefix}_stage_duration_seconds summary",
+        ]
+        for stage, stats in report["stages"].items():
+            if "p50" in stats:  # tally 累计的阶段只有总耗时和次数
+                lines.append(f'{prefix}_stage_duration_seconds{{stage="{stage}",quantile="0.5"}} {stats["p50"]}')
+                lines.append(f'{prefix}_stage_duration_seconds{{stage="{stage}",quantile="0.95"}} {stats["p95"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {stats["total"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines.append(f"# HELP {prefix}_stage_duration_max_seconds Slowest observation per stage.")
+        lines.append(f"# TYPE {prefix}_stage_duration_max_seconds gauge")
+        for stage, stats in report["stages"].items():
+            if "max" in stats:
+                lines.append(f'{prefix}_stage_duration_max_seconds{{stage="{stage}"}} {stats["max"]}')
+        lines.append(f"# HELP {prefix}_stage_failures_total Failed spans per stage.")
+        lines.append(f"# TYPE {prefix}_stage_failures_total counter")
+        for stage, stats in report["stages"].items():
+            lines.append(f'{prefix}_stage_failures_total{{stage="{stage}"}} {stats["failures"]}')
+        lines.append(f"# HELP {prefix}_country_stage_duration_seconds Duration of stages per country.")
+        lines.append(f"# TYPE {prefix}_country_stage_duration_seconds summary")
+        for country, stages in report["countries"].items():
+            for stage, stats in stages.items():
+                labels = f'country="{country}",stage="{stage}"'
+                if "p50" in stats:
+                    lines.append(f'{prefix}_country_stage_duration_seconds{{{labels},quantile="0.5"}} {stats["p50"]}')
+                    lines.append(f'{prefix}_country_stage_duration_seconds{{{labels},quantile="0.95"}} {stats["p95"]}')
+                lines.append(f'{prefix}_country_stage_duration_seconds_sum{{{labels}}} {stats["total"]}')
+                lines.append(f'{prefix}_country_stage_duration_seconds_count{{{labels}}} {stats["count"]}')
+        memory = report.get("memory")
+        if memory and memory.get("peak_rss_mb") is not None:
+            lines.append(f"# HELP {prefix}_peak_rss_bytes Peak resident memory of the run.")
+            lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+            lines.append(f"{prefix}_peak_rss_bytes {int(memory['peak_rss_mb'] * 1024 * 1024)}")
+            lines.append(f"# HELP {prefix}_memory_budget_waits_total Times a country waited for the memory budget.")
+            lines.append(f"# TYPE {prefix}_memory_budget_waits_total counter")
+            lines.append(f"{prefix}_memory_budget_waits_total {memory['budget_waits']}")
+        lines.append(f"# HELP {prefix}_wall_time_seconds Wall-clock time of the run.")
+        lines.append(f"# TYPE {prefix}_wall_time_seconds gauge")
+        lines.append(f"{prefix}_wall_time_seconds {report['wall_time']}")
+        return "\n".join(lines) + "\n"
+
+
+# httpcore trace 事件名 -> 阶段名
+_TRACE_STAGES = {
+    "connection.connect_tcp": "http.connect",
+    "connection.start_tls": "http.tls",
+}
+
+
+def http_timing_hooks(recorder: SpanRecorder, country: Optional[str] = None) -> Dict[str, list]:
+    """
+    生成 httpx.AsyncClient 的 event_hooks：
+    - request 钩子记录起始时间，并挂上 httpcore trace 回调采集 TCP 连接和 TLS 握手耗时
+    - response 钩子在响应头到达时触发，记录首字节时间 (TTFB) 和重定向
+    下载耗时在 client.get() 返回后由 finish_http_timing() 计算
+    """
+    async def on_request(request):
+        starts: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            base, _, phase = event_name.rpartition(".")
+            stage = _TRACE_STAGES.get(base)
+            if stage is None:
+                return
+            if phase == "started":
+                starts[base] = time.perf_counter()
+            elif phase in ("complete", "failed") and base in starts:
+                recorder.record(stage, time.perf_counter() - starts.pop(base), country, phase == "complete")
+
+        request.extensions["trace"] = trace
+        request.extensions["max_timing_start"] = time.perf_counter()
+
+    async def on_response(response):
+        start = response.request.extensions.get("max_timing_start")
+        if start is None:
+            return
+        now = time.perf_counter()
+        recorder.record("http.ttfb", now - start, country)
+        response.request.extensions["max_timing_headers"] = now
+        if response.is_redirect:
+            recorder.record("http.redirect", now - start, country)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def finish_http_timing(recorder: SpanRecorder, response, country: Optional[str] = None):
+    """在响应体读取完毕后调用，记录下载耗时（从响应头到达到读完正文）"""
+    headers_at = response.request.extensions.get("max_timing_headers")
+    if headers_at is not None:
+        recorder.record("http.download", time.perf_counter() - headers_at, country)
+
+
+# 爬虫使用的全局记录器
+SCRAPER_METRICS = SpanRecorder("scraper")
+
+# 进程内流水线（max_pipeline.py）的阶段记录器
+PIPELINE_METRICS = SpanRecorder("pipeline")
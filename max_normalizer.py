@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 套餐名标准化版本
+爬虫用 max_scraper.normalize_plan_name 标准化套餐名后，在每个套餐记录上写入标准化器版本；
+转换器对版本一致的记录直接信任其中的 name，只对没有版本（旧快照）或版本过期的记录重新标准化
+修改 max_scraper.HBO_PLAN_NAME_MAP 或 normalize_plan_name 的规则时，需要同时递增 NORMALIZER_VERSION
+"""
+
+from typing import Any, Dict, Iterable
+
+NORMALIZER_VERSION = 1
+NORMALIZER_FIELD = "normalizer_version"
+
+
+def stamp(plans: Iterable[Dict[str, Any]]):
+    """为爬虫输出的套餐记录写入当前标准化器版本"""
+    for plan in plans:
+        plan[NORMALIZER_FIELD] = NORMALIZER_VERSION
+
+
+def is_normalized(plan: Dict[str, Any]) -> bool:
+    """记录中的 name 是否已由当前版本的标准化器处理过"""
+    return plan.get(NORMALIZER_FIELD) == NORMALIZER_VERSION
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 进程内流水线：抓取 → 汇率转换 → 价格变化检测 → 写出产物 → CHANGELOG 季度归档
+
+与逐步执行（max_scraper.py、max_rate_converter.py、max_price_change_detector.py 三个进程，再由 workflow cp 归档）相比：
+- 各阶段之间直接传递内存中的数据，下一阶段不再重新读取上一阶段写出的 JSON
+- 抓取期间在后台线程预取汇率（参考数据中的全部货币），抓取结束时汇率通常已经就绪
+- 变化检测在写出新归档之前进行，与上一次归档对比
+- 所有产物最后统一写出：每份数据只序列化一次，最新文件和 archive/<年份>/ 归档使用同一个时间戳；
+  归档写入快照存储（max_snapshot_store.py），原文件名只保留引用，未变化的国家记录不重复保存
+- 新的转换结果直接从内存写入价格历史库（max_history_store.py），不再重新读取归档
+- 结束时输出各阶段耗时和相对逐步执行节省的时间（离线对比见 python max_benchmark.py pipeline）
+- --countries 只抓取部分国家：抓取结果合并到上一份完整快照（max_prices_all_countries.json，缺失时取最新归档）
+  后再转换、检测和归档，未抓取的国家沿用上一份的记录，不会被当成移除；没有上一份完整快照时不写出任何文件
+- 检测和 CHANGELOG 归档失败只记录错误，不影响写出已转换好的产物
+
+用法:
+  python max_pipeline.py
+  python max_pipeline.py --countries us,sg,my      # 只重新抓取这几个国家，其余沿用上一份快照
+  python max_pipeline.py --input max_prices_all_countries.json   # 跳过抓取，重放已有快照
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from max_logger import get_logger
+from max_metrics import PIPELINE_METRICS
+
+log = get_logger("pipeline")
+
+ARCHIVE_DIR = 'archive'
+
+
+def prefetch_symbols() -> List[str]:
+    """抓取结束前还不知道快照里有哪些货币：预取参考数据中出现的全部货币和目标货币"""
+    import max_reference
+    import max_rate_converter
+
+    symbols = set(max_reference.known_currencies()) | set(max_rate_converter.snapshot_currencies({}))
+    symbols.discard(max_rate_converter.BASE_CURRENCY)
+    return sorted(symbols)
+
+
+def fetch_rates(symbols: List[str]):
+    """在线程池中执行：阻塞的汇率请求与抓取的网络等待重叠"""
+    import max_rate_converter
+
+    with PIPELINE_METRICS.span("rates.fetch"):
+        return max_rate_converter.get_rate_table(symbols)
+
+
+async def collect(input_file: Optional[str], countries: Optional[List[str]]):
+    """抓取（或读取快照）的同时预取汇率，返回 (price_data, rate_table)"""
+    import asyncio
+    import max_rate_converter
+
+    loop = asyncio.get_running_loop()
+    rates_future = loop.run_in_executor(None, fetch_rates, prefetch_symbols())
+    with PIPELINE_METRICS.span("scrape"):
+        if input_file:
+            price_data = max_rate_converter.load_max_prices(input_file)
+        else:
+            import max_scraper
+            price_data = await max_scraper.main(save=False, countries=countries)
+    with PIPELINE_METRICS.span("rates.wait"):
+        table = await rates_future
+    return price_data, table
+
+
+def previous_snapshot() -> Optional[Dict[str, Any]]:
+    """上一份完整的原始快照：最新文件，缺失或无法读取时取最新归档；都没有时返回 None"""
+    import max_rate_converter
+    from max_archive import ArchiveManifest
+    from max_snapshot_store import load_snapshot
+
+    candidates = [max_rate_converter.INPUT_FILE, ArchiveManifest(ARCHIVE_DIR).find("all_countries")]
+    for path in candidates:
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            return load_snapshot(path)
+        except (OSError, ValueError) as e:
+            log.warning(f"⚠️ 无法读取上一份快照: {path} - {e}")
+    return None
+
+
+def merge_partial(price_data: Dict[str, Any], countries: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    部分抓取的结果合并到上一份完整快照：抓取成功的国家替换原记录（新国家追加在末尾），
+    其余国家（包括本次抓取失败的）沿用上一份；没有上一份完整快照时返回 None
+    """
+    previous = previous_snapshot()
+    if not previous:
+        log.error(f"❌ --countries 只抓取了 {len(countries)} 个国家，但没有上一份完整快照可合并；"
+                  f"请先完整运行一次流水线")
+        return None
+    merged = {**previous, **price_data}
+    log.info(f"🧩 {len(price_data)} 个国家的抓取结果已合并到上一份快照（共 {len(merged)} 个国家）")
+    return merged
+
+
+def write_artifacts(price_data: Dict[str, Any],
+                    output_data: Dict[str, Any]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """
+    每份数据序列化一次，写出最新文件和同一时间戳的归档（快照存储中的对象 + 引用文件）
+    归档同时登记到归档清单（大小、哈希直接取自序列化结果，不再重新读取）
+    返回 (写出的路径, {类型: 归档清单条目})
+    """
+    import max_rate_converter
+    from max_archive import ArchiveManifest
+    from max_scraper import create_archive_directory_structure
+    from max_snapshot_store import SnapshotStore
+
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    year_dir = create_archive_directory_structure(ARCHIVE_DIR, timestamp)
+    artifacts = [
+        (price_data, max_rate_converter.INPUT_FILE, f"max_prices_all_countries_{timestamp}.json"),
+        (output_data, max_rate_converter.OUTPUT_FILE, f"max_prices_cny_sorted_{timestamp}.json"),
+    ]
+    manifest = ArchiveManifest(ARCHIVE_DIR)
+    store = SnapshotStore(ARCHIVE_DIR)
+    written = []
+    archived = {}
+    for data, latest_file, archive_name in artifacts:
+        content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        with open(latest_file, 'wb') as f:
+            f.write(content)
+        archive_file = os.path.join(year_dir, archive_name)
+        store.write(archive_file, data, content)
+        written += [latest_file, archive_file]
+        entry = manifest.add(archive_file, content, countries=sum(1 for key in data if not key.startswith('_')))
+        archived[entry["kind"]] = entry
+    return written, archived
+
+
+def update_history(entry: Dict[str, Any], output_data: Dict[str, Any]) -> Dict[str, int]:
+    """把本次归档的转换结果写入价格历史库（同时补齐库中缺少的旧归档）；历史库出错不影响流水线结果"""
+    from max_archive import ArchiveManifest
+    from max_history_store import HistoryStore
+
+    # 产物已经写出，历史库的任何错误（数据库、读取旧归档）都只记录下来，之后可以用 max_history_store.py ingest 补齐
+    try:
+        with HistoryStore() as store:
+            return store.sync(ArchiveManifest(ARCHIVE_DIR), loaded={entry["path"]: output_data})
+    except Exception as e:
+        log.warning(f"⚠️ 价格历史库更新失败: {e}")
+        return {"added": 0, "removed": 0, "rows": 0}
+
+
+def run_quarterly_archive() -> int:
+    """每季度首月 1-7 日把上季度的 CHANGELOG 条目归档，返回归档条目数"""
+    from max_changelog_archiver import MaxChangelogArchiver
+
+    archiver = MaxChangelogArchiver()
+    if not archiver.should_archive():
+        return 0
+    log.info("\n🗂️ 检查 CHANGELOG 归档需求...")
+    archived_count, _ = archiver.archive_last_quarter()
+    return archived_count
+
+
+def savings_report(wall_time: float) -> Dict[str, float]:
+    """
+    各阶段耗时，以及逐步执行至少还需要的时间：
+    逐步执行时汇率在抓取结束后才开始请求，流水线中被抓取掩盖的那部分汇率耗时就是节省的下限
+    （逐个启动进程、重新读取 JSON、cp 归档的开销由 max_benchmark.py pipeline 离线测量）
+    """
+    stages = {stage: stats["total"] for stage, stats in PIPELINE_METRICS.stage_summary().items()}
+    overlap = max(0.0, stages.get("rates.fetch", 0.0) - stages.get("rates.wait", 0.0))
+    return {
+        "wall_seconds": round(wall_time, 3),
+        "rates_overlap_saved_seconds": round(overlap, 3),
+        "step_by_step_min_seconds": round(wall_time + overlap, 3),
+    }
+
+
+def run(input_file: Optional[str] = None, countries: Optional[List[str]] = None,
+        incremental: Optional[bool] = None) -> Dict[str, Any]:
+    """执行整条流水线，返回各阶段状态（供 GITHUB_OUTPUT 和报告使用）"""
+    import asyncio
+    import max_rate_converter
+    from max_price_change_detector import MaxPriceChangeDetector
+
+    PIPELINE_METRICS.reset()
+    start = time.perf_counter()
+    status: Dict[str, Any] = {"scraper_status": "", "converter_status": "",
+                              "changes_count": 0, "summary_file": ""}
+
+    price_data, table = asyncio.run(collect(input_file, countries))
+    if not price_data:
+        log.error("❌ 没有抓取到任何价格数据，流水线终止")
+        return status
+    if countries and not input_file:
+        # 只抓取了部分国家：先补齐其余国家，否则转换结果和归档只有这几个国家，检测器会把其余套餐全部记为移除
+        price_data = merge_partial(price_data, countries)
+        if price_data is None:
+            return status
+    status["scraper_status"] = "success"
+
+    # 预取失败（回退到了过期缓存）或缺少快照中的货币时，由转换器按快照实际货币重新获取：
+    # 缓存覆盖快照货币时仍然是新鲜的缓存命中
+    if table is not None and (table.stale or not table.covers(max_rate_converter.snapshot_currencies(price_data))):
+        log.info("ℹ️ 预取的汇率不可直接使用，按快照中的货币重新获取")
+        table = None
+    with PIPELINE_METRICS.span("convert"):
+        output_data, _ = max_rate_converter.convert(price_data, incremental=incremental, rate_table=table)
+    if output_data is None:
+        return status
+    status["converter_status"] = "success"
+
+    # 先检测再写出：与上一次归档对比，而不是与本次刚写出的副本对比
+    # 检测失败不能丢掉已经转换好的数据：记录错误，本次按无变化处理，照常写出产物
+    with PIPELINE_METRICS.span("detect"):
+        try:
+            status["changes_count"], status["summary_file"] = \
+                MaxPriceChangeDetector().detect_and_report_changes(output_data)
+        except Exception as e:
+            log.error(f"❌ 价格变化检测失败，本次不更新 CHANGELOG: {e}")
+            status["changes_count"], status["summary_file"] = 0, ""
+
+    with PIPELINE_METRICS.span("write"):
+        written, archived = write_artifacts(price_data, output_data)
+    for path in written:
+        log.info(f"📁 已保存: {path}")
+    with PIPELINE_METRICS.span("history"):
+        history = update_history(archived["cny_sorted"], output_data)
+    log.info(f"🗄️ 价格历史库: 新增 {history['added']} 份快照（{history['rows']} 行）")
+    max_rate_converter.log_leaderboard_preview(output_data)
+
+    with PIPELINE_METRICS.span("archive"):
+        try:
+            status["archived_count"] = run_quarterly_archive()
+        except Exception as e:
+            log.error(f"❌ CHANGELOG 季度归档失败: {e}")
+            status["archived_count"] = 0
+
+    status["report"] = savings_report(time.perf_counter() - start)
+    return status
+
+
+def log_report(status: Dict[str, Any]):
+    report = status.get("report")
+    if not report:
+        return
+    log.info("\n⏱️ 流水线各阶段耗时:")
+    for stage, stats in PIPELINE_METRICS.stage_summary().items():
+        log.info(f"  {stage:<12} {stats['total']:>8.3f}s")
+    log.info(f"⏱️ 总耗时 {report['wall_seconds']:.3f}s；汇率获取与抓取重叠节省 "
+             f"{report['rates_overlap_saved_seconds']:.3f}s，逐步执行至少需要 {report['step_by_step_min_seconds']:.3f}s")
+    report_file, _ = PIPELINE_METRICS.write_report(extra={"savings": report})
+    log.info(f"⏱️ 性能报告: {report_file}")
+
+
+def write_github_output(status: Dict[str, Any]):
+    """输出结果供 GitHub Actions 使用（与逐步执行时各步骤输出的名称一致）"""
+    lines = [f"{key}={status[key]}" for key in ("scraper_status", "converter_status", "changes_count", "summary_file")]
+    github_output = os.environ.get('GITHUB_OUTPUT')
+    if github_output and github_output != '/dev/stdout':
+        with open(github_output, 'a') as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        # 如果不在 GitHub Actions 环境中，输出到标准输出
+        print("\n".join(lines))
+
+
+def parse_countries(text: str) -> Optional[List[str]]:
+    codes = [code.strip() for code in text.split(",") if code.strip()]
+    return codes or None
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    """流水线命令行入口（python max_pipeline.py / python max_cli.py pipeline）"""
+    import argparse
+    from max_profiler import add_profile_arguments, profiling_from_args
+
+    parser = argparse.ArgumentParser(description="HBO Max 进程内流水线：抓取 → 转换 → 检测 → 归档")
+    parser.add_argument("--input", default="", help="跳过抓取，读取已有的价格快照")
+    parser.add_argument("--countries", default="",
+                        help="只抓取指定国家（逗号分隔，如 us,sg,my），其余国家沿用上一份完整快照")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="只重新换算变化的国家（也可用 MAX_INCREMENTAL=1）")
+    add_profile_arguments(parser)
+    cli_args = parser.parse_args(argv)
+
+    log.info("🎬 HBO Max 流水线启动...")
+    with profiling_from_args("pipeline", cli_args):
+        status = run(cli_args.input or None, parse_countries(cli_args.countries), cli_args.incremental)
+    log_report(status)
+    write_github_output(status)
+    return 0 if status["converter_status"] == "success" else 1
+
+
+if __name__ == '__main__':
+    sys.exit(cli())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 内置性能剖析
+三个脚本的 --profile 选项共用：
+- sampling（默认）：后台线程定时采样主线程调用栈，按栈中 country_code/country 局部变量归属到国家，
+  输出 collapsed-stack 文件（可直接交给 flamegraph.pl / speedscope）和热点表
+- cprofile：确定性剖析，输出 .pstats 和热点表，开销较大，适合本地排查
+也可以用环境变量 MAX_PROFILE=sampling|cprofile 开启（CI 中不改命令行）
+cProfile/pstats/inspect 只在开启剖析时才导入，不增加各脚本的启动耗时
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from max_logger import get_logger
+from max_metrics import METRICS_DIR
+
+if TYPE_CHECKING:
+    import cProfile
+
+log = get_logger("profiler")
+
+PROFILE_DIR = os.path.join(METRICS_DIR, "profile")
+PROFILE_MODES = ("sampling", "cprofile")
+DEFAULT_INTERVAL = 0.005  # 采样间隔（秒）
+DEFAULT_TOP = 20
+# 调用栈中用来归属国家的局部变量名（按优先级）
+COUNTRY_LOCALS = ("country_code", "country")
+UNATTRIBUTED = "-"
+
+
+class SamplingProfiler:
+    """
+    采样剖析器：在后台线程中每 interval 秒读取一次目标线程的调用栈
+    asyncio 任务交错执行，但每次采样时只有正在运行的那个任务在栈上，
+    因此按栈中协程帧的 country_code 局部变量即可把样本归属到对应国家任务
+    （只看协程帧：同步代码中的循环变量在循环结束后仍留在帧里，会造成误归属）
+    """
+
+    def __init__(self, name: str, interval: float = DEFAULT_INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        self.samples = 0
+        self.busy = 0.0  # 采样线程自身耗时，即剖析开销
+        self.wall = 0.0
+        self._target_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_at = 0.0
+        # code 对象 -> (帧标签, 用于归属国家的局部变量名或 None)；只有协程才有归属变量
+        self._code_cache: Dict[Any, Tuple[str, Optional[str]]] = {}
+        from inspect import CO_COROUTINE
+        self._co_coroutine = CO_COROUTINE
+
+    def start(self):
+        self._target_id = threading.get_ident()
+        self._stop.clear()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="max-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.wall = time.perf_counter() - self._started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            frame = sys._current_frames().get(self._target_id)
+            if frame is not None:
+                self._sample(frame)
+            self.busy += time.perf_counter() - start
+
+    def _describe(self, code) -> Tuple[str, Optional[str]]:
+        cached = self._code_cache.get(code)
+        if cached is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            attr = None
+            if code.co_flags & self._co_coroutine:
+                attr = next((n for n in COUNTRY_LOCALS if n in code.co_varnames), None)
+            cached = self._code_cache[code] = (label, attr)
+        return cached
+
+    def _sample(self, frame):
+        frames: List[str] = []
+        country = None
+        while frame is not None:
+            label, attr = self._describe(frame.f_code)
+            frames.append(label)
+            if attr is not None:
+                value = frame.f_locals.get(attr)
+                if isinstance(value, str) and value:
+                    # 继续向外走，最外层（任务入口）协程的国家变量为准
+                    country = value.upper()
+            frame = frame.f_back
+        frames.reverse()
+        key = (country or UNATTRIBUTED, tuple(frames))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    @property
+    def overhead_percent(self) -> float:
+        return round(self.busy / self.wall * 100, 2) if self.wall else 0.0
+
+    def collapsed(self, country: Optional[str] = None) -> str:
+        """
+        collapsed-stack 格式：每行 "frame1;frame2;... count"
+        不指定国家时以 country:XX 作为根帧，火焰图中每个国家是一棵独立子树
+        """
+        lines = []
+        for (stack_country, frames), count in sorted(self.stacks.items()):
+            if country is not None:
+                if stack_country != country:
+                    continue
+                path = ";".join(frames)
+            else:
+                path = ";".join((f"country:{stack_country}",) + frames)
+            lines.append(f"{path} {count}")
+        return "\n".join(lines) + "\n"
+
+    def hotspots(self, top: int = DEFAULT_TOP) -> List[Dict[str, Any]]:
+        """按自身样本数（栈顶）排序的热点函数，附带包含子调用的样本数"""
+        self_counts: Dict[str, int] = {}
+        total_counts: Dict[str, int] = {}
+        for (_, frames), count in self.stacks.items():
+            if not frames:
+                continue
+            self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + count
+            for label in set(frames):
+                total_counts[label] = total_counts.get(label, 0) + count
+        rows = []
+        for label, own in sorted(self_counts.items(), key=lambda item: item[1], reverse=True)[:top]:
+            rows.append({
+                "function": label,
+                "self_samples": own,
+                "self_percent": round(own / self.samples * 100, 1) if self.samples else 0.0,
+                "total_percent": round(total_counts[label] / self.samples * 100, 1) if self.samples else 0.0,
+            })
+        return rows
+
+    def country_samples(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for (country, _), count in self.stacks.items():
+            counts[country] = counts.get(country, 0) + count
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    def write(self, directory: str = PROFILE_DIR, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+        """写出总 collapsed 文件、每个国家的 collapsed 文件和 JSON 摘要，返回摘要"""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        collapsed_path = os.path.join(directory, f"{self.name}.collapsed")
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+
+        countries = self.country_samples()
+        country_files = {}
+        # 单独的国家火焰图只为样本最多的 top 个国家生成
+        for country in [c for c in countries if c != UNATTRIBUTED][:top]:
+            path = os.path.join(directory, f"{self.name}_{country}.collapsed")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.collapsed(country))
+            country_files[country] = path
+
+        summary = {
+            "name": self.name,
+            "mode": "sampling",
+            "interval": self.interval,
+            "samples": self.samples,
+            "wall_time": round(self.wall, 3),
+            "overhead_seconds": round(self.busy, 4),
+            "overhead_percent": self.overhead_percent,
+            "collapsed": collapsed_path,
+            "country_files": country_files,
+            "country_samples": countries,
+            "hotspots": self.hotspots(top),
+        }
+        with open(os.path.join(directory, f"{self.name}_profile.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+def print_hotspots(summary: Dict[str, Any]):
+    log.info(f"\n🔥 热点函数（{summary['name']}, {summary['samples']} 个样本, "
+             f"剖析开销 {summary['overhead_percent']}%）")
+    log.info(f"{'self%':>7} {'total%':>7}  函数")
+    for row in summary["hotspots"]:
+        log.info(f"{row['self_percent']:>7.1f} {row['total_percent']:>7.1f}  {row['function']}")
+    attributed = {k: v for k, v in summary["country_samples"].items() if k != UNATTRIBUTED}
+    if attributed:
+        top_countries = ", ".join(f"{k}:{v}" for k, v in list(attributed.items())[:10])
+        log.info(f"🌍 按国家样本数: {top_countries}")
+    log.info(f"📁 火焰图输入: {summary['collapsed']}")
+
+
+def write_cprofile(profiler: "cProfile.Profile", name: str, wall: float,
+                   directory: str = PROFILE_DIR, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+    """写出 .pstats 和按自身耗时排序的热点表"""
+    import io
+    import pstats
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    pstats_path = os.path.join(directory, f"{name}.pstats")
+    profiler.dump_stats(pstats_path)
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    total = stats.total_tt or 1.0
+    rows = []
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]:
+        rows.append({
+            "function": f"{func} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "self_seconds": round(tottime, 4),
+            "self_percent": round(tottime / total * 100, 1),
+            "total_percent": round(cumtime / total * 100, 1),
+        })
+    summary = {
+        "name": name,
+        "mode": "cprofile",
+        "wall_time": round(wall, 3),
+        "pstats": pstats_path,
+        "hotspots": rows,
+    }
+    with open(os.path.join(directory, f"{name}_profile.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """为脚本的命令行添加 --profile 相关参数"""
+    parser.add_argument("--profile", nargs="?", const="sampling", choices=PROFILE_MODES,
+                        default=os.getenv("MAX_PROFILE") or None,
+                        help="开启剖析（默认 sampling，也可用 MAX_PROFILE 环境变量）")
+    parser.add_argument("--profile-interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"采样间隔秒数（默认 {DEFAULT_INTERVAL}）")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP, help="热点表行数")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="剖析结果输出目录")
+
+
+@contextmanager
+def profiling(name: str, mode: Optional[str] = None, interval: float = DEFAULT_INTERVAL,
+              top: int = DEFAULT_TOP, directory: str = PROFILE_DIR) -> Iterator[None]:
+    """在 with 块内剖析当前线程；mode 为空时什么也不做"""
+    if not mode:
+        yield
+        return
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            summary = write_cprofile(profiler, name, time.perf_counter() - start, directory, top)
+            log.info(f"\n🔥 热点函数（{name}, cProfile）")
+            log.info(f"{'self%':>7} {'total%':>7} {'calls':>9}  函数")
+            for row in summary["hotspots"]:
+                log.info(f"{row['self_percent']:>7.1f} {row['total_percent']:>7.1f} {row['calls']:>9}  {row['function']}")
+            log.info(f"📁 pstats: {summary['pstats']}")
+        return
+
+    sampler = SamplingProfiler(name, interval)
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        print_hotspots(sampler.write(directory, top))
+
+
+def profiling_from_args(name: str, args: argparse.Namespace):
+    return profiling(name, args.profile, args.profile_interval, args.profile_top, args.profile_dir)
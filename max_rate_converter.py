@@ -8,10 +8,19 @@ HBO Max Price Rate Converter
 import json
 import os
 import time
-import requests
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import traceback
+from max_archive import ArchiveManifest
+from max_logger import get_logger
+from max_rate_store import RateStore, RateTable
+from max_conversion import ConversionEngine, configured_targets, price_field, to_optional
+from max_leaderboard import LeaderboardEngine
+from max_normalizer import is_normalized
+import max_reference
+from max_incremental import build_fingerprints, carried_fingerprints, dirty_countries, load_previous
+
+log = get_logger("converter")
 
 # 环境变量配置
 API_KEY = os.getenv('API_KEY', '')  # OpenExchangeRates API Key
@@ -25,65 +34,46 @@ OUTPUT_FILE = 'max_prices_cny_sorted.json'
 # API配置
 EXCHANGE_API_URL = f'https://openexchangerates.org/api/latest.json'
 
-def load_max_prices() -> Dict[str, Any]:
+def load_max_prices(input_file: Optional[str] = None) -> Dict[str, Any]:
     """加载HBO Max价格数据"""
+    input_file = input_file or INPUT_FILE
     try:
-        if not os.path.exists(INPUT_FILE):
-            print(f"❌ 输入文件不存在: {INPUT_FILE}")
+        if not os.path.exists(input_file):
+            log.error(f"❌ 输入文件不存在: {input_file}")
             return {}
         
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # 输入也可以是归档快照的引用文件
+        from max_snapshot_store import load_snapshot
+        data = load_snapshot(input_file)
         
-        print(f"📊 成功加载 {len(data)} 个国家的HBO Max价格数据")
+        log.info(f"📊 成功加载 {len(data)} 个国家的HBO Max价格数据")
         return data
     except Exception as e:
-        print(f"❌ 加载数据失败: {e}")
+        log.error(f"❌ 加载数据失败: {e}")
         return {}
 
-def get_exchange_rates() -> Dict[str, float]:
+def snapshot_currencies(price_data: Dict[str, Any]) -> List[str]:
+    """快照中实际出现的货币，加上所有目标货币"""
+    currencies = {TARGET_CURRENCY, *configured_targets()}
+    currencies.discard(BASE_CURRENCY)
+    for country_data in price_data.values():
+        for plan in country_data.get('plans', []):
+            currency = plan.get('currency')
+            if currency and currency != BASE_CURRENCY:
+                currencies.add(currency)
+    return sorted(currencies)
+
+def get_rate_table(symbols: Optional[List[str]] = None) -> Optional[RateTable]:
+    """从汇率存储获取汇率表（缓存 / API / 过期缓存回退）"""
+    return RateStore().get_rates(API_KEY, BASE_CURRENCY, symbols, EXCHANGE_API_URL)
+
+def get_exchange_rates(symbols: Optional[List[str]] = None) -> Dict[str, float]:
     """获取汇率数据"""
-    if not API_KEY:
-        print("❌ 未设置API_KEY环境变量")
-        return {}
-    
-    try:
-        print("🔄 获取汇率数据...")
-        
-        params = {
-            'app_id': API_KEY,
-            'base': BASE_CURRENCY,
-            'prettyprint': False,
-            'show_alternative': False
-        }
-        
-        response = requests.get(EXCHANGE_API_URL, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        rates = data.get('rates', {})
-        
-        if not rates:
-            print("❌ 汇率数据为空")
-            return {}
-        
-        print(f"✅ 成功获取 {len(rates)} 种货币的汇率")
-        print(f"💱 USD to CNY: {rates.get('CNY', 'N/A')}")
-        
-        return rates
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ 网络请求失败: {e}")
-        return {}
-    except requests.exceptions.Timeout:
-        print("❌ 请求超时")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON解析失败: {e}")
-        return {}
-    except Exception as e:
-        print(f"❌ 获取汇率失败: {e}")
+    table = get_rate_table(symbols)
+    if table is None:
         return {}
+    log.info(f"💱 USD to CNY: {table.rates.get('CNY', 'N/A')}")
+    return table.rates
 
 def convert_currency(amount: float, from_currency: str, to_currency: str, rates: Dict[str, float]) -> Optional[float]:
     """转换货币"""
@@ -99,7 +89,7 @@ def convert_currency(amount: float, from_currency: str, to_currency: str, rates:
         if to_currency in rates:
             return amount * rates[to_currency]
         else:
-            print(f"⚠️ 未找到目标货币汇率: {to_currency}")
+            log.warning("⚠️ 未找到目标货币汇率: %s", to_currency)
             return None
     
     # 如果目标货币是基础货币（USD）
@@ -107,7 +97,7 @@ def convert_currency(amount: float, from_currency: str, to_currency: str, rates:
         if from_currency in rates:
             return amount / rates[from_currency]
         else:
-            print(f"⚠️ 未找到源货币汇率: {from_currency}")
+            log.warning("⚠️ 未找到源货币汇率: %s", from_currency)
             return None
     
     # 通过基础货币（USD）进行转换
@@ -121,7 +111,7 @@ def convert_currency(amount: float, from_currency: str, to_currency: str, rates:
             missing_currencies.append(from_currency)
         if to_currency not in rates:
             missing_currencies.append(to_currency)
-        print(f"⚠️ 未找到货币汇率: {', '.join(missing_currencies)}")
+        log.warning("⚠️ 未找到货币汇率: %s", ', '.join(missing_currencies))
         return None
 
 def standardize_plan_name(plan_name: str) -> str:
@@ -204,31 +194,72 @@ def standardize_plan_name(plan_name: str) -> str:
     fallback_name = ' '.join(word.capitalize() for word in plan_lower.split())
     return fallback_name if fallback_name else "Unknown Plan"
 
-def process_country_data(country_data: Dict[str, Any], rates: Dict[str, float]) -> List[Dict[str, Any]]:
-    """处理单个国家的数据"""
+def convert_all_plans(price_data: Dict[str, Any], engine: ConversionEngine) -> Dict[str, Dict[str, Any]]:
+    """
+    一次向量化换算所有国家的全部套餐，返回 {国家代码: {目标货币: 该国套餐的结果数组}}
+    """
+    amounts: List[float] = []
+    currencies: List[str] = []
+    offsets = []
+    for country_code, country_data in price_data.items():
+        plans = country_data.get('plans', [])
+        offsets.append((country_code, len(amounts), len(amounts) + len(plans)))
+        for plan in plans:
+            amounts.append(plan.get('price_number', 0) or 0)
+            currencies.append(plan.get('currency', 'USD'))
+    converted = engine.convert(amounts, currencies)
+    return {
+        country_code: {target: values[start:end] for target, values in converted.items()}
+        for country_code, start, end in offsets
+    }
+
+def process_country_data(country_data: Dict[str, Any], rates: Dict[str, float],
+                         converted: Optional[Dict[str, Any]] = None,
+                         name_stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    处理单个国家的数据
+    converted 为 convert_all_plans() 中该国的换算结果；单独调用时在这里换算
+    带有当前标准化器版本的套餐直接使用爬虫标准化后的名称，其余重新标准化；
+    name_stats 累计两者的数量（trusted / normalized）
+    """
     country_code = country_data.get('country_code', '')
     country_name = country_data.get('country_name', '')
+    country_name_cn = get_chinese_country_name(country_name, country_code)
     plans = country_data.get('plans', [])
     
+    if converted is None:
+        engine = ConversionEngine(rates)
+        converted = engine.convert([plan.get('price_number', 0) or 0 for plan in plans],
+                                   [plan.get('currency', 'USD') for plan in plans])
+        engine.report_missing()
+    cny_prices = converted[TARGET_CURRENCY]
+    extra_targets = [target for target in converted if target != TARGET_CURRENCY]
+    
     processed_plans = []
     
-    for plan in plans:
+    for index, plan in enumerate(plans):
         try:
-            plan_name = standardize_plan_name(plan.get('name', ''))
+            if is_normalized(plan):
+                plan_name = plan.get('name') or "Unknown Plan"
+                stat = 'trusted'
+            else:
+                plan_name = standardize_plan_name(plan.get('name', ''))
+                stat = 'normalized'
+            if name_stats is not None:
+                name_stats[stat] = name_stats.get(stat, 0) + 1
             original_price = plan.get('price', '')
             price_number = plan.get('price_number', 0)
             currency = plan.get('currency', 'USD')
             plan_group = plan.get('plan_group', 'unknown')
             label = plan.get('label', '未知周期')
             
-            # 转换为人民币
-            cny_price = convert_currency(price_number, currency, TARGET_CURRENCY, rates)
+            cny_price = to_optional(cny_prices[index])
             
             if cny_price is not None and cny_price > 0:
                 processed_plan = {
                     'country_code': country_code,
                     'country_name': country_name,
-                    'country_name_cn': get_chinese_country_name(country_name),
+                    'country_name_cn': country_name_cn,
                     'name': plan_name,  # 改为name以匹配筛选逻辑
                     'plan_name': plan_name,  # 保留plan_name向后兼容
                     'plan_name_standardized': plan_name,
@@ -238,99 +269,52 @@ def process_country_data(country_data: Dict[str, Any], rates: Dict[str, float])
                     'original_currency': currency,
                     'original_price_number': price_number,
                     'monthly_price': plan.get('monthly_price', price_number),  # 保留月价格用于显示
-                    'price_cny': round(cny_price, 2),
+                    'price_cny': cny_price,
+                    **{price_field(target): to_optional(converted[target][index]) for target in extra_targets},
                     'exchange_rate_used': rates.get(currency, 1.0) if currency != BASE_CURRENCY else rates.get(TARGET_CURRENCY, 7.0)
                 }
                 processed_plans.append(processed_plan)
-                print(f"💰 {country_code} - {plan_name}: {original_price} → ¥{cny_price:.2f}")
+                log.debug("💰 %s - %s: %s → ¥%.2f", country_code, plan_name, original_price, cny_price)
             else:
-                print(f"⚠️ {country_code} - {plan_name}: 汇率转换失败")
+                log.debug("⚠️ %s - %s: 汇率转换失败", country_code, plan_name)
                 
         except Exception as e:
-            print(f"❌ 处理套餐失败 {country_code} - {plan.get('name', 'Unknown')}: {e}")
+            log.error(f"❌ 处理套餐失败 {country_code} - {plan.get('name', 'Unknown')}: {e}")
             continue
     
     return processed_plans
 
-def get_chinese_country_name(english_name: str) -> str:
-    """获取国家的中文名称"""
-    country_map = {
-        "Malaysia": "马来西亚",
-        "Hong Kong": "香港",
-        "Philippines": "菲律宾", 
-        "Taiwan": "台湾",
-        "Indonesia": "印度尼西亚",
-        "Singapore": "新加坡",
-        "Thailand": "泰国",
-        "Colombia": "哥伦比亚",
-        "Costa Rica": "哥斯达黎加",
-        "Guatemala": "危地马拉",
-        "Peru": "秘鲁",
-        "Uruguay": "乌拉圭",
-        "Mexico": "墨西哥",
-        "Honduras": "洪都拉斯",
-        "Nicaragua": "尼加拉瓜",
-        "Panama": "巴拿马",
-        "Argentina": "阿根廷",
-        "Bolivia": "玻利维亚",
-        "Dominican Republic": "多米尼加共和国",
-        "Ecuador": "厄瓜多尔",
-        "El Salvador": "萨尔瓦多",
-        "Paraguay": "巴拉圭",
-        "Chile": "智利",
-        "Brazil": "巴西",
-        "Jamaica": "牙买加",
-        "Montserrat": "蒙特塞拉特",
-        "Anguilla": "安圭拉",
-        "Antigua and Barbuda": "安提瓜和巴布达",
-        "Aruba": "阿鲁巴",
-        "Bahamas": "巴哈马",
-        "Barbados": "巴巴多斯",
-        "Belize": "伯利兹",
-        "British Virgin Islands": "英属维尔京群岛",
-        "Cayman Islands": "开曼群岛",
-        "Curacao": "库拉索",
-        "Dominica": "多米尼克",
-        "Grenada": "格林纳达",
-        "Guyana": "圭亚那",
-        "Haiti": "海地",
-        "Saint Kitts and Nevis": "圣基茨和尼维斯",
-        "Saint Lucia": "圣卢西亚",
-        "Saint Vincent and the Grenadines": "圣文森特和格林纳丁斯",
-        "Suriname": "苏里南",
-        "Trinidad and Tobago": "特立尼达和多巴哥",
-        "Turks and Caicos Islands": "特克斯和凯科斯群岛",
-        "United States": "美国",
-        "Australia": "澳大利亚",
-        "Andorra": "安道尔",
-        "Bosnia and Herzegovina": "波斯尼亚和黑塞哥维那",
-        "Bulgaria": "保加利亚",
-        "Croatia": "克罗地亚",
-        "Czech Republic": "捷克共和国",
-        "Hungary": "匈牙利",
-        "North Macedonia": "北马其顿",
-        "Moldova": "摩尔多瓦",
-        "Montenegro": "黑山",
-        "Romania": "罗马尼亚",
-        "Serbia": "塞尔维亚",
-        "Slovakia": "斯洛伐克",
-        "Slovenia": "斯洛文尼亚",
-        "Denmark": "丹麦",
-        "Finland": "芬兰",
-        "Norway": "挪威",
-        "Sweden": "瑞典",
-        "Spain": "西班牙",
-        "France": "法国",
-        "Belgium": "比利时",
-        "Portugal": "葡萄牙",
-        "Netherlands": "荷兰",
-        "Poland": "波兰",
-        "Turkey": "土耳其"
+def country_price_stats(plans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """单个国家的人民币价格统计（最低/最高/平均）"""
+    prices = [plan['price_cny'] for plan in plans]
+    return {
+        "min_price_cny": min(prices),
+        "max_price_cny": max(prices),
+        "avg_price_cny": round(sum(prices) / len(prices), 2),
     }
-    return country_map.get(english_name, english_name)
+
+def summarize_country_stats(country_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """由各国统计汇总全局价格范围，以及最低价最低/最高的国家"""
+    if not country_stats:
+        return {}
+    cheapest = min(country_stats, key=lambda code: country_stats[code]["min_price_cny"])
+    priciest = max(country_stats, key=lambda code: country_stats[code]["max_price_cny"])
+    return {
+        "min_price_cny": country_stats[cheapest]["min_price_cny"],
+        "max_price_cny": country_stats[priciest]["max_price_cny"],
+        "cheapest_country": cheapest,
+        "most_expensive_country": priciest,
+    }
+
+def get_chinese_country_name(english_name: str, country_code: str = "") -> str:
+    """获取国家的中文名称（max_reference 中的国家中文名表），找不到时返回英文名"""
+    return max_reference.chinese_name(english_name, country_code)
 
 def generate_top_cheapest(all_plans: List[Dict[str, Any]], plan_type: str = "all", limit: int = 10) -> List[Dict[str, Any]]:
-    """生成最便宜的套餐排行榜（参考Spotify项目的分类逻辑）"""
+    """
+    生成最便宜的套餐排行榜（参考Spotify项目的分类逻辑）
+    main 已改用 max_leaderboard.LeaderboardEngine 一次生成全部排行榜；此函数保留给单独调用和基准对比
+    """
     # 根据套餐类型过滤（更精确的分类）
     if plan_type == "monthly":
         filtered_plans = [p for p in all_plans if p.get('plan_group') == 'monthly' or '每月' in p.get('billing_cycle', '')]
@@ -366,70 +350,121 @@ def generate_top_cheapest(all_plans: List[Dict[str, Any]], plan_type: str = "all
     
     return top_plans
 
-def main():
-    """主函数"""
-    print("🎬 HBO Max 价格汇率转换器启动...")
-    
-    # 加载价格数据
-    price_data = load_max_prices()
-    if not price_data:
-        print("❌ 无法加载价格数据，程序退出")
-        return
-    
-    # 获取汇率
-    rates = get_exchange_rates()
+def convert(price_data: Dict[str, Any], rates: Optional[Dict[str, float]] = None,
+            output_file: Optional[str] = None, incremental: Optional[bool] = None,
+            rate_table: Optional[RateTable] = None) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    把内存中的快照换算为输出数据（不写文件），返回 (output_data, changed)；失败时 output_data 为 None
+    rates 直接给出汇率（基准测试、离线重算）；rate_table 为已获取的汇率表（流水线在抓取期间预取）；
+    两者都为空时从汇率存储获取
+    output_file 只用于增量模式读取上一次的输出；没有任何变化时返回 (上一次的输出, False)
+    """
+    output_file = output_file or OUTPUT_FILE
+    if incremental is None:
+        incremental = os.getenv("MAX_INCREMENTAL", "0") == "1"
+    
+    # 获取汇率（只请求快照中出现的货币，API 不可用时回退到最近的缓存）
+    rates_metadata = {"rates_source": "provided", "rates_stale": False}
+    if rates is None:
+        table = rate_table or get_rate_table(snapshot_currencies(price_data))
+        rates = table.rates if table else {}
+        if table:
+            rates_metadata = table.metadata()
+            log.info(f"💱 USD to CNY: {rates.get(TARGET_CURRENCY, 'N/A')}")
     if not rates:
-        print("❌ 无法获取汇率数据，程序退出")
-        return
-    
-    # 处理所有国家数据
+        log.error("❌ 无法获取汇率数据，程序退出")
+        return None, False
+    
+    # 所有套餐一次换算到全部目标货币，缺失的汇率在换算后统一报告
+    engine = ConversionEngine(rates)
+    leaderboards = LeaderboardEngine.from_config()
+    fingerprints = build_fingerprints(price_data, rates, engine.targets, leaderboards.fingerprint())
+    
+    # 增量模式：只有指纹变化的国家需要重新换算；输出文件不存在时从归档清单中取最新的转换结果
+    previous_file = None
+    if incremental:
+        previous_file = output_file if os.path.exists(output_file) else ArchiveManifest().find("cny_sorted")
+    previous = load_previous(previous_file) if previous_file else None
+    dirty = dirty_countries(previous, fingerprints)
+    removed = set()
+    if previous is not None:
+        removed = {key for key in previous if not key.startswith('_') and key not in price_data}
+        fingerprints = carried_fingerprints(previous, fingerprints, set(price_data) - dirty)
+        log.info(f"\n♻️ 增量转换: {len(dirty)} 个国家需要重新换算，{len(price_data) - len(dirty)} 个沿用上次结果"
+                 + (f"，{len(removed)} 个国家已移除" if removed else ""))
+    
+    # 处理所有国家数据；plans_by_country 在处理时建立，按快照中的国家顺序驱动输出和统计
     all_plans = []
+    plans_by_country: Dict[str, List[Dict[str, Any]]] = {}
+    country_stats: Dict[str, Dict[str, Any]] = {}
     successful_countries = 0
     failed_countries = 0
     
-    print(f"\n🔄 开始处理 {len(price_data)} 个国家的数据...")
+    log.info(f"\n🔄 开始处理 {len(dirty)} 个国家的数据...")
+    name_stats = {'trusted': 0, 'normalized': 0}
+    
+    converted_by_country = convert_all_plans({code: price_data[code] for code in price_data if code in dirty}, engine)
+    engine.report_missing()
     
     for country_code, country_data in price_data.items():
+        if country_code not in dirty:
+            # 指纹未变：直接沿用上一次的条目（包括当时的汇率和统计）
+            entry = previous[country_code]
+            plans_by_country[country_code] = entry["plans"]
+            country_stats[country_code] = {key: entry[key] for key in ("min_price_cny", "max_price_cny", "avg_price_cny")
+                                           if key in entry} or country_price_stats(entry["plans"])
+            all_plans.extend(entry["plans"])
+            successful_countries += 1
+            continue
         try:
-            processed_plans = process_country_data(country_data, rates)
+            processed_plans = process_country_data(country_data, rates, converted_by_country[country_code], name_stats)
             if processed_plans:
                 all_plans.extend(processed_plans)
+                plans_by_country[country_code] = processed_plans
+                country_stats[country_code] = country_price_stats(processed_plans)
                 successful_countries += 1
-                print(f"✅ {country_code}: 处理完成，获取 {len(processed_plans)} 个套餐")
+                log.debug("✅ %s: 处理完成，获取 %s 个套餐", country_code, len(processed_plans))
             else:
                 failed_countries += 1
-                print(f"⚠️ {country_code}: 未获取到有效套餐")
+                log.warning(f"⚠️ {country_code}: 未获取到有效套餐")
         except Exception as e:
             failed_countries += 1
-            print(f"❌ {country_code}: 处理失败 - {e}")
+            log.error(f"❌ {country_code}: 处理失败 - {e}")
     
     if not all_plans:
-        print("❌ 没有有效的套餐数据，程序退出")
-        return
-    
-    print(f"\n📊 数据处理完成:")
-    print(f"  成功处理: {successful_countries} 个国家")
-    print(f"  处理失败: {failed_countries} 个国家") 
-    print(f"  总套餐数: {len(all_plans)} 个")
-    
-    # 生成各种排行榜（参考Spotify项目的分类方式）
-    print(f"\n🏆 生成排行榜...")
-    
-    # 总体最便宜的前10名
-    top_10_all = generate_top_cheapest(all_plans, "all", 10)
-    
-    # 按套餐类型分类的排行榜
-    top_10_mobile = generate_top_cheapest(all_plans, "mobile", 10)
-    top_10_standard = generate_top_cheapest(all_plans, "standard", 10)
-    top_10_ultimate = generate_top_cheapest(all_plans, "ultimate", 10)
-    
-    # 按付费周期分类的排行榜
-    top_10_monthly = generate_top_cheapest(all_plans, "monthly", 10)
-    top_10_yearly = generate_top_cheapest(all_plans, "yearly", 10)
-    
-    # 新增：Ultimate年付套餐排行榜（包含Premium和Ultimate，因为它们是同级别）
-    yearly_plans = [p for p in all_plans if p.get('plan_group') == 'yearly' or '每年' in p.get('billing_cycle', '')]
-    top_10_ultimate_yearly = generate_top_cheapest(yearly_plans, "ultimate", 10)
+        log.error("❌ 没有有效的套餐数据，程序退出")
+        return None, False
+    
+    log.info(f"\n📊 数据处理完成:")
+    log.info(f"  成功处理: {successful_countries} 个国家")
+    log.info(f"  处理失败: {failed_countries} 个国家")
+    log.info(f"  总套餐数: {len(all_plans)} 个")
+    log.info(f"  套餐名: {name_stats['trusted']} 个已由爬虫标准化（跳过），{name_stats['normalized']} 个重新标准化")
+    
+    # 生成各种排行榜：一次遍历，每个套餐只分类一次（自定义排行榜见 leaderboards.json）
+    log.info(f"\n🏆 生成排行榜...")
+    updated_at = datetime.now().strftime('%Y-%m-%d')
+    incremental_report = None
+    if previous is not None and previous["_metadata"]["fingerprints"].get("leaderboards") == leaderboards.fingerprint():
+        leaderboard_sections, patched, rebuilt = leaderboards.patch(previous, dirty | removed,
+                                                                    plans_by_country, updated_at)
+        incremental_report = {
+            "reconverted": sorted(dirty),
+            "reused": len(price_data) - len(dirty),
+            "removed": sorted(removed),
+            "leaderboards_patched": patched,
+            "leaderboards_rebuilt": rebuilt,
+        }
+        log.info(f"  排行榜: 修补 {len(patched)} 个，重建 {len(rebuilt)} 个，"
+                 f"未变 {len(leaderboard_sections) - len(patched) - len(rebuilt)} 个")
+        if not dirty and not removed and not patched and not rebuilt:
+            if previous_file != output_file:
+                log.info(f"✅ 与最新归档 {previous_file} 相比没有变化，沿用归档结果")
+                return previous, True
+            log.info(f"✅ 没有国家或汇率超出容差的变化，{output_file} 保持不变")
+            return previous, False
+    else:
+        leaderboard_sections = leaderboards.add_all(all_plans).sections(updated_at)
     
     # 构建输出数据（参考Spotify项目的JSON结构）
     output_data = {
@@ -439,79 +474,92 @@ def main():
             "successful_countries": successful_countries,
             "failed_countries": failed_countries,
             "total_plans": len(all_plans),
+            "price_cny_stats": summarize_country_stats(country_stats),
+            "plan_names": name_stats,
             "base_currency": BASE_CURRENCY,
             "target_currency": TARGET_CURRENCY,
+            "target_currencies": engine.targets,
             "exchange_api": "OpenExchangeRates",
-            "cny_exchange_rate": rates.get(TARGET_CURRENCY, 0)
-        },
-        "_top_10_cheapest_all": {
-            "description": "最便宜的10个HBO Max套餐（所有类型）",
-            "updated_at": datetime.now().strftime('%Y-%m-%d'),
-            "data": top_10_all
-        },
-        "_top_10_cheapest_mobile": {
-            "description": "最便宜的10个Mobile套餐",
-            "updated_at": datetime.now().strftime('%Y-%m-%d'),
-            "data": top_10_mobile
-        },
-        "_top_10_cheapest_standard": {
-            "description": "最便宜的10个Standard套餐", 
-            "updated_at": datetime.now().strftime('%Y-%m-%d'),
-            "data": top_10_standard
-        },
-        "_top_10_cheapest_ultimate": {
-            "description": "最便宜的10个Ultimate套餐",
-            "updated_at": datetime.now().strftime('%Y-%m-%d'), 
-            "data": top_10_ultimate
-        },
-        "_top_10_cheapest_monthly": {
-            "description": "最便宜的10个按月付费套餐", 
-            "updated_at": datetime.now().strftime('%Y-%m-%d'),
-            "data": top_10_monthly
+            "cny_exchange_rate": rates.get(TARGET_CURRENCY, 0),
+            **rates_metadata,
+            **({"incremental": incremental_report} if incremental_report else {}),
+            "fingerprints": fingerprints
         },
-        "_top_10_cheapest_yearly": {
-            "description": "最便宜的10个按年付费套餐",
-            "updated_at": datetime.now().strftime('%Y-%m-%d'), 
-            "data": top_10_yearly
-        },
-        "_top_10_cheapest_ultimate_yearly": {
-            "description": "最便宜的10个Ultimate年付套餐",
-            "updated_at": datetime.now().strftime('%Y-%m-%d'), 
-            "data": top_10_ultimate_yearly
-        }
+        **leaderboard_sections
     }
     
-    # 添加所有国家的完整数据
-    for country_code, country_data in price_data.items():
-        country_plans = [p for p in all_plans if p.get('country_code') == country_code]
-        if country_plans:
-            output_data[country_code] = {
-                "country_name": country_plans[0].get('country_name'),
-                "country_name_cn": country_plans[0].get('country_name_cn'),
-                "plans": country_plans,
-                "total_plans": len(country_plans)
-            }
-    
-    # 保存结果
+    # 添加所有国家的完整数据（直接取索引，不再为每个国家扫描全部套餐）
+    for country_code, country_plans in plans_by_country.items():
+        output_data[country_code] = {
+            "country_name": country_plans[0].get('country_name'),
+            "country_name_cn": country_plans[0].get('country_name_cn'),
+            "plans": country_plans,
+            "total_plans": len(country_plans),
+            **country_stats[country_code]
+        }
+    return output_data, True
+
+def log_leaderboard_preview(output_data: Dict[str, Any]):
+    """显示排行榜预览"""
+    top_10_all = output_data.get("_top_10_cheapest_all", {}).get("data", [])
+    if top_10_all:
+        log.info(f"\n🏆 HBO Max 全球最便宜前5名:")
+        for i, plan in enumerate(top_10_all[:5]):
+            log.info(f"  {i+1}. {plan['country_name_cn']} - {plan['plan_name']}: ¥{plan['price_cny']}")
+
+def save_output(output_data: Dict[str, Any], output_file: str):
+    """保存转换结果"""
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(output_data, f, ensure_ascii=False, indent=2)
         
-        print(f"✅ 转换结果已保存到: {OUTPUT_FILE}")
+        log.info(f"✅ 转换结果已保存到: {output_file}")
         
         # 显示统计信息
-        file_size = os.path.getsize(OUTPUT_FILE) / 1024  # KB
-        print(f"📁 文件大小: {file_size:.1f} KB")
+        file_size = os.path.getsize(output_file) / 1024  # KB
+        log.info(f"📁 文件大小: {file_size:.1f} KB")
         
-        # 显示排行榜预览
-        if top_10_all:
-            print(f"\n🏆 HBO Max 全球最便宜前5名:")
-            for i, plan in enumerate(top_10_all[:5]):
-                print(f"  {i+1}. {plan['country_name_cn']} - {plan['plan_name']}: ¥{plan['price_cny']}")
+        log_leaderboard_preview(output_data)
         
     except Exception as e:
-        print(f"❌ 保存文件失败: {e}")
-        print(traceback.format_exc())
+        log.error(f"❌ 保存文件失败: {e}")
+        log.error(traceback.format_exc())
+
+def main(input_file: Optional[str] = None, output_file: Optional[str] = None,
+         rates: Optional[Dict[str, float]] = None, incremental: Optional[bool] = None):
+    """
+    主函数
+    input_file/output_file 默认为 INPUT_FILE/OUTPUT_FILE；传入 rates 时不再请求汇率 API（基准测试、离线重算）
+    incremental 为 True 时（默认取 MAX_INCREMENTAL 环境变量）只重新换算指纹变化的国家，
+    其余国家沿用上一次输出中的条目，排行榜只修补受影响的部分
+    """
+    log.info("🎬 HBO Max 价格汇率转换器启动...")
+    output_file = output_file or OUTPUT_FILE
+    
+    # 加载价格数据
+    price_data = load_max_prices(input_file)
+    if not price_data:
+        log.error("❌ 无法加载价格数据，程序退出")
+        return
+    
+    output_data, changed = convert(price_data, rates, output_file, incremental)
+    if output_data is not None and changed:
+        save_output(output_data, output_file)
+
+def cli(argv: Optional[List[str]] = None):
+    """转换器命令行入口（python max_rate_converter.py / python max_cli.py convert）"""
+    import argparse
+    from max_profiler import add_profile_arguments, profiling_from_args
+
+    parser = argparse.ArgumentParser(description="HBO Max 价格汇率转换器")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="只重新换算变化的国家（也可用 MAX_INCREMENTAL=1）")
+    add_profile_arguments(parser)
+    cli_args = parser.parse_args(argv)
+
+    with profiling_from_args("converter", cli_args):
+        main(incremental=cli_args.incremental)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    cli()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 汇率存储
+按日期把每次获取的汇率表保存到 rates/YYYY-MM-DD.json：
+- TTL 内的重复运行直接使用缓存，不再请求 API
+- 请求时只带上快照中实际出现的货币（symbols）
+- API 不可用时回退到最近一次的缓存，并标记为过期（stale）
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from max_logger import get_logger
+
+log = get_logger("rates")
+
+RATES_DIR = os.getenv("MAX_RATES_DIR", "rates")
+# 缓存有效期（小时），默认 12 小时
+RATES_TTL_HOURS = float(os.getenv("MAX_RATES_TTL_HOURS", "12"))
+EXCHANGE_API_URL = 'https://openexchangerates.org/api/latest.json'
+REQUEST_TIMEOUT = 30
+
+
+class RateTable:
+    """一张汇率表及其来源信息"""
+
+    __slots__ = ("rates", "base", "date", "fetched_at", "symbol_fetched_at", "source", "stale", "path")
+
+    def __init__(self, rates: Dict[str, float], base: str, date: str, fetched_at: str,
+                 source: str, stale: bool = False, path: str = "",
+                 symbol_fetched_at: Optional[Dict[str, str]] = None):
+        self.rates = rates
+        self.base = base
+        self.date = date
+        self.fetched_at = fetched_at
+        # 每种货币各自的获取时间：同一天分批获取时，只刷新本次请求到的货币
+        self.symbol_fetched_at = symbol_fetched_at or {}
+        self.source = source  # api / cache / stale
+        self.stale = stale
+        self.path = path
+
+    def age_hours(self, symbols: Optional[Iterable[str]] = None) -> float:
+        """
+        汇率的年龄（小时）：取 symbols（默认全部货币）中最早的获取时间
+        没有单独记录的货币（旧格式的缓存文件）按整张表的 fetched_at 计算
+        """
+        symbols = list(symbols) if symbols else list(self.rates)
+        stamps = {self.symbol_fetched_at.get(symbol, self.fetched_at) for symbol in symbols}
+        try:
+            oldest = min(datetime.fromisoformat(stamp) for stamp in stamps or {self.fetched_at})
+        except ValueError:
+            return float("inf")
+        return (datetime.now() - oldest).total_seconds() / 3600
+
+    def covers(self, symbols: Iterable[str]) -> bool:
+        return all(symbol in self.rates for symbol in symbols)
+
+    def metadata(self) -> Dict[str, Any]:
+        """写入输出文件 _metadata 的汇率来源字段"""
+        return {
+            "rates_source": self.source,
+            "rates_date": self.date,
+            "rates_fetched_at": self.fetched_at,
+            "rates_stale": self.stale,
+        }
+
+
+class RateStore:
+    """按日期保存的汇率表目录"""
+
+    def __init__(self, directory: str = RATES_DIR, ttl_hours: float = RATES_TTL_HOURS):
+        self.directory = directory
+        self.ttl_hours = ttl_hours
+
+    def path_for(self, date: str) -> str:
+        return os.path.join(self.directory, f"{date}.json")
+
+    def dates(self) -> List[str]:
+        """已缓存的日期（升序）"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith(".json") and len(name) == 15)
+
+    def load(self, date: str) -> Optional[RateTable]:
+        path = self.path_for(date)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"⚠️ 汇率缓存读取失败: {path} - {e}")
+            return None
+        return RateTable(data.get("rates", {}), data.get("base", "USD"), date,
+                         data.get("fetched_at", ""), "cache", path=path,
+                         symbol_fetched_at=data.get("symbol_fetched_at", {}))
+
+    def latest(self) -> Optional[RateTable]:
+        for date in reversed(self.dates()):
+            table = self.load(date)
+            if table and table.rates:
+                return table
+        return None
+
+    def nearest(self, date: str) -> Optional[RateTable]:
+        """
+        与 date（YYYY-MM-DD）最接近的汇率表：优先当天或之前最近的一天，没有时取之后最早的一天
+        用于按历史日期重新换算归档快照
+        """
+        dates = self.dates()
+        before = [d for d in dates if d <= date]
+        candidates = list(reversed(before)) + [d for d in dates if d > date]
+        for candidate in candidates:
+            table = self.load(candidate)
+            if table and table.rates:
+                return table
+        return None
+
+    def save(self, rates: Dict[str, float], base: str) -> RateTable:
+        """
+        保存今天的汇率表；同一天多次获取时与已有表合并（新值优先），原子替换
+        每种货币单独记录获取时间，本次未请求的货币保留原来的获取时间
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        date = datetime.now().strftime('%Y-%m-%d')
+        existing = self.load(date)
+        merged: Dict[str, float] = {}
+        symbol_fetched_at: Dict[str, str] = {}
+        if existing and existing.base == base:
+            merged.update(existing.rates)
+            symbol_fetched_at = {symbol: existing.symbol_fetched_at.get(symbol, existing.fetched_at)
+                                 for symbol in existing.rates}
+        merged.update(rates)
+        fetched_at = datetime.now().isoformat()
+        symbol_fetched_at.update((symbol, fetched_at) for symbol in rates)
+        path = self.path_for(date)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"base": base, "fetched_at": fetched_at, "rates": dict(sorted(merged.items())),
+                       "symbol_fetched_at": dict(sorted(symbol_fetched_at.items()))},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return RateTable(merged, base, date, fetched_at, "api", path=path,
+                         symbol_fetched_at=symbol_fetched_at)
+
+    def get_rates(self, api_key: str, base: str = "USD", symbols: Optional[Iterable[str]] = None,
+                  api_url: str = EXCHANGE_API_URL) -> Optional[RateTable]:
+        """
+        返回可用的汇率表：
+        1. 最近的缓存在 TTL 内且包含全部所需货币 -> 直接使用
+        2. 否则请求 API（只请求所需货币）并写入缓存
+        3. 请求失败 -> 回退到最近的缓存，标记 stale
+        """
+        wanted = sorted(set(symbols)) if symbols else []
+        cached = self.latest()
+        if cached and cached.base == base and cached.covers(wanted) and cached.age_hours(wanted) < self.ttl_hours:
+            log.info(f"💾 使用缓存汇率: {cached.path}（{cached.age_hours(wanted):.1f} 小时前获取）")
+            return cached
+
+        if api_key:
+            # requests 只在需要请求 API 时才导入：缓存命中的运行不必加载它
+            import requests
+            try:
+                log.info(f"🔄 获取汇率数据（{len(wanted) or '全部'} 种货币）...")
+                params = {'app_id': api_key, 'base': base, 'prettyprint': False, 'show_alternative': False}
+                if wanted:
+                    params['symbols'] = ",".join(wanted)
+                start = time.perf_counter()
+                response = requests.get(api_url, params=params, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                rates = response.json().get('rates', {})
+                if rates:
+                    table = self.save(rates, base)
+                    log.info(f"✅ 成功获取 {len(rates)} 种货币的汇率（{time.perf_counter() - start:.1f}s），"
+                             f"已缓存到 {table.path}")
+                    return table
+                log.error("❌ 汇率数据为空")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # 异常信息里带有完整 URL，隐藏 app_id
+                log.error(f"❌ 汇率请求失败: {str(e).replace(api_key, '***')}")
+        else:
+            log.error("❌ 未设置API_KEY环境变量")
+
+        if cached:
+            cached.source = "stale"
+            cached.stale = True
+            missing = [symbol for symbol in wanted if symbol not in cached.rates]
+            log.warning(f"⚠️ 使用过期的缓存汇率: {cached.path}（{cached.date}，{cached.age_hours(wanted):.1f} 小时前获取）"
+                        + (f"，缺少: {', '.join(missing)}" if missing else ""))
+            return cached
+        return None
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 参考数据
+爬虫、转换器和检测器共用的静态表（国家路径、国家名、中文名、货币映射、货币符号、计费周期关键词、价格阈值）
+源表在 max_reference/tables.py 中维护，首次使用时编译为 reference.pickle：
+- 加载是惰性的：只有第一次调用访问函数时才读取（hashlib/pickle 也在那时才导入），之后在进程内复用
+- 编译结果带有源表的 sha256，源表变化或文件损坏时自动重新编译
+- 编译时预先完成排序、反查表等派生计算，调用方不再逐次重建
+"""
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from max_logger import get_logger
+
+log = get_logger("reference")
+
+# 编译格式版本：修改 compile_tables 的输出结构时递增
+REFERENCE_VERSION = 1
+SOURCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables.py")
+COMPILED_FILE = (os.getenv("MAX_REFERENCE_CACHE")
+                 or os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference.pickle"))
+
+_data: Optional[Dict[str, Any]] = None
+
+
+def source_hash(path: str = SOURCE_FILE) -> str:
+    """源表文件与编译格式版本的哈希"""
+    import hashlib
+    with open(path, 'rb') as f:
+        content = f.read()
+    return hashlib.sha256(f"v{REFERENCE_VERSION}\n".encode('utf-8') + content).hexdigest()
+
+
+def compile_tables() -> Dict[str, Any]:
+    """由源表生成编译后的参考数据"""
+    from max_reference import tables
+
+    chinese_by_english = {tables.COUNTRY_NAMES[code]: name for code, name in tables.CHINESE_NAMES.items()
+                          if code in tables.COUNTRY_NAMES}
+    chinese_by_english.update(tables.EXTRA_CHINESE_NAMES)
+    return {
+        "region_paths": {code: tuple(paths) for code, paths in tables.REGION_PATHS.items()},
+        "country_names": dict(tables.COUNTRY_NAMES),
+        "chinese_by_code": dict(tables.CHINESE_NAMES),
+        "chinese_by_english": chinese_by_english,
+        "country_currencies": dict(tables.COUNTRY_CURRENCIES),
+        # 按符号长度从长到短排序（稳定排序，同长度保持源表顺序）
+        "currency_symbols": tuple(sorted(tables.CURRENCY_SYMBOLS.items(), key=lambda x: len(x[0]), reverse=True)),
+        "monthly_keywords": tuple(tables.MONTHLY_KEYWORDS),
+        "yearly_keywords": tuple(tables.YEARLY_KEYWORDS),
+        "price_ranges": {code: dict(ranges) for code, ranges in tables.PRICE_RANGES.items()},
+    }
+
+
+def build(path: str = COMPILED_FILE) -> Dict[str, Any]:
+    """重新编译源表并写入 path（原子替换），返回编译结果"""
+    import pickle
+    data = compile_tables()
+    payload = {"version": REFERENCE_VERSION, "source_hash": source_hash(), "tables": data}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return data
+
+
+def _load_compiled(path: str) -> Optional[Dict[str, Any]]:
+    """读取编译结果；文件缺失、损坏或与源表哈希不一致时返回 None"""
+    import pickle
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+        log.warning(f"⚠️ 参考数据缓存无法读取，重新编译: {path} - {e}")
+        return None
+    if not isinstance(payload, dict) or payload.get("source_hash") != source_hash():
+        log.info("ℹ️ 参考数据源表已变化，重新编译")
+        return None
+    return payload.get("tables")
+
+
+def load() -> Dict[str, Any]:
+    """返回参考数据（首次调用时加载或编译）"""
+    global _data
+    if _data is None:
+        data = _load_compiled(COMPILED_FILE)
+        if data is None:
+            try:
+                data = build(COMPILED_FILE)
+                log.debug(f"🔧 参考数据已编译: {COMPILED_FILE}")
+            except OSError as e:
+                # 只读目录等情况：直接使用源表，下次运行再尝试写入
+                log.warning(f"⚠️ 参考数据缓存无法写入，直接使用源表: {e}")
+                data = compile_tables()
+        _data = data
+    return _data
+
+
+def region_paths() -> Dict[str, Tuple[str, ...]]:
+    """国家代码（小写）-> 多语言 URL 路径"""
+    return load()["region_paths"]
+
+
+def country_names() -> Dict[str, str]:
+    """国家代码（小写）-> 英文国家名"""
+    return load()["country_names"]
+
+
+def chinese_name(english_name: str, country_code: str = "") -> str:
+    """英文国家名对应的中文名；按英文名找不到时再按国家代码查找，都没有时原样返回英文名"""
+    data = load()
+    name = data["chinese_by_english"].get(english_name)
+    if name is None and country_code:
+        name = data["chinese_by_code"].get(country_code.lower())
+    return name or english_name
+
+
+def country_currency(country_code: str) -> Optional[str]:
+    """国家的定价货币（小写国家代码）；没有映射时返回 None"""
+    return load()["country_currencies"].get(country_code)
+
+
+def known_currencies() -> Tuple[str, ...]:
+    """参考数据中出现的全部货币代码（国家定价货币与货币符号映射的并集），已排序"""
+    data = load()
+    codes = set(data["country_currencies"].values())
+    codes.update(code for _, code in data["currency_symbols"])
+    return tuple(sorted(codes))
+
+
+def currency_symbols() -> Tuple[Tuple[str, str], ...]:
+    """(货币符号, 货币代码)，已按符号长度从长到短排序"""
+    return load()["currency_symbols"]
+
+
+def billing_keywords() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(月付关键词, 年付关键词)"""
+    data = load()
+    return data["monthly_keywords"], data["yearly_keywords"]
+
+
+def price_ranges(country_code: str) -> Dict[str, float]:
+    """国家（小写代码）的月付上限/年付下限，没有单独配置时返回默认值"""
+    ranges = load()["price_ranges"]
+    return ranges.get(country_code, ranges["default"])
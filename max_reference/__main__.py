@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重新编译参考数据: python -m max_reference
+"""
+
+import sys
+from typing import List, Optional
+
+from max_reference import COMPILED_FILE, build, source_hash
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="重新编译参考数据（max_reference/tables.py -> reference.pickle）")
+    parser.parse_args(argv)
+
+    data = build(COMPILED_FILE)
+    print(f"✅ 参考数据已编译: {COMPILED_FILE}（源表 sha256 {source_hash()[:12]}）")
+    for name, table in data.items():
+        print(f"  {name}: {len(table)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 参考数据源表
+国家路径、国家名（英文/中文）、货币映射、货币符号、计费周期关键词和价格阈值都在这里维护；
+max_reference 首次使用时把它们编译成 reference.pickle，之后按本文件的哈希校验并直接加载
+修改本文件后无需手动重新编译，哈希变化时会自动重建
+"""
+
+from typing import Dict, List
+
+# 静态区域映射：国家代码 -> 多语言 URL 路径列表（基于原有max.py）
+REGION_PATHS: Dict[str, List[str]] = {
+    # 亚太地区
+    "my": ["/my/en", "/my/zh", "/my/ms"],
+    "hk": ["/hk/en", "/hk/zh"],
+    "ph": ["/ph/en", "/ph/tl"],
+    "tw": ["/tw/en", "/tw/zh"],
+    "id": ["/id/en", "/id/id"],
+    "sg": ["/sg/en", "/sg/ms"],
+    "th": ["/th/en", "/th/th"],
+    "au": ["/au/en"],
+    "bd": ["/bd/en", "/bd/bn"],        # Bangladesh
+    "bn": ["/bn/en", "/bn/ms"],        # Brunei
+    "kh": ["/kh/en", "/kh/km"],        # Cambodia
+    "la": ["/la/en", "/la/lo"],        # Laos
+    "mo": ["/mo/en", "/mo/zh"],        # Macau
+    "mn": ["/mn/en", "/mn/mn"],        # Mongolia
+    "lk": ["/lk/en", "/lk/si"],        # Sri Lanka
+    "mm": ["/mm/en", "/mm/my"],        # Myanmar
+    "np": ["/np/en", "/np/ne"],        # Nepal
+    "pw": ["/pw/en"],                  # Palau
+    "pg": ["/pg/en"],                  # Papua New Guinea
+    "sb": ["/sb/en"],                  # Solomon Islands
+    "tl": ["/tl/en", "/tl/pt"],        # Timor Leste
+    "co": ["/co/es"], "cr": ["/cr/es"], "gt": ["/gt/es"], "pe": ["/pe/es"],
+    "uy": ["/uy/es"], "mx": ["/mx/es"], "hn": ["/hn/es"], "ni": ["/ni/es"],
+    "pa": ["/pa/es"], "ar": ["/ar/es"], "bo": ["/bo/es"], "do": ["/do/es"],
+    "ec": ["/ec/es"], "sv": ["/sv/es"], "py": ["/py/es"], "cl": ["/cl/es"],
+    "br": ["/br/pt"],
+    "jm": ["/jm/en"], "ai": ["/ai/en"], "ag": ["/ag/en"],
+    "aw": ["/aw/en"], "bs": ["/bs/en"], "bb": ["/bb/en"], "bz": ["/bz/en"],
+    "vg": ["/vg/en"], "ky": ["/ky/en"], "cw": ["/cw/en"], "dm": ["/dm/en"],
+    "gd": ["/gd/en"], "gy": ["/gy/en"], "ht": ["/ht/en"], "kn": ["/kn/en"],
+    "lc": ["/lc/en"], "vc": ["/vc/en"], "sr": ["/sr/en"], "tt": ["/tt/en"],
+    "tc": ["/tc/en"],
+    "us": ["/us/en", "/us/es"],
+    "ad": ["/ad/en", "/ad/es"],
+    "ba": ["/ba/en", "/ba/hr"],
+    "bg": ["/bg/en", "/bg/bg"],
+    "hr": ["/hr/en", "/hr/hr"],
+    "cz": ["/cz/cs"],
+    "hu": ["/hu/hu"],
+    "mk": ["/mk/en", "/mk/mk"],
+    "md": ["/md/en", "/md/ro"],
+    "me": ["/me/en", "/me/sr"],
+    "ro": ["/ro/en", "/ro/ro"],
+    "rs": ["/rs/en", "/rs/sr"],
+    "sk": ["/sk/en", "/sk/sk"],
+    "si": ["/si/en", "/si/sl"],
+    "dk": ["/dk/da"],
+    "fi": ["/fi/en", "/fi/fi"],
+    "no": ["/no/no"],
+    "se": ["/se/sv"],
+    "es": ["/es/en", "/es/es"],
+    "fr": ["/fr/en", "/fr/fr"],
+    "be": ["/be/en", "/be/nl", "/be/fr"],
+    "pt": ["/pt/en", "/pt/pt"],
+    "nl": ["/nl/en", "/nl/nl"],
+    "pl": ["/pl/pl"],
+    "tr": ["/tr/en", "/tr/tr"],
+    "pk": ["/pk/en", "/pk/ur"],        # Pakistan
+
+    # 缺失的欧洲国家
+    "al": ["/al/en", "/al/sq"],        # Albania
+    "am": ["/am/en", "/am/hy"],        # Armenia  
+    "cy": ["/cy/en", "/cy/el"],        # Cyprus
+    "ee": ["/ee/en", "/ee/et"],        # Estonia
+    "ge": ["/ge/en", "/ge/ka"],        # Georgia
+    "is": ["/is/en", "/is/is"],        # Iceland
+    "kz": ["/kz/en", "/kz/kk"],        # Kazakhstan
+    "kg": ["/kg/en", "/kg/ky"],        # Kyrgyzstan
+    "lv": ["/lv/en", "/lv/lv"],        # Latvia
+    "lt": ["/lt/en", "/lt/lt"],        # Lithuania
+    "mt": ["/mt/en", "/mt/mt"],        # Malta
+    "tj": ["/tj/en", "/tj/tg"],        # Tajikistan
+    "ua": ["/ua/en", "/ua/uk"],        # Ukraine
+    "de": ["/de/en", "/de/de"],        # Germany
+    "it": ["/it/en", "/it/it"],        # Italy
+    "at": ["/at/en", "/at/de"],        # Austria
+    "ch": ["/ch/en", "/ch/de", "/ch/fr", "/ch/it"],  # Switzerland
+    "gr": ["/gr/en", "/gr/el"],        # Greece
+    "lu": ["/lu/en", "/lu/fr", "/lu/de"],  # Luxembourg
+    "li": ["/li/en", "/li/de"],        # Liechtenstein
+    "il": ["/il/en", "/il/he"],        # Israel
+    "gb": ["/gb/en"],                  # United Kingdom
+    "ie": ["/ie/en"],                  # Ireland
+
+    # 非洲国家
+    "bw": ["/bw/en"],                  # Botswana
+    "et": ["/et/en"],                  # Ethiopia
+    "gh": ["/gh/en"],                  # Ghana
+    "ke": ["/ke/en"],                  # Kenya
+    "ng": ["/ng/en"],                  # Nigeria
+    "za": ["/za/en"],                  # South Africa
+    "tz": ["/tz/en"],                  # Tanzania
+    "ug": ["/ug/en"],                  # Uganda
+    "zw": ["/zw/en"],                  # Zimbabwe
+
+    # 缺失的拉美国家
+    "gp": ["/gp/en", "/gp/fr"],        # Guadeloupe
+}
+
+# 国家名称映射
+COUNTRY_NAMES: Dict[str, str] = {
+    # 亚太地区
+    "my": "Malaysia", "hk": "Hong Kong", "ph": "Philippines", "tw": "Taiwan",
+    "id": "Indonesia", "sg": "Singapore", "th": "Thailand", "au": "Australia",
+    "bd": "Bangladesh", "bn": "Brunei", "kh": "Cambodia", "la": "Laos",
+    "mo": "Macau", "mn": "Mongolia", "lk": "Sri Lanka", "mm": "Myanmar",
+    "np": "Nepal", "pw": "Palau", "pg": "Papua New Guinea", "sb": "Solomon Islands",
+    "tl": "Timor Leste",
+
+    # 拉丁美洲
+    "co": "Colombia",
+    "cr": "Costa Rica", "gt": "Guatemala", "pe": "Peru", "uy": "Uruguay",
+    "mx": "Mexico", "hn": "Honduras", "ni": "Nicaragua", "pa": "Panama",
+    "ar": "Argentina", "bo": "Bolivia", "do": "Dominican Republic", "ec": "Ecuador",
+    "sv": "El Salvador", "py": "Paraguay", "cl": "Chile", "br": "Brazil",
+    "jm": "Jamaica", "ai": "Anguilla", "ag": "Antigua and Barbuda",
+    "aw": "Aruba", "bs": "Bahamas", "bb": "Barbados", "bz": "Belize",
+    "vg": "British Virgin Islands", "ky": "Cayman Islands", "cw": "Curacao",
+    "dm": "Dominica", "gd": "Grenada", "gy": "Guyana", "ht": "Haiti",
+    "kn": "Saint Kitts and Nevis", "lc": "Saint Lucia", "vc": "Saint Vincent and the Grenadines",
+    "sr": "Suriname", "tt": "Trinidad and Tobago", "tc": "Turks and Caicos Islands",
+    "us": "United States", "ad": "Andorra", "ba": "Bosnia and Herzegovina",
+    "bg": "Bulgaria", "hr": "Croatia", "cz": "Czech Republic", "hu": "Hungary",
+    "mk": "North Macedonia", "md": "Moldova", "me": "Montenegro", "ro": "Romania",
+    "rs": "Serbia", "sk": "Slovakia", "si": "Slovenia", "dk": "Denmark",
+    "fi": "Finland", "no": "Norway", "se": "Sweden", "es": "Spain",
+    "fr": "France", "be": "Belgium", "pt": "Portugal", "nl": "Netherlands",
+    "pl": "Poland", "tr": "Turkey", "pk": "Pakistan",
+
+    # 缺失的欧洲国家
+    "al": "Albania", "am": "Armenia", "cy": "Cyprus", "ee": "Estonia",
+    "ge": "Georgia", "is": "Iceland", "kz": "Kazakhstan", "kg": "Kyrgyzstan",
+    "lv": "Latvia", "lt": "Lithuania", "mt": "Malta", "tj": "Tajikistan", "ua": "Ukraine",
+    "de": "Germany", "it": "Italy", "at": "Austria", "ch": "Switzerland",
+    "gr": "Greece", "lu": "Luxembourg", "li": "Liechtenstein", "il": "Israel",
+    "gb": "United Kingdom", "ie": "Ireland",
+
+    # 非洲国家
+    "bw": "Botswana", "et": "Ethiopia", "gh": "Ghana", "ke": "Kenya",
+    "ng": "Nigeria", "za": "South Africa", "tz": "Tanzania", "ug": "Uganda",
+    "zw": "Zimbabwe",
+
+    # 缺失的拉美国家
+    "gp": "Guadeloupe"
+}
+
+# 国家中文名称：国家代码 -> 中文名，覆盖 COUNTRY_NAMES 中的全部国家
+CHINESE_NAMES: Dict[str, str] = {
+    # 亚太地区
+    "my": "马来西亚", "hk": "香港", "ph": "菲律宾", "tw": "台湾",
+    "id": "印度尼西亚", "sg": "新加坡", "th": "泰国", "au": "澳大利亚",
+    "bd": "孟加拉国", "bn": "文莱", "kh": "柬埔寨", "la": "老挝",
+    "mo": "澳门", "mn": "蒙古", "lk": "斯里兰卡", "mm": "缅甸",
+    "np": "尼泊尔", "pw": "帕劳", "pg": "巴布亚新几内亚", "sb": "所罗门群岛",
+    "tl": "东帝汶",
+
+    # 拉丁美洲
+    "co": "哥伦比亚",
+    "cr": "哥斯达黎加", "gt": "危地马拉", "pe": "秘鲁", "uy": "乌拉圭",
+    "mx": "墨西哥", "hn": "洪都拉斯", "ni": "尼加拉瓜", "pa": "巴拿马",
+    "ar": "阿根廷", "bo": "玻利维亚", "do": "多米尼加共和国", "ec": "厄瓜多尔",
+    "sv": "萨尔瓦多", "py": "巴拉圭", "cl": "智利", "br": "巴西",
+    "jm": "牙买加", "ai": "安圭拉", "ag": "安提瓜和巴布达",
+    "aw": "阿鲁巴", "bs": "巴哈马", "bb": "巴巴多斯", "bz": "伯利兹",
+    "vg": "英属维尔京群岛", "ky": "开曼群岛", "cw": "库拉索",
+    "dm": "多米尼克", "gd": "格林纳达", "gy": "圭亚那", "ht": "海地",
+    "kn": "圣基茨和尼维斯", "lc": "圣卢西亚", "vc": "圣文森特和格林纳丁斯",
+    "sr": "苏里南", "tt": "特立尼达和多巴哥", "tc": "特克斯和凯科斯群岛",
+    "us": "美国", "ad": "安道尔", "ba": "波斯尼亚和黑塞哥维那",
+    "bg": "保加利亚", "hr": "克罗地亚", "cz": "捷克共和国", "hu": "匈牙利",
+    "mk": "北马其顿", "md": "摩尔多瓦", "me": "黑山", "ro": "罗马尼亚",
+    "rs": "塞尔维亚", "sk": "斯洛伐克", "si": "斯洛文尼亚", "dk": "丹麦",
+    "fi": "芬兰", "no": "挪威", "se": "瑞典", "es": "西班牙",
+    "fr": "法国", "be": "比利时", "pt": "葡萄牙", "nl": "荷兰",
+    "pl": "波兰", "tr": "土耳其", "pk": "巴基斯坦",
+
+    # 欧洲国家
+    "al": "阿尔巴尼亚", "am": "亚美尼亚", "cy": "塞浦路斯", "ee": "爱沙尼亚",
+    "ge": "格鲁吉亚", "is": "冰岛", "kz": "哈萨克斯坦", "kg": "吉尔吉斯斯坦",
+    "lv": "拉脱维亚", "lt": "立陶宛", "mt": "马耳他", "tj": "塔吉克斯坦", "ua": "乌克兰",
+    "de": "德国", "it": "意大利", "at": "奥地利", "ch": "瑞士",
+    "gr": "希腊", "lu": "卢森堡", "li": "列支敦士登", "il": "以色列",
+    "gb": "英国", "ie": "爱尔兰",
+
+    # 非洲国家
+    "bw": "博茨瓦纳", "et": "埃塞俄比亚", "gh": "加纳", "ke": "肯尼亚",
+    "ng": "尼日利亚", "za": "南非", "tz": "坦桑尼亚", "ug": "乌干达",
+    "zw": "津巴布韦",
+
+    "gp": "瓜德罗普"
+}
+
+# 不在 COUNTRY_NAMES 中、但旧快照里出现过的国家：英文名 -> 中文名
+EXTRA_CHINESE_NAMES: Dict[str, str] = {
+    "Montserrat": "蒙特塞拉特",
+}
+
+
+# 国家到货币的精确映射（detect_currency 的最高优先级）
+COUNTRY_CURRENCIES: Dict[str, str] = {
+    'my': 'MYR',     # Malaysia - RM
+    'sg': 'SGD',     # Singapore - S$ 或 $（需要特别处理）
+    'th': 'THB',     # Thailand - ฿
+    'id': 'IDR',     # Indonesia - Rp
+    'ph': 'PHP',     # Philippines - ₱
+    'hk': 'HKD',     # Hong Kong - HK$ 或 $（需要特别处理）
+    'tw': 'TWD',     # Taiwan - NT$
+    'au': 'AUD',     # Australia - A$ 或 $（需要特别处理）
+    'us': 'USD',     # United States - $
+    'co': 'COP',     # Colombia - $
+    'cr': 'CRC',     # Costa Rica - ₡
+    'gt': 'GTQ',     # Guatemala - Q
+    'pe': 'PEN',     # Peru - S/.
+    'uy': 'UYU',     # Uruguay - $
+    'mx': 'MXN',     # Mexico - $
+    'hn': 'HNL',     # Honduras - L
+    'ni': 'NIO',     # Nicaragua - C$
+    'pa': 'PAB',     # Panama - B/. 或 $
+    'ar': 'ARS',     # Argentina - $
+    'bo': 'BOB',     # Bolivia - Bs
+    'do': 'DOP',     # Dominican Republic - RD$
+    'ec': 'USD',     # Ecuador - $ (uses USD)
+    'sv': 'USD',     # El Salvador - $ (uses USD)
+    'py': 'PYG',     # Paraguay - Gs
+    'cl': 'CLP',     # Chile - $
+    'br': 'BRL',     # Brazil - R$
+    'gy': 'GYD',     # Guyana - G$ (Guyanese Dollar)
+    'pl': 'PLN',     # Poland - zł
+    'cz': 'CZK',     # Czech Republic - Kč
+    'hu': 'HUF',     # Hungary - Ft
+    'tr': 'TRY',     # Turkey - ₺
+    'pk': 'PKR',     # Pakistan - Rs
+    'dk': 'DKK',     # Denmark - kr
+    'no': 'NOK',     # Norway - kr
+    'se': 'SEK',     # Sweden - kr
+    'fi': 'EUR',     # Finland - €
+    'es': 'EUR',     # Spain - €
+    'fr': 'EUR',     # France - €
+    'be': 'EUR',     # Belgium - €
+    'pt': 'EUR',     # Portugal - €
+    'nl': 'EUR',     # Netherlands - €
+    'hr': 'EUR',     # Croatia - €
+    'me': 'EUR',     # Montenegro - €
+    'sk': 'EUR',     # Slovakia - €
+    'si': 'EUR',     # Slovenia - €
+    'ba': 'BAM',     # Bosnia and Herzegovina - KM
+    'ad': 'EUR',     # Andorra - €
+
+    # 缺失国家的货币映射
+    'ai': 'XCD',     # Anguilla - East Caribbean Dollar
+    'aw': 'USD',     # Aruba - USD (实际使用美元定价)
+    'cw': 'USD',     # Curaçao - USD (实际使用美元定价)
+
+    # 欧洲国家实际使用EUR定价的修正
+    'rs': 'EUR',     # Serbia - 实际使用欧元定价
+    'mk': 'EUR',     # North Macedonia - 实际使用欧元定价
+    'md': 'EUR',     # Moldova - 实际使用欧元定价
+    'bg': 'EUR',     # Bulgaria - 实际使用欧元定价
+    'ro': 'EUR',     # Romania - 实际使用欧元定价
+
+    # 加勒比海国家实际使用USD定价的修正
+    'ky': 'USD',     # Cayman Islands - 实际使用美元定价
+    'gd': 'USD',     # Grenada - 实际使用美元定价
+
+    # 加勒比海国家使用本地货币的修正
+    'jm': 'JMD',     # Jamaica - 牙买加元 (价格$890实际为JMD)
+    'sr': 'SRD',     # Suriname - 苏里南元 (价格$229实际为SRD)
+    'tt': 'TTD',     # Trinidad and Tobago - 特立尼达多巴哥元 (价格$39.99实际为TTD)
+
+    'gp': 'EUR',     # Guadeloupe - Euro
+    'ht': 'HTG',     # Haiti - Haitian Gourde
+    'vc': 'USD',     # Saint Vincent and the Grenadines - 实际使用美元定价
+    'ua': 'EUR',     # Ukraine - Euro (actual pricing currency)
+    'tj': 'EUR',     # Tajikistan - Euro (actual pricing currency)
+
+    # 2025年10月亚太扩展国家（如果HBO Max使用USD，符号检测会优先识别）
+    'bd': 'BDT',     # Bangladesh - Taka (fallback)
+    'bn': 'BND',     # Brunei - Brunei Dollar
+    'kh': 'USD',     # Cambodia - 实际使用美元定价
+    'la': 'LAK',     # Laos - Kip (fallback)
+    'mo': 'MOP',     # Macau - Pataca (fallback)
+    'mn': 'MNT',     # Mongolia - Tugrik (fallback)
+    'lk': 'LKR',     # Sri Lanka - Rupee (fallback)
+    'mm': 'MMK',     # Myanmar - Kyat (fallback)
+    'np': 'NPR',     # Nepal - Rupee (fallback)
+    'pw': 'USD',     # Palau - 实际使用美元定价
+    'pg': 'PGK',     # Papua New Guinea - Kina (fallback)
+    'sb': 'SBD',     # Solomon Islands - Dollar (fallback)
+    'tl': 'USD',     # Timor Leste - 实际使用美元定价
+
+    # 2026年1月欧洲扩展国家
+    'de': 'EUR',     # Germany - €
+    'it': 'EUR',     # Italy - €
+    'at': 'EUR',     # Austria - €
+    'ch': 'CHF',     # Switzerland - CHF
+    'gr': 'EUR',     # Greece - €
+    'lu': 'EUR',     # Luxembourg - €
+    'li': 'CHF',     # Liechtenstein - CHF
+    'il': 'ILS',     # Israel - ₪
+    'gb': 'GBP',     # United Kingdom - £
+    'ie': 'EUR',     # Ireland - €
+
+    # 非洲国家
+    'bw': 'BWP',     # Botswana - Pula
+    'et': 'ETB',     # Ethiopia - Birr
+    'gh': 'GHS',     # Ghana - Cedi
+    'ke': 'KES',     # Kenya - Shilling
+    'ng': 'NGN',     # Nigeria - Naira
+    'za': 'ZAR',     # South Africa - Rand
+    'tz': 'TZS',     # Tanzania - Shilling
+    'ug': 'UGX',     # Uganda - Shilling
+    'zw': 'USD',     # Zimbabwe - 实际使用美元定价
+}
+
+# 详细的货币符号检测（编译时按符号长度从长到短排序，优先匹配更具体的符号）
+# 注意：优先检测价格文本中的货币符号，因为有些国家虽然有本币，但HBO Max使用USD定价
+CURRENCY_SYMBOLS: Dict[str, str] = {
+    # 优先检查带前缀的特殊符号（避免与通用$混淆）
+    'US$': 'USD', 'USD': 'USD',
+    'S$': 'SGD', 'SGD': 'SGD',  # 新加坡元
+    'HK$': 'HKD', 'HKD': 'HKD',  # 港币
+    'A$': 'AUD', 'AUD': 'AUD',   # 澳元
+    'C$': 'CAD', 'CA$': 'CAD',   # 加元
+    'MX$': 'MXN', 'NZ$': 'NZD', 'NT$': 'TWD',
+    'R$': 'BRL', 'RD$': 'DOP',   # 巴西雷亚尔, 多米尼加比索
+
+    # 特殊货币符号
+    '€': 'EUR', 'EUR': 'EUR',
+    '£': 'GBP', 'GBP': 'GBP', 
+    '¥': 'JPY', '￥': 'JPY', 'JPY': 'JPY',
+    '₹': 'INR', 'INR': 'INR',
+    '₱': 'PHP', 'PHP': 'PHP',
+    '₪': 'ILS', '₨': 'PKR', '₦': 'NGN', '₵': 'GHS',
+    '₡': 'CRC', '₩': 'KRW', '₴': 'UAH', '₽': 'RUB',
+    '₺': 'TRY', 'TRY': 'TRY',
+
+    # 字母缩写
+    'zł': 'PLN', 'PLN': 'PLN',
+    'Kč': 'CZK', 'CZK': 'CZK', 
+    'Ft': 'HUF', 'HUF': 'HUF',
+    'TL': 'TRY',  # Turkish Lira
+    'CHF': 'CHF', 'NOK': 'NOK', 'SEK': 'SEK', 'DKK': 'DKK',
+    'RM': 'MYR', 'MYR': 'MYR',  # 马来西亚林吉特
+    '฿': 'THB', 'THB': 'THB',    # 泰铢
+    'Rp': 'IDR', 'IDR': 'IDR',   # 印尼盾
+    'S/.': 'PEN', 'PEN': 'PEN',  # 秘鲁索尔
+    'L': 'HNL', 'Gs': 'PYG', 'Q': 'GTQ',
+    'kr': 'SEK',  # 默认kr为瑞典克朗
+}
+
+# 月付标记（多语言）
+MONTHLY_KEYWORDS: List[str] = [
+    'month', '/month', 'monthly', 'per month',  # English
+    'mes', '/mes', 'mensual', 'por mes',        # Spanish  
+    'mês', '/mês', 'mensal', 'por mês',         # Portuguese
+    'mois', '/mois', 'mensuel', 'par mois',     # French
+    'mese', '/mese', 'mensile', 'al mese',      # Italian
+    'monat', '/monat', 'monatlich', 'pro monat', # German
+    'maand', '/maand', 'maandelijks', 'per maand', # Dutch
+    'miesiąc', '/miesiąc', 'miesięczny',        # Polish
+    'måned', '/måned', 'månedlig', 'pr måned',  # Danish/Norwegian
+    'månad', '/månad', 'månadsvis', 'per månad', # Swedish
+    'kuu', '/kuu', 'kuukausittain',             # Finnish
+    'ay', '/ay', 'aylık', 'ayda',               # Turkish
+    'mies', '/mies', 'miesięcznie',             # Polish alt
+    'месяц', '/месяц', 'в месяц',               # Russian
+]
+
+# 年付标记（多语言）
+YEARLY_KEYWORDS: List[str] = [
+    'year', '/year', 'yearly', 'annual', 'per year', 'annually',  # English
+    'año', '/año', 'anual', 'por año', 'anualmente',              # Spanish
+    'ano', '/ano', 'anual', 'por ano', 'anualmente',              # Portuguese  
+    'an', '/an', 'année', '/année', 'annuel', 'par an',           # French
+    'anno', '/anno', 'annuale', 'all\'anno',                      # Italian
+    'jahr', '/jahr', 'jährlich', 'pro jahr',                      # German
+    'jaar', '/jaar', 'jaarlijks', 'per jaar',                     # Dutch
+    'rok', '/rok', 'roczny', 'rocznie',                           # Polish
+    'år', '/år', 'årlig', 'pr år', 'om året',                     # Danish/Norwegian/Swedish
+    'vuosi', '/vuosi', 'vuosittain',                              # Finnish
+    'yıl', '/yıl', 'yıllık', 'yılda',                            # Turkish
+    'год', '/год', 'в год', 'годовой',                            # Russian
+]
+
+# 各国的月付/年付价格阈值（基于现有数据分析），没有单独配置的国家使用 default
+PRICE_RANGES: Dict[str, Dict[str, float]] = {
+    # 欧洲高价值货币国家
+    'tr': {'monthly_max': 500, 'yearly_min': 1500},       # Turkish Lira
+    'hu': {'monthly_max': 1000, 'yearly_min': 5000},      # Hungarian Forint  
+    'cz': {'monthly_max': 500, 'yearly_min': 2000},       # Czech Koruna
+    'pl': {'monthly_max': 100, 'yearly_min': 200},        # Polish Zloty
+
+    # 北欧克朗国家
+    'dk': {'monthly_max': 200, 'yearly_min': 800},        # Danish Krone
+    'no': {'monthly_max': 200, 'yearly_min': 800},        # Norwegian Krone  
+    'se': {'monthly_max': 200, 'yearly_min': 800},        # Swedish Krona
+
+    # 其他欧洲国家
+    'bg': {'monthly_max': 30, 'yearly_min': 200},         # Bulgarian Lev
+    'ro': {'monthly_max': 50, 'yearly_min': 400},         # Romanian Leu
+    'hr': {'monthly_max': 15, 'yearly_min': 100},         # Croatian Kuna/Euro
+
+    # 默认范围（EUR, USD等）
+    'default': {'monthly_max': 30, 'yearly_min': 200},
+}
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 历史快照批量重算
+读取 archive/ 中全部原始快照（max_prices_all_countries_*.json），为每个快照匹配当天的汇率表，
+并行换算后输出两条时间序列：
+- historical：按快照当天汇率换算的人民币价格（当时用户实际看到的价格）
+- constant：全部快照都按同一张参考汇率表换算（剔除汇率波动，只反映真实调价）
+两者之比即汇率漂移，可以把真实调价和汇率变化区分开
+
+汇率来源优先级：rates/ 中快照当天的汇率表 -> 同一次运行归档的 max_prices_cny_sorted_*.json
+中记录的 exchange_rate_used -> rates/ 中日期最接近的汇率表
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from max_conversion import ConversionEngine, to_optional
+from max_logger import get_logger
+from max_rate_store import RateStore, RATES_DIR
+from max_synthetic import snapshot_rates
+
+log = get_logger("repricing")
+
+ARCHIVE_DIR = 'archive'
+OUTPUT_FILE = 'max_prices_history.json'
+TARGET_CURRENCY = 'CNY'
+SNAPSHOT_PATTERN = re.compile(r"max_prices_all_countries_(\d{8})_(\d{6})\.json$")
+# 时间序列每个点的字段
+POINT_COLUMNS = ["timestamp", "price_number", "price_historical", "price_constant"]
+
+
+def find_snapshots(archive_dir: str = ARCHIVE_DIR) -> List[Dict[str, Any]]:
+    """
+    按时间顺序列出归档中的原始快照
+    爬虫和工作流会为同一次运行各归档一份相同的快照，同一天内容相同的快照只保留较早的一份
+    （不同日期的快照即使价格没变也要保留，它们对应不同的汇率）
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(archive_dir, "**", "max_prices_all_countries_*.json"), recursive=True):
+        match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+        if not match:
+            continue
+        day, clock = match.groups()
+        timestamp = f"{day[:4]}-{day[4:6]}-{day[6:]}T{clock[:2]}:{clock[2:4]}:{clock[4:]}"
+        snapshots.append({"path": path, "timestamp": timestamp, "date": timestamp[:10],
+                          "stamp": f"{day}_{clock}"})
+    snapshots.sort(key=lambda item: item["timestamp"])
+
+    unique, seen = [], set()
+    for snapshot in snapshots:
+        with open(snapshot["path"], 'rb') as f:
+            digest = (snapshot["date"], hashlib.sha1(f.read()).hexdigest())
+        if digest in seen:
+            log.debug("跳过重复快照: %s", snapshot["path"])
+            continue
+        seen.add(digest)
+        unique.append(snapshot)
+    return unique
+
+
+def archived_rates(snapshot: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """同一次运行归档的转换结果中记录的汇率（rates/ 存储出现之前的快照只有这一来源）"""
+    directory = os.path.dirname(snapshot["path"])
+    path = os.path.join(directory, f"max_prices_cny_sorted_{snapshot['stamp']}.json")
+    if not os.path.exists(path):
+        return None
+    rates = snapshot_rates(path)
+    return rates if len(rates) > 2 else None
+
+
+def match_rates(snapshots: List[Dict[str, Any]], store: RateStore) -> List[Dict[str, Any]]:
+    """为每个快照匹配历史汇率，记录来源和与快照日期相差的天数；找不到汇率的快照被跳过"""
+    matched = []
+    for snapshot in snapshots:
+        rates = archived_rates(snapshot)
+        source, rates_date = "archive", snapshot["date"]
+        table = store.nearest(snapshot["date"])
+        # rates/ 中正好是当天的汇率表最可靠；否则优先用同一次运行归档的汇率，再退回最接近日期的汇率表
+        if table and (table.date == snapshot["date"] or rates is None):
+            rates, source, rates_date = table.rates, "store", table.date
+        if not rates:
+            log.warning(f"⚠️ {snapshot['path']}: 找不到 {snapshot['date']} 附近的汇率，跳过")
+            continue
+        gap = abs((datetime.fromisoformat(rates_date) - datetime.fromisoformat(snapshot["date"])).days)
+        matched.append(dict(snapshot, rates=rates, rates_source=source, rates_date=rates_date, rates_gap_days=gap))
+    return matched
+
+
+def reprice_snapshot(path: str, historical: Dict[str, float], constant: Dict[str, float],
+                     target: str = TARGET_CURRENCY) -> Dict[str, Any]:
+    """
+    在工作进程中重算单个快照：同一批价格分别用历史汇率和参考汇率换算
+    返回 rows: [(series_key, price_number, 历史汇率价格, 参考汇率价格)] 和缺失的汇率
+    """
+    from max_rate_converter import standardize_plan_name
+    from max_snapshot_store import load_snapshot
+
+    data = load_snapshot(path)
+
+    keys: List[Tuple[str, str, str, str]] = []
+    amounts: List[float] = []
+    currencies: List[str] = []
+    for country_code, country_data in data.items():
+        if country_code.startswith('_') or not isinstance(country_data, dict):
+            continue
+        occurrences: Dict[Tuple[str, str, str, str], int] = {}
+        for plan in country_data.get('plans', []):
+            currency = plan.get('currency', 'USD')
+            key = (country_code, plan.get('plan_group', 'unknown'),
+                   standardize_plan_name(plan.get('name', '')), currency)
+            # 同一国家同名同周期的套餐（如不同档位的 Standard）按出现顺序区分
+            occurrences[key] = occurrences.get(key, 0) + 1
+            if occurrences[key] > 1:
+                key = key[:2] + (f"{key[2]} #{occurrences[key]}",) + key[3:]
+            keys.append(key)
+            amounts.append(plan.get('price_number', 0) or 0)
+            currencies.append(currency)
+
+    historical_engine = ConversionEngine(historical, [target])
+    constant_engine = ConversionEngine(constant, [target])
+    historical_prices = historical_engine.convert(amounts, currencies)[target]
+    constant_prices = constant_engine.convert(amounts, currencies)[target]
+    rows = [(key, amount, to_optional(historical_prices[i]), to_optional(constant_prices[i]))
+            for i, (key, amount) in enumerate(zip(keys, amounts))]
+    return {"rows": rows, "missing": {"historical": historical_engine.missing,
+                                      "constant": constant_engine.missing}}
+
+
+def _percent_change(first: Optional[float], last: Optional[float]) -> Optional[float]:
+    if not first or last is None:
+        return None
+    return round((last / first - 1) * 100, 2)
+
+
+def build_series(snapshots: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    把每个快照的结果按套餐合并成时间序列，并把首尾变化拆成：
+    - price_change_pct：本币（等价于参考汇率下人民币）的变化，即真实调价
+    - fx_change_pct：汇率变化带来的部分，(1 + 总变化) = (1 + 调价) × (1 + 汇率变化)
+    """
+    series: Dict[Tuple[str, str, str, str], List[list]] = {}
+    for snapshot, result in zip(snapshots, results):
+        for key, amount, historical, constant in result["rows"]:
+            series.setdefault(key, []).append([snapshot["timestamp"], amount, historical, constant])
+
+    entries = []
+    for (country_code, plan_group, plan_name, currency), points in sorted(series.items()):
+        first, last = points[0], points[-1]
+        total = _percent_change(first[2], last[2])
+        price = _percent_change(first[1], last[1])
+        fx = None
+        if total is not None and price is not None:
+            fx = round(((1 + total / 100) / (1 + price / 100) - 1) * 100, 2)
+        entries.append({
+            "country_code": country_code,
+            "plan_group": plan_group,
+            "plan_name": plan_name,
+            "currency": currency,
+            "first_seen": first[0],
+            "last_seen": last[0],
+            "total_change_pct": total,
+            "price_change_pct": price,
+            "fx_change_pct": fx,
+            "points": points,
+        })
+    return entries
+
+
+def reprice_archive(archive_dir: str = ARCHIVE_DIR, rates_dir: str = RATES_DIR,
+                    output_file: Optional[str] = OUTPUT_FILE, reference_date: Optional[str] = None,
+                    workers: Optional[int] = None, target: str = TARGET_CURRENCY) -> Optional[Dict[str, Any]]:
+    """
+    批量重算归档快照并写出时间序列
+    reference_date 为参考汇率的日期（默认最新一张汇率表）；workers 为进程数（默认 CPU 数，1 表示不启用进程池）
+    """
+    start = time.perf_counter()
+    store = RateStore(rates_dir)
+    snapshots = match_rates(find_snapshots(archive_dir), store)
+    if not snapshots:
+        log.error(f"❌ {archive_dir} 中没有可重算的快照")
+        return None
+
+    if reference_date:
+        reference = store.nearest(reference_date)
+        constant_rates, constant_date = (reference.rates, reference.date) if reference else (None, None)
+    else:
+        latest = store.latest()
+        constant_rates, constant_date = (latest.rates, latest.date) if latest else (None, None)
+    if constant_rates is None:
+        # 没有汇率存储时以最新快照的历史汇率作为参考
+        constant_rates, constant_date = snapshots[-1]["rates"], snapshots[-1]["rates_date"]
+    log.info(f"🔄 重算 {len(snapshots)} 个快照（{snapshots[0]['date']} ~ {snapshots[-1]['date']}），"
+             f"参考汇率: {constant_date}")
+
+    workers = workers or os.cpu_count() or 1
+    arguments = [(s["path"], s["rates"], constant_rates, target) for s in snapshots]
+    if workers > 1 and len(snapshots) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(snapshots))) as pool:
+            results = list(pool.map(reprice_snapshot, *zip(*arguments)))
+    else:
+        results = [reprice_snapshot(*args) for args in arguments]
+
+    missing: Dict[str, Dict[str, int]] = {}
+    for snapshot, result in zip(snapshots, results):
+        for kind, codes in result["missing"].items():
+            for code, count in codes.items():
+                entry = missing.setdefault(code, {})
+                entry[kind] = entry.get(kind, 0) + count
+                log.debug("%s: 缺少 %s 汇率 %s（%s）", snapshot["date"], kind, code, count)
+    for code, counts in sorted(missing.items()):
+        log.warning(f"⚠️ 未找到货币汇率: {code}（" + "，".join(f"{k} {v} 个价格" for k, v in counts.items()) + "）")
+
+    series = build_series(snapshots, results)
+    output = {
+        "_metadata": {
+            "generated_at": datetime.now().isoformat(),
+            "target_currency": target,
+            "constant_rates_date": constant_date,
+            "snapshots": len(snapshots),
+            "series": len(series),
+            "point_columns": POINT_COLUMNS,
+            "missing_rates": missing,
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        },
+        "snapshots": [{key: s[key] for key in ("path", "timestamp", "rates_source", "rates_date", "rates_gap_days")}
+                      for s in snapshots],
+        "series": series,
+    }
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=1)
+        log.info(f"✅ {len(series)} 条价格序列已保存到: {output_file}（{output['_metadata']['elapsed_seconds']}s）")
+    return output
+
+
+def log_changes(output: Dict[str, Any], top: int = 10):
+    """输出真实调价幅度最大的套餐，并列出同期的汇率漂移"""
+    changed = [s for s in output["series"] if s["price_change_pct"]]
+    changed.sort(key=lambda s: abs(s["price_change_pct"]), reverse=True)
+    if not changed:
+        log.info("📊 所有套餐在本币下均无调价，人民币价格变化全部来自汇率")
+        return
+    log.info(f"\n📊 真实调价最大的套餐（共 {len(changed)} 个套餐有调价）")
+    log.info(f"{'国家':<6} {'套餐':<24} {'周期':<8} {'调价%':>8} {'汇率%':>8} {'总变化%':>8}")
+    for s in changed[:top]:
+        log.info(f"{s['country_code']:<6} {s['plan_name'][:24]:<24} {s['plan_group']:<8} "
+                 f"{s['price_change_pct']:>8} {s['fx_change_pct'] if s['fx_change_pct'] is not None else '-':>8} "
+                 f"{s['total_change_pct'] if s['total_change_pct'] is not None else '-':>8}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="HBO Max 历史快照批量重算")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="归档目录")
+    parser.add_argument("--rates-dir", default=RATES_DIR, help="汇率存储目录")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="时间序列输出文件")
+    parser.add_argument("--reference-date", help="参考汇率日期 YYYY-MM-DD（默认最新的汇率表）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认 CPU 数）")
+    parser.add_argument("--target", default=TARGET_CURRENCY, help="目标货币")
+    parser.add_argument("--top", type=int, default=10, help="调价表行数")
+    args = parser.parse_args(argv)
+
+    output = reprice_archive(args.archive_dir, args.rates_dir, args.output, args.reference_date,
+                             args.workers, args.target.upper())
+    if output is None:
+        return 1
+    log_changes(output, args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -12,172 +12,21 @@ import time
 import random
 import traceback
 import re
+import sys
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import datetime
-import httpx
-from bs4 import BeautifulSoup
-
-# 确保 BS4 可用
-try:
-    from bs4 import BeautifulSoup
-    BS4_INSTALLED = True
-except ImportError:
-    BS4_INSTALLED = False
-    print("❌ 请安装 BeautifulSoup4: pip install beautifulsoup4")
-    exit(1)
+from max_archive import ArchiveManifest
+from max_logger import get_logger
+from max_metrics import SCRAPER_METRICS, current_country, http_timing_hooks, finish_http_timing
+from max_memory import SCRAPER_MEMORY
+from max_normalizer import stamp as stamp_normalizer_version
+import max_reference
+
+log = get_logger("scraper")
 
 # --- 常量定义 ---
 MAX_URL = "https://www.hbomax.com"
 
-# 静态区域映射：国家代码 -> 多语言 URL 路径列表（基于原有max.py）
-REGION_PATHS: Dict[str, List[str]] = {
-    # 亚太地区
-    "my": ["/my/en", "/my/zh", "/my/ms"],
-    "hk": ["/hk/en", "/hk/zh"],
-    "ph": ["/ph/en", "/ph/tl"],
-    "tw": ["/tw/en", "/tw/zh"],
-    "id": ["/id/en", "/id/id"],
-    "sg": ["/sg/en", "/sg/ms"],
-    "th": ["/th/en", "/th/th"],
-    "au": ["/au/en"],
-    "bd": ["/bd/en", "/bd/bn"],        # Bangladesh
-    "bn": ["/bn/en", "/bn/ms"],        # Brunei
-    "kh": ["/kh/en", "/kh/km"],        # Cambodia
-    "la": ["/la/en", "/la/lo"],        # Laos
-    "mo": ["/mo/en", "/mo/zh"],        # Macau
-    "mn": ["/mn/en", "/mn/mn"],        # Mongolia
-    "lk": ["/lk/en", "/lk/si"],        # Sri Lanka
-    "mm": ["/mm/en", "/mm/my"],        # Myanmar
-    "np": ["/np/en", "/np/ne"],        # Nepal
-    "pw": ["/pw/en"],                  # Palau
-    "pg": ["/pg/en"],                  # Papua New Guinea
-    "sb": ["/sb/en"],                  # Solomon Islands
-    "tl": ["/tl/en", "/tl/pt"],        # Timor Leste
-    "co": ["/co/es"], "cr": ["/cr/es"], "gt": ["/gt/es"], "pe": ["/pe/es"],
-    "uy": ["/uy/es"], "mx": ["/mx/es"], "hn": ["/hn/es"], "ni": ["/ni/es"],
-    "pa": ["/pa/es"], "ar": ["/ar/es"], "bo": ["/bo/es"], "do": ["/do/es"],
-    "ec": ["/ec/es"], "sv": ["/sv/es"], "py": ["/py/es"], "cl": ["/cl/es"],
-    "br": ["/br/pt"],
-    "jm": ["/jm/en"], "ai": ["/ai/en"], "ag": ["/ag/en"],
-    "aw": ["/aw/en"], "bs": ["/bs/en"], "bb": ["/bb/en"], "bz": ["/bz/en"],
-    "vg": ["/vg/en"], "ky": ["/ky/en"], "cw": ["/cw/en"], "dm": ["/dm/en"],
-    "gd": ["/gd/en"], "gy": ["/gy/en"], "ht": ["/ht/en"], "kn": ["/kn/en"],
-    "lc": ["/lc/en"], "vc": ["/vc/en"], "sr": ["/sr/en"], "tt": ["/tt/en"],
-    "tc": ["/tc/en"],
-    "us": ["/us/en", "/us/es"],
-    "ad": ["/ad/en", "/ad/es"],
-    "ba": ["/ba/en", "/ba/hr"],
-    "bg": ["/bg/en", "/bg/bg"],
-    "hr": ["/hr/en", "/hr/hr"],
-    "cz": ["/cz/cs"],
-    "hu": ["/hu/hu"],
-    "mk": ["/mk/en", "/mk/mk"],
-    "md": ["/md/en", "/md/ro"],
-    "me": ["/me/en", "/me/sr"],
-    "ro": ["/ro/en", "/ro/ro"],
-    "rs": ["/rs/en", "/rs/sr"],
-    "sk": ["/sk/en", "/sk/sk"],
-    "si": ["/si/en", "/si/sl"],
-    "dk": ["/dk/da"],
-    "fi": ["/fi/en", "/fi/fi"],
-    "no": ["/no/no"],
-    "se": ["/se/sv"],
-    "es": ["/es/en", "/es/es"],
-    "fr": ["/fr/en", "/fr/fr"],
-    "be": ["/be/en", "/be/nl", "/be/fr"],
-    "pt": ["/pt/en", "/pt/pt"],
-    "nl": ["/nl/en", "/nl/nl"],
-    "pl": ["/pl/pl"],
-    "tr": ["/tr/en", "/tr/tr"],
-    "pk": ["/pk/en", "/pk/ur"],        # Pakistan
-
-    # 缺失的欧洲国家
-    "al": ["/al/en", "/al/sq"],        # Albania
-    "am": ["/am/en", "/am/hy"],        # Armenia  
-    "cy": ["/cy/en", "/cy/el"],        # Cyprus
-    "ee": ["/ee/en", "/ee/et"],        # Estonia
-    "ge": ["/ge/en", "/ge/ka"],        # Georgia
-    "is": ["/is/en", "/is/is"],        # Iceland
-    "kz": ["/kz/en", "/kz/kk"],        # Kazakhstan
-    "kg": ["/kg/en", "/kg/ky"],        # Kyrgyzstan
-    "lv": ["/lv/en", "/lv/lv"],        # Latvia
-    "lt": ["/lt/en", "/lt/lt"],        # Lithuania
-    "mt": ["/mt/en", "/mt/mt"],        # Malta
-    "tj": ["/tj/en", "/tj/tg"],        # Tajikistan
-    "ua": ["/ua/en", "/ua/uk"],        # Ukraine
-    "de": ["/de/en", "/de/de"],        # Germany
-    "it": ["/it/en", "/it/it"],        # Italy
-    "at": ["/at/en", "/at/de"],        # Austria
-    "ch": ["/ch/en", "/ch/de", "/ch/fr", "/ch/it"],  # Switzerland
-    "gr": ["/gr/en", "/gr/el"],        # Greece
-    "lu": ["/lu/en", "/lu/fr", "/lu/de"],  # Luxembourg
-    "li": ["/li/en", "/li/de"],        # Liechtenstein
-    "il": ["/il/en", "/il/he"],        # Israel
-    "gb": ["/gb/en"],                  # United Kingdom
-    "ie": ["/ie/en"],                  # Ireland
-
-    # 非洲国家
-    "bw": ["/bw/en"],                  # Botswana
-    "et": ["/et/en"],                  # Ethiopia
-    "gh": ["/gh/en"],                  # Ghana
-    "ke": ["/ke/en"],                  # Kenya
-    "ng": ["/ng/en"],                  # Nigeria
-    "za": ["/za/en"],                  # South Africa
-    "tz": ["/tz/en"],                  # Tanzania
-    "ug": ["/ug/en"],                  # Uganda
-    "zw": ["/zw/en"],                  # Zimbabwe
-
-    # 缺失的拉美国家
-    "gp": ["/gp/en", "/gp/fr"],        # Guadeloupe
-}
-
-# 国家名称映射
-COUNTRY_NAMES = {
-    # 亚太地区
-    "my": "Malaysia", "hk": "Hong Kong", "ph": "Philippines", "tw": "Taiwan",
-    "id": "Indonesia", "sg": "Singapore", "th": "Thailand", "au": "Australia",
-    "bd": "Bangladesh", "bn": "Brunei", "kh": "Cambodia", "la": "Laos",
-    "mo": "Macau", "mn": "Mongolia", "lk": "Sri Lanka", "mm": "Myanmar",
-    "np": "Nepal", "pw": "Palau", "pg": "Papua New Guinea", "sb": "Solomon Islands",
-    "tl": "Timor Leste",
-
-    # 拉丁美洲
-    "co": "Colombia",
-    "cr": "Costa Rica", "gt": "Guatemala", "pe": "Peru", "uy": "Uruguay",
-    "mx": "Mexico", "hn": "Honduras", "ni": "Nicaragua", "pa": "Panama",
-    "ar": "Argentina", "bo": "Bolivia", "do": "Dominican Republic", "ec": "Ecuador",
-    "sv": "El Salvador", "py": "Paraguay", "cl": "Chile", "br": "Brazil",
-    "jm": "Jamaica", "ai": "Anguilla", "ag": "Antigua and Barbuda",
-    "aw": "Aruba", "bs": "Bahamas", "bb": "Barbados", "bz": "Belize",
-    "vg": "British Virgin Islands", "ky": "Cayman Islands", "cw": "Curacao",
-    "dm": "Dominica", "gd": "Grenada", "gy": "Guyana", "ht": "Haiti",
-    "kn": "Saint Kitts and Nevis", "lc": "Saint Lucia", "vc": "Saint Vincent and the Grenadines",
-    "sr": "Suriname", "tt": "Trinidad and Tobago", "tc": "Turks and Caicos Islands",
-    "us": "United States", "ad": "Andorra", "ba": "Bosnia and Herzegovina",
-    "bg": "Bulgaria", "hr": "Croatia", "cz": "Czech Republic", "hu": "Hungary",
-    "mk": "North Macedonia", "md": "Moldova", "me": "Montenegro", "ro": "Romania",
-    "rs": "Serbia", "sk": "Slovakia", "si": "Slovenia", "dk": "Denmark",
-    "fi": "Finland", "no": "Norway", "se": "Sweden", "es": "Spain",
-    "fr": "France", "be": "Belgium", "pt": "Portugal", "nl": "Netherlands",
-    "pl": "Poland", "tr": "Turkey", "pk": "Pakistan",
-
-    # 缺失的欧洲国家
-    "al": "Albania", "am": "Armenia", "cy": "Cyprus", "ee": "Estonia",
-    "ge": "Georgia", "is": "Iceland", "kz": "Kazakhstan", "kg": "Kyrgyzstan",
-    "lv": "Latvia", "lt": "Lithuania", "mt": "Malta", "tj": "Tajikistan", "ua": "Ukraine",
-    "de": "Germany", "it": "Italy", "at": "Austria", "ch": "Switzerland",
-    "gr": "Greece", "lu": "Luxembourg", "li": "Liechtenstein", "il": "Israel",
-    "gb": "United Kingdom", "ie": "Ireland",
-
-    # 非洲国家
-    "bw": "Botswana", "et": "Ethiopia", "gh": "Ghana", "ke": "Kenya",
-    "ng": "Nigeria", "za": "South Africa", "tz": "Tanzania", "ug": "Uganda",
-    "zw": "Zimbabwe",
-
-    # 缺失的拉美国家
-    "gp": "Guadeloupe"
-}
-
 # HBO Max 套餐名统一映射表（参考Spotify项目架构）
 # 将各种语言/变体的套餐名统一为标准英文名称
 HBO_PLAN_NAME_MAP = {
@@ -345,6 +194,7 @@ def normalize_plan_name(plan_name: str) -> str:
     """
     统一套餐名称，将各种语言/变体的套餐名转换为标准英文名称
     参考Spotify项目的架构设计
+    修改映射表或规则时需递增 max_normalizer.NORMALIZER_VERSION
     """
     if not plan_name:
         return "Unknown Plan"
@@ -367,13 +217,13 @@ def normalize_plan_name(plan_name: str) -> str:
     # 检查映射表
     if cleaned_name in HBO_PLAN_NAME_MAP:
         normalized = HBO_PLAN_NAME_MAP[cleaned_name]
-        print(f"    📋 套餐名映射: '{plan_name}' -> '{normalized}'")
+        log.debug("    📋 套餐名映射: '%s' -> '%s'", plan_name, normalized)
         return normalized
     
     # 部分匹配检查（用于处理复合名称）
     for key, value in HBO_PLAN_NAME_MAP.items():
         if key in cleaned_name or cleaned_name in key:
-            print(f"    📋 套餐名部分匹配: '{plan_name}' -> '{value}' (匹配关键词: '{key}')")
+            log.debug("    📋 套餐名部分匹配: '%s' -> '%s' (匹配关键词: '%s')", plan_name, value, key)
             return value
     
     # 如果没有找到映射，返回首字母大写的原名称
@@ -381,9 +231,16 @@ def normalize_plan_name(plan_name: str) -> str:
     if not fallback_name:
         fallback_name = "Unknown Plan"
     
-    print(f"    ⚠️ 套餐名未找到映射: '{plan_name}' -> '{fallback_name}' (建议添加到映射表)")
+    log.warning("    ⚠️ 套餐名未找到映射: '%s' -> '%s' (建议添加到映射表)", plan_name, fallback_name)
     return fallback_name
 
+def normalize_plan_name_timed(plan_name: str, country_code: str) -> str:
+    """解析页面时使用的 normalize_plan_name：按国家累计标准化耗时和次数（SCRAPER_METRICS.tally）"""
+    start = time.perf_counter()
+    normalized = normalize_plan_name(plan_name)
+    SCRAPER_METRICS.tally("normalize", time.perf_counter() - start, country_code)
+    return normalized
+
 # 请求头配置
 USER_AGENTS: List[str] = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36",
@@ -420,15 +277,17 @@ def create_archive_directory_structure(archive_dir: str, timestamp: str) -> str:
     year_dir = os.path.join(archive_dir, year)
     if not os.path.exists(year_dir):
         os.makedirs(year_dir)
-        print(f"📁 创建年份目录: {year_dir}")
+        log.info(f"📁 创建年份目录: {year_dir}")
     return year_dir
 
 async def get_proxy(country_code: str) -> Optional[Dict[str, str]]:
     """获取指定国家的代理"""
+    import httpx
     url = PROXY_API_TEMPLATE.format(country=country_code.lower())
+    span = SCRAPER_METRICS.span("proxy", country_code)
     try:
         async with httpx.AsyncClient(timeout=25.0) as client:
-            print(f"🔄 {country_code}: 获取代理...")
+            log.info(f"🔄 {country_code}: 获取代理...")
             resp = await client.get(url)
             resp.raise_for_status()
             data = resp.json()
@@ -442,10 +301,12 @@ async def get_proxy(country_code: str) -> Optional[Dict[str, str]]:
                 raise ValueError("端口号无效")
                 
             full = f"http://{user}:{password}@{host}:{port}"
-            print(f"✅ {country_code}: 代理获取成功 {host}:{port}")
+            span.stop()
+            log.info(f"✅ {country_code}: 代理获取成功 {host}:{port}")
             return {"http://": full, "https://": full}
     except Exception as e:
-        print(f"❌ {country_code}: 代理获取失败 - {e}")
+        span.stop(ok=False)
+        log.error(f"❌ {country_code}: 代理获取失败 - {e}")
         return None
 
 async def get_proxy_with_retry(country_code: str, max_proxy_attempts: int = 3) -> Optional[Dict[str, str]]:
@@ -456,21 +317,28 @@ async def get_proxy_with_retry(country_code: str, max_proxy_attempts: int = 3) -
             return proxy
         if attempt < max_proxy_attempts - 1:
             delay = random.uniform(1, 3)
-            print(f"🔄 {country_code}: 代理获取失败，{delay:.1f}秒后重试...")
+            log.info(f"🔄 {country_code}: 代理获取失败，{delay:.1f}秒后重试...")
             await asyncio.sleep(delay)
-    print(f"❌ {country_code}: 所有代理获取尝试都失败")
+    log.error(f"❌ {country_code}: 所有代理获取尝试都失败")
     return None
 
 async def fetch_max_page(country_code: str, proxies: Dict[str, str], headers: Dict[str, str]) -> Optional[str]:
     """获取HBO Max页面内容，支持HTTPS/HTTP fallback"""
+    import httpx
     cc = country_code.lower()
-    paths = REGION_PATHS.get(cc)
+    paths = max_reference.region_paths().get(cc)
     
     # 获取代理URL
     proxy_url = proxies.get('http://')
     
     async def try_fetch_url(url: str, description: str = "") -> Optional[str]:
-        """尝试访问URL，支持HTTPS->HTTP fallback"""
+        """尝试访问URL，支持HTTPS->HTTP fallback（整体计入 fetch 阶段耗时）"""
+        span = SCRAPER_METRICS.span("fetch", country_code)
+        result = await _try_fetch_url(url, description)
+        span.stop(ok=result is not None)
+        return result
+
+    async def _try_fetch_url(url: str, description: str = "") -> Optional[str]:
         # 首先尝试HTTPS
         https_url = url.replace("http://", "https://") if not url.startswith("https://") else url
         
@@ -481,15 +349,17 @@ async def fetch_max_page(country_code: str, proxies: Dict[str, str], headers: Di
                 follow_redirects=True, 
                 timeout=45.0, 
                 proxy=proxy_url,
-                verify=False  # 忽略SSL证书验证问题
+                verify=False,  # 忽略SSL证书验证问题
+                event_hooks=http_timing_hooks(SCRAPER_METRICS, country_code)
             ) as client:
-                print(f"🌐 {country_code}: {description}访问 {https_url}")
+                log.debug("🌐 %s: %s访问 %s", country_code, description, https_url)
                 r = await client.get(https_url)
-                print(f"📊 {country_code}: 响应 {r.status_code} -> {r.url}")
+                finish_http_timing(SCRAPER_METRICS, r, country_code)
+                log.debug("📊 %s: 响应 %s -> %s", country_code, r.status_code, r.url)
                 r.raise_for_status()
                 return r.text
         except (httpx.ConnectError, httpx.ReadError, httpx.TimeoutException, httpx.RequestError) as ssl_error:
-            print(f"🔒 {country_code}: HTTPS连接失败({type(ssl_error).__name__}), 尝试HTTP - {ssl_error}")
+            log.warning(f"🔒 {country_code}: HTTPS连接失败({type(ssl_error).__name__}), 尝试HTTP - {ssl_error}")
             
             # 如果HTTPS失败，尝试HTTP
             http_url = https_url.replace("https://", "http://")
@@ -498,21 +368,23 @@ async def fetch_max_page(country_code: str, proxies: Dict[str, str], headers: Di
                     headers=headers, 
                     follow_redirects=True, 
                     timeout=45.0, 
-                    proxy=proxy_url
+                    proxy=proxy_url,
+                    event_hooks=http_timing_hooks(SCRAPER_METRICS, country_code)
                 ) as client:
-                    print(f"🌐 {country_code}: {description}HTTP fallback {http_url}")
+                    log.debug("🌐 %s: %sHTTP fallback %s", country_code, description, http_url)
                     r = await client.get(http_url)
-                    print(f"📊 {country_code}: HTTP响应 {r.status_code} -> {r.url}")
+                    finish_http_timing(SCRAPER_METRICS, r, country_code)
+                    log.debug("📊 %s: HTTP响应 %s -> %s", country_code, r.status_code, r.url)
                     r.raise_for_status()
                     return r.text
             except Exception as http_error:
-                print(f"❌ {country_code}: HTTP fallback也失败 - {http_error}")
+                log.error(f"❌ {country_code}: HTTP fallback也失败 - {http_error}")
                 return None
         except httpx.HTTPStatusError as e:
-            print(f"⚠️ {country_code}: HTTP {e.response.status_code} - {description}")
+            log.warning(f"⚠️ {country_code}: HTTP {e.response.status_code} - {description}")
             return None
         except Exception as e:
-            print(f"❌ {country_code}: 访问失败 - {e}")
+            log.error(f"❌ {country_code}: 访问失败 - {e}")
             return None
     
     # 优先使用静态映射
@@ -532,7 +404,7 @@ async def fetch_max_page(country_code: str, proxies: Dict[str, str], headers: Di
     
     # 404时回退到西班牙语
     fallback_url = f"{MAX_URL}/{cc}/es"
-    print(f"🔄 {country_code}: 尝试西语回退")
+    log.info(f"🔄 {country_code}: 尝试西语回退")
     result = await try_fetch_url(fallback_url, "西语回退 ")
     return result
 
@@ -546,74 +418,21 @@ def detect_billing_cycle_globally(price_text: str, price_number: float, country_
     # 1. 首先检查文本中的明确周期标记
     text_lower = price_text.lower()
     
-    # 月付标记（多语言）
-    monthly_keywords = [
-        'month', '/month', 'monthly', 'per month',  # English
-        'mes', '/mes', 'mensual', 'por mes',        # Spanish  
-        'mês', '/mês', 'mensal', 'por mês',         # Portuguese
-        'mois', '/mois', 'mensuel', 'par mois',     # French
-        'mese', '/mese', 'mensile', 'al mese',      # Italian
-        'monat', '/monat', 'monatlich', 'pro monat', # German
-        'maand', '/maand', 'maandelijks', 'per maand', # Dutch
-        'miesiąc', '/miesiąc', 'miesięczny',        # Polish
-        'måned', '/måned', 'månedlig', 'pr måned',  # Danish/Norwegian
-        'månad', '/månad', 'månadsvis', 'per månad', # Swedish
-        'kuu', '/kuu', 'kuukausittain',             # Finnish
-        'ay', '/ay', 'aylık', 'ayda',               # Turkish
-        'mies', '/mies', 'miesięcznie',             # Polish alt
-        'месяц', '/месяц', 'в месяц',               # Russian
-    ]
-    
-    # 年付标记（多语言）
-    yearly_keywords = [
-        'year', '/year', 'yearly', 'annual', 'per year', 'annually',  # English
-        'año', '/año', 'anual', 'por año', 'anualmente',              # Spanish
-        'ano', '/ano', 'anual', 'por ano', 'anualmente',              # Portuguese  
-        'an', '/an', 'année', '/année', 'annuel', 'par an',           # French
-        'anno', '/anno', 'annuale', 'all\'anno',                      # Italian
-        'jahr', '/jahr', 'jährlich', 'pro jahr',                      # German
-        'jaar', '/jaar', 'jaarlijks', 'per jaar',                     # Dutch
-        'rok', '/rok', 'roczny', 'rocznie',                           # Polish
-        'år', '/år', 'årlig', 'pr år', 'om året',                     # Danish/Norwegian/Swedish
-        'vuosi', '/vuosi', 'vuosittain',                              # Finnish
-        'yıl', '/yıl', 'yıllık', 'yılda',                            # Turkish
-        'год', '/год', 'в год', 'годовой',                            # Russian
-    ]
-    
+    # 月付/年付标记（多语言）见 max_reference/tables.py
+    monthly_keywords, yearly_keywords = max_reference.billing_keywords()
+
     # 检查文本标记
     for keyword in monthly_keywords:
         if keyword in text_lower:
             return "monthly", "每月"
-    
+
     for keyword in yearly_keywords:
         if keyword in text_lower:
             return "yearly", "每年"
-    
+
     # 2. 基于价格数值和国家上下文推断周期
-    # 定义各国的价格范围（基于现有数据分析）
-    price_ranges = {
-        # 欧洲高价值货币国家
-        'tr': {'monthly_max': 500, 'yearly_min': 1500},       # Turkish Lira
-        'hu': {'monthly_max': 1000, 'yearly_min': 5000},      # Hungarian Forint  
-        'cz': {'monthly_max': 500, 'yearly_min': 2000},       # Czech Koruna
-        'pl': {'monthly_max': 100, 'yearly_min': 200},        # Polish Zloty
-        
-        # 北欧克朗国家
-        'dk': {'monthly_max': 200, 'yearly_min': 800},        # Danish Krone
-        'no': {'monthly_max': 200, 'yearly_min': 800},        # Norwegian Krone  
-        'se': {'monthly_max': 200, 'yearly_min': 800},        # Swedish Krona
-        
-        # 其他欧洲国家
-        'bg': {'monthly_max': 30, 'yearly_min': 200},         # Bulgarian Lev
-        'ro': {'monthly_max': 50, 'yearly_min': 400},         # Romanian Leu
-        'hr': {'monthly_max': 15, 'yearly_min': 100},         # Croatian Kuna/Euro
-        
-        # 默认范围（EUR, USD等）
-        'default': {'monthly_max': 30, 'yearly_min': 200},
-    }
-    
-    # 获取该国家的价格范围，如果没有则使用默认值
-    ranges = price_ranges.get(country_lower, price_ranges['default'])
+    # 获取该国家的价格范围（基于现有数据分析），如果没有则使用默认值
+    ranges = max_reference.price_ranges(country_lower)
     
     if price_number <= ranges['monthly_max']:
         return "monthly", "每月"
@@ -738,167 +557,9 @@ def extract_price_number(price_str: str) -> float:
 
 def detect_currency(price_str: str, country_code: str = None) -> str:
     """检测价格字符串中的货币，优先使用国家上下文"""
-    
-    # 国家到货币的精确映射（最高优先级）
-    country_currency_map = {
-        'my': 'MYR',     # Malaysia - RM
-        'sg': 'SGD',     # Singapore - S$ 或 $（需要特别处理）
-        'th': 'THB',     # Thailand - ฿
-        'id': 'IDR',     # Indonesia - Rp
-        'ph': 'PHP',     # Philippines - ₱
-        'hk': 'HKD',     # Hong Kong - HK$ 或 $（需要特别处理）
-        'tw': 'TWD',     # Taiwan - NT$
-        'au': 'AUD',     # Australia - A$ 或 $（需要特别处理）
-        'us': 'USD',     # United States - $
-        'co': 'COP',     # Colombia - $
-        'cr': 'CRC',     # Costa Rica - ₡
-        'gt': 'GTQ',     # Guatemala - Q
-        'pe': 'PEN',     # Peru - S/.
-        'uy': 'UYU',     # Uruguay - $
-        'mx': 'MXN',     # Mexico - $
-        'hn': 'HNL',     # Honduras - L
-        'ni': 'NIO',     # Nicaragua - C$
-        'pa': 'PAB',     # Panama - B/. 或 $
-        'ar': 'ARS',     # Argentina - $
-        'bo': 'BOB',     # Bolivia - Bs
-        'do': 'DOP',     # Dominican Republic - RD$
-        'ec': 'USD',     # Ecuador - $ (uses USD)
-        'sv': 'USD',     # El Salvador - $ (uses USD)
-        'py': 'PYG',     # Paraguay - Gs
-        'cl': 'CLP',     # Chile - $
-        'br': 'BRL',     # Brazil - R$
-        'gy': 'GYD',     # Guyana - G$ (Guyanese Dollar)
-        'pl': 'PLN',     # Poland - zł
-        'cz': 'CZK',     # Czech Republic - Kč
-        'hu': 'HUF',     # Hungary - Ft
-        'tr': 'TRY',     # Turkey - ₺
-        'pk': 'PKR',     # Pakistan - Rs
-        'dk': 'DKK',     # Denmark - kr
-        'no': 'NOK',     # Norway - kr
-        'se': 'SEK',     # Sweden - kr
-        'fi': 'EUR',     # Finland - €
-        'es': 'EUR',     # Spain - €
-        'fr': 'EUR',     # France - €
-        'be': 'EUR',     # Belgium - €
-        'pt': 'EUR',     # Portugal - €
-        'nl': 'EUR',     # Netherlands - €
-        'bg': 'BGN',     # Bulgaria - лв
-        'hr': 'EUR',     # Croatia - €
-        'mk': 'MKD',     # North Macedonia - ден
-        'md': 'MDL',     # Moldova - lei
-        'me': 'EUR',     # Montenegro - €
-        'ro': 'RON',     # Romania - lei
-        'rs': 'RSD',     # Serbia - din
-        'sk': 'EUR',     # Slovakia - €
-        'si': 'EUR',     # Slovenia - €
-        'ba': 'BAM',     # Bosnia and Herzegovina - KM
-        'ad': 'EUR',     # Andorra - €
-        
-        # 缺失国家的货币映射
-        'ai': 'XCD',     # Anguilla - East Caribbean Dollar
-        'aw': 'USD',     # Aruba - USD (实际使用美元定价)
-        'cw': 'USD',     # Curaçao - USD (实际使用美元定价)
-        
-        # 欧洲国家实际使用EUR定价的修正
-        'rs': 'EUR',     # Serbia - 实际使用欧元定价
-        'mk': 'EUR',     # North Macedonia - 实际使用欧元定价  
-        'md': 'EUR',     # Moldova - 实际使用欧元定价
-        'bg': 'EUR',     # Bulgaria - 实际使用欧元定价
-        'ro': 'EUR',     # Romania - 实际使用欧元定价
-        
-        # 加勒比海国家实际使用USD定价的修正
-        'ky': 'USD',     # Cayman Islands - 实际使用美元定价
-        'gd': 'USD',     # Grenada - 实际使用美元定价
-        
-        # 加勒比海国家使用本地货币的修正
-        'jm': 'JMD',     # Jamaica - 牙买加元 (价格$890实际为JMD)
-        'sr': 'SRD',     # Suriname - 苏里南元 (价格$229实际为SRD)
-        'tt': 'TTD',     # Trinidad and Tobago - 特立尼达多巴哥元 (价格$39.99实际为TTD)
-        
-        'gp': 'EUR',     # Guadeloupe - Euro
-        'ht': 'HTG',     # Haiti - Haitian Gourde
-        'ni': 'NIO',     # Nicaragua - Nicaraguan Córdoba
-        'vc': 'USD',     # Saint Vincent and the Grenadines - 实际使用美元定价
-        'ua': 'EUR',     # Ukraine - Euro (actual pricing currency)
-        'tj': 'EUR',     # Tajikistan - Euro (actual pricing currency)
-
-        # 2025年10月亚太扩展国家（如果HBO Max使用USD，符号检测会优先识别）
-        'bd': 'BDT',     # Bangladesh - Taka (fallback)
-        'bn': 'BND',     # Brunei - Brunei Dollar
-        'kh': 'USD',     # Cambodia - 实际使用美元定价
-        'la': 'LAK',     # Laos - Kip (fallback)
-        'mo': 'MOP',     # Macau - Pataca (fallback)
-        'mn': 'MNT',     # Mongolia - Tugrik (fallback)
-        'lk': 'LKR',     # Sri Lanka - Rupee (fallback)
-        'mm': 'MMK',     # Myanmar - Kyat (fallback)
-        'np': 'NPR',     # Nepal - Rupee (fallback)
-        'pw': 'USD',     # Palau - 实际使用美元定价
-        'pg': 'PGK',     # Papua New Guinea - Kina (fallback)
-        'sb': 'SBD',     # Solomon Islands - Dollar (fallback)
-        'tl': 'USD',     # Timor Leste - 实际使用美元定价
-
-        # 2026年1月欧洲扩展国家
-        'de': 'EUR',     # Germany - €
-        'it': 'EUR',     # Italy - €
-        'at': 'EUR',     # Austria - €
-        'ch': 'CHF',     # Switzerland - CHF
-        'gr': 'EUR',     # Greece - €
-        'lu': 'EUR',     # Luxembourg - €
-        'li': 'CHF',     # Liechtenstein - CHF
-        'il': 'ILS',     # Israel - ₪
-        'gb': 'GBP',     # United Kingdom - £
-        'ie': 'EUR',     # Ireland - €
-
-        # 非洲国家
-        'bw': 'BWP',     # Botswana - Pula
-        'et': 'ETB',     # Ethiopia - Birr
-        'gh': 'GHS',     # Ghana - Cedi
-        'ke': 'KES',     # Kenya - Shilling
-        'ng': 'NGN',     # Nigeria - Naira
-        'za': 'ZAR',     # South Africa - Rand
-        'tz': 'TZS',     # Tanzania - Shilling
-        'ug': 'UGX',     # Uganda - Shilling
-        'zw': 'USD',     # Zimbabwe - 实际使用美元定价
-    }
-    
-    # 详细的货币符号检测（按优先级排序）
-    # 注意：优先检测价格文本中的货币符号，因为有些国家虽然有本币，但HBO Max使用USD定价
-    currency_symbols = {
-        # 优先检查带前缀的特殊符号（避免与通用$混淆）
-        'US$': 'USD', 'USD': 'USD',
-        'S$': 'SGD', 'SGD': 'SGD',  # 新加坡元
-        'HK$': 'HKD', 'HKD': 'HKD',  # 港币
-        'A$': 'AUD', 'AUD': 'AUD',   # 澳元
-        'C$': 'CAD', 'CA$': 'CAD',   # 加元
-        'MX$': 'MXN', 'NZ$': 'NZD', 'NT$': 'TWD',
-        'R$': 'BRL', 'RD$': 'DOP',   # 巴西雷亚尔, 多米尼加比索
-        
-        # 特殊货币符号
-        '€': 'EUR', 'EUR': 'EUR',
-        '£': 'GBP', 'GBP': 'GBP', 
-        '¥': 'JPY', '￥': 'JPY', 'JPY': 'JPY',
-        '₹': 'INR', 'INR': 'INR',
-        '₱': 'PHP', 'PHP': 'PHP',
-        '₪': 'ILS', '₨': 'PKR', '₦': 'NGN', '₵': 'GHS',
-        '₡': 'CRC', '₩': 'KRW', '₴': 'UAH', '₽': 'RUB',
-        '₺': 'TRY', 'TRY': 'TRY',
-        
-        # 字母缩写
-        'zł': 'PLN', 'PLN': 'PLN',
-        'Kč': 'CZK', 'CZK': 'CZK', 
-        'Ft': 'HUF', 'HUF': 'HUF',
-        'TL': 'TRY', 'TRY': 'TRY',  # Turkish Lira
-        'CHF': 'CHF', 'NOK': 'NOK', 'SEK': 'SEK', 'DKK': 'DKK',
-        'RM': 'MYR', 'MYR': 'MYR',  # 马来西亚林吉特
-        '฿': 'THB', 'THB': 'THB',    # 泰铢
-        'Rp': 'IDR', 'IDR': 'IDR',   # 印尼盾
-        'S/.': 'PEN', 'PEN': 'PEN',  # 秘鲁索尔
-        'L': 'HNL', 'Gs': 'PYG', 'Q': 'GTQ',
-        'kr': 'SEK',  # 默认kr为瑞典克朗
-    }
 
-    # 按符号长度从长到短排序，优先匹配更具体的符号
-    sorted_symbols = sorted(currency_symbols.items(), key=lambda x: len(x[0]), reverse=True)
+    # 国家到货币的精确映射（最高优先级）和按长度排序的货币符号见 max_reference/tables.py
+    sorted_symbols = max_reference.currency_symbols()
 
     # 先检查明确的货币符号（除了单独的$）
     for symbol, currency in sorted_symbols:
@@ -964,16 +625,18 @@ def detect_currency(price_str: str, country_code: str = None) -> str:
         # 价格>=1000或无法提取，使用国家映射
         if country_code:
             country_code_lower = country_code.lower()
-            if country_code_lower in country_currency_map:
-                return country_currency_map[country_code_lower]
+            currency = max_reference.country_currency(country_code_lower)
+            if currency:
+                return currency
         # 没有国家映射，默认USD
         return 'USD'
 
     # 如果都没找到，返回国家映射的货币或默认USD
     if country_code:
         country_code_lower = country_code.lower()
-        if country_code_lower in country_currency_map:
-            return country_currency_map[country_code_lower]
+        currency = max_reference.country_currency(country_code_lower)
+        if currency:
+            return currency
     
     return 'USD'
 
@@ -992,7 +655,7 @@ def _extract_plans_from_nextjs_json(html: str, country_code: str) -> List[Dict[s
     try:
         data = json.loads(scripts[0])
     except Exception as e:
-        print(f"    ⚠️ {country_code}: Next.js JSON 解析失败 - {e}")
+        log.warning(f"    ⚠️ {country_code}: Next.js JSON 解析失败 - {e}")
         return plans
 
     mapped = data.get('props', {}).get('pageProps', {}).get('mappedData', {})
@@ -1061,7 +724,7 @@ def _extract_plans_from_nextjs_json(html: str, country_code: str) -> List[Dict[s
                     continue
                 seen.add(key)
 
-                normalized_name = normalize_plan_name(name_raw)
+                normalized_name = normalize_plan_name_timed(name_raw, country_code)
                 price_number = extract_price_number(amount_str)
 
                 if plan_group == 'yearly':
@@ -1080,7 +743,7 @@ def _extract_plans_from_nextjs_json(html: str, country_code: str) -> List[Dict[s
                     "currency": currency_code,
                 }
                 plans.append(plan_data)
-                print(f"✅ {country_code}: [Next.js JSON] {normalized_name} ({label}) - {price_display} ({currency_code})")
+                log.debug("✅ %s: [Next.js JSON] %s (%s) - %s (%s)", country_code, normalized_name, label, price_display, currency_code)
 
     return plans
 
@@ -1091,25 +754,31 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
         err = f"❌ 无法获取页面内容 ({country_code})"
         return [], err
 
+    soup = None
     try:
-        soup = BeautifulSoup(html, 'html.parser')
         plans: List[Dict[str, Any]] = []
         seen: set = set()
 
-        # 方法0: Next.js JSON script 提取（优先，适用于 PH/PK 等）
-        nextjs_plans = _extract_plans_from_nextjs_json(html, country_code)
+        # 方法0: Next.js JSON script 提取（优先，适用于 PH/PK 等），命中时不需要构建 soup
+        with SCRAPER_METRICS.span("parse.method0", country_code):
+            nextjs_plans = _extract_plans_from_nextjs_json(html, country_code)
         if nextjs_plans:
-            print(f"📊 {country_code}: Next.js JSON 提取到 {len(nextjs_plans)} 个套餐")
+            log.info(f"📊 {country_code}: Next.js JSON 提取到 {len(nextjs_plans)} 个套餐")
             out = [f"**HBO Max {country_code.upper()} 订阅价格:**"]
             for item in nextjs_plans:
                 out.append(f"✅ {item['name']} ({item['label']}): **{item['price']}**")
             return nextjs_plans, "\n".join(out)
 
+        with SCRAPER_METRICS.span("parse.soup", country_code):
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(html, 'html.parser')
+
         # 方法1: 寻找带data-plan-group属性的标准结构
+        method_span = SCRAPER_METRICS.span("parse.method1", country_code)
         sections = soup.find_all('section', {'data-plan-group': True})
         
         if sections:
-            print(f"📊 {country_code}: 找到 {len(sections)} 个标准价格区域 (data-plan-group)")
+            log.info(f"📊 {country_code}: 找到 {len(sections)} 个标准价格区域 (data-plan-group)")
             for sec in sections:
                 p = sec['data-plan-group']
                 # 正确处理bundle类型的标签
@@ -1125,7 +794,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                     # 其他未知类型默认为月付
                     label = '每月'
                 cards = sec.find_all('div', class_='max-plan-picker-group__card')
-                print(f"📦 {country_code}: {label} 区域找到 {len(cards)} 个套餐")
+                log.info(f"📦 {country_code}: {label} 区域找到 {len(cards)} 个套餐")
                 
                 for card in cards:
                     try:
@@ -1139,7 +808,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                         price = price_elem.get_text(strip=True)
                         
                         # 统一套餐名称（参考Spotify项目架构）
-                        normalized_name = normalize_plan_name(name)
+                        normalized_name = normalize_plan_name_timed(name, country_code)
                         
                         key = (p, normalized_name, price)
                         if key in seen:
@@ -1155,7 +824,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             detected_cycle, cycle_label = detect_billing_cycle_globally(price, price_number, country_code)
                             final_plan_group = 'bundle'  # 保持bundle分类
                             final_label = cycle_label
-                            print(f"    🔍 {country_code}: Bundle套餐周期检测: {price} -> {cycle_label} (保持bundle类型)")
+                            log.debug("    🔍 %s: Bundle套餐周期检测: %s -> %s (保持bundle类型)", country_code, price, cycle_label)
                         else:
                             final_plan_group = p
                             final_label = label
@@ -1168,12 +837,12 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             # 12x格式的bundle应该标记为年付
                             final_plan_group = 'bundle'
                             final_label = '每年'
-                            print(f"    🔍 {country_code}: Bundle套餐12x格式标记为年付: {price}")
+                            log.debug("    🔍 %s: Bundle套餐12x格式标记为年付: %s", country_code, price)
                         elif p == 'bundle':
                             detected_cycle, cycle_label = detect_billing_cycle_globally(price, price_number, country_code)
                             final_plan_group = 'bundle'  # 保持bundle分类
                             final_label = cycle_label
-                            print(f"    🔍 {country_code}: Bundle套餐周期检测: {price} -> {cycle_label}")
+                            log.debug("    🔍 %s: Bundle套餐周期检测: %s -> %s", country_code, price, cycle_label)
                         else:
                             final_plan_group = p
                             final_label = label
@@ -1183,12 +852,12 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             # 12x格式：price_number是月价格，年度总价需要乘以12
                             annual_total_price = price_number * 12
                             monthly_equivalent_price = price_number
-                            print(f"    💰 {country_code}: 12x格式 - 月价: {price_number}, 年总价: {annual_total_price}")
+                            log.debug("    💰 %s: 12x格式 - 月价: %s, 年总价: %s", country_code, price_number, annual_total_price)
                         elif final_plan_group == 'yearly' or p == 'yearly':
                             # 标准年付：price_number是年度总价，月等价需要除以12
                             annual_total_price = price_number
                             monthly_equivalent_price = round(price_number / 12, 2)
-                            print(f"    💰 {country_code}: 年付套餐 - 年总价: {annual_total_price}, 月等价: {monthly_equivalent_price}")
+                            log.debug("    💰 %s: 年付套餐 - 年总价: %s, 月等价: %s", country_code, annual_total_price, monthly_equivalent_price)
                         else:
                             # 月付：保持原价格
                             annual_total_price = price_number
@@ -1205,32 +874,35 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             "currency": currency
                         }
                         plans.append(plan_data)
-                        print(f"✅ {country_code}: {normalized_name} ({final_label}) - {price} ({currency})")
+                        log.debug("✅ %s: %s (%s) - %s (%s)", country_code, normalized_name, final_label, price, currency)
                         if name != normalized_name:
-                            print(f"    📋 原始名称: '{name}' -> 统一名称: '{normalized_name}'")
+                            log.debug("    📋 原始名称: '%s' -> 统一名称: '%s'", name, normalized_name)
                         
                     except Exception as e:
-                        print(f"⚠️ {country_code}: 解析套餐失败 - {e}")
+                        log.warning(f"⚠️ {country_code}: 解析套餐失败 - {e}")
                         continue
             
             # 构建输出文本
             if plans:
+                method_span.stop()
                 out = [f"**HBO Max {country_code.upper()} 订阅价格:**"]
                 for item in plans:
                     out.append(f"✅ {item['name']} ({item['label']}): **{item['price']}**")
                 return plans, "\n".join(out)
+        method_span.stop(ok=False)
         
         # 方法2: 寻找基于class的结构（如土耳其、波兰等）
+        method_span = SCRAPER_METRICS.span("parse.method2", country_code)
         monthly_sections = soup.find_all('section', class_=re.compile(r'max-plan-picker-group-monthly', re.I))
         yearly_sections = soup.find_all('section', class_=re.compile(r'max-plan-picker-group-yearly', re.I))
         
         if monthly_sections or yearly_sections:
-            print(f"📊 {country_code}: 找到基于class的价格区域 (月付:{len(monthly_sections)}, 年付:{len(yearly_sections)})")
+            log.info(f"📊 {country_code}: 找到基于class的价格区域 (月付:{len(monthly_sections)}, 年付:{len(yearly_sections)})")
             
             # 处理月付区域
             for sec in monthly_sections:
                 cards = sec.find_all('div', class_='max-plan-picker-group__card')
-                print(f"📦 {country_code}: 月付区域找到 {len(cards)} 个套餐")
+                log.info(f"📦 {country_code}: 月付区域找到 {len(cards)} 个套餐")
                 
                 for card in cards:
                     try:
@@ -1247,7 +919,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                         if not name or name.isspace():
                             continue
                         
-                        normalized_name = normalize_plan_name(name)
+                        normalized_name = normalize_plan_name_timed(name, country_code)
                         
                         key = ('monthly', normalized_name, price)
                         if key in seen:
@@ -1264,7 +936,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             # Calculate correct monthly_price based on detected cycle
                             if detected_cycle == 'yearly':
                                 monthly_equivalent_price = round(price_number / 12, 2)
-                                print(f"    💰 {country_code}: 月付区域年付套餐 - 年总价: {price_number}, 月等价: {monthly_equivalent_price}")
+                                log.debug("    💰 %s: 月付区域年付套餐 - 年总价: %s, 月等价: %s", country_code, price_number, monthly_equivalent_price)
                             else:
                                 monthly_equivalent_price = price_number
                             
@@ -1279,16 +951,16 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                 "currency": currency
                             }
                             plans.append(plan_data)
-                            print(f"✅ {country_code}: {normalized_name} ({cycle_label}) - {price} ({currency})")
+                            log.debug("✅ %s: %s (%s) - %s (%s)", country_code, normalized_name, cycle_label, price, currency)
                     
                     except Exception as e:
-                        print(f"⚠️ {country_code}: 解析月付套餐失败 - {e}")
+                        log.warning(f"⚠️ {country_code}: 解析月付套餐失败 - {e}")
                         continue
             
             # 处理年付区域  
             for sec in yearly_sections:
                 cards = sec.find_all('div', class_='max-plan-picker-group__card')
-                print(f"📦 {country_code}: 年付区域找到 {len(cards)} 个套餐")
+                log.info(f"📦 {country_code}: 年付区域找到 {len(cards)} 个套餐")
                 
                 for card in cards:
                     try:
@@ -1305,7 +977,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                         if not name or name.isspace():
                             continue
                         
-                        normalized_name = normalize_plan_name(name)
+                        normalized_name = normalize_plan_name_timed(name, country_code)
                         
                         key = ('yearly', normalized_name, price)
                         if key in seen:
@@ -1322,7 +994,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                             # Calculate correct monthly_price based on detected cycle
                             if detected_cycle == 'yearly':
                                 monthly_equivalent_price = round(price_number / 12, 2)
-                                print(f"    💰 {country_code}: 年付区域年付套餐 - 年总价: {price_number}, 月等价: {monthly_equivalent_price}")
+                                log.debug("    💰 %s: 年付区域年付套餐 - 年总价: %s, 月等价: %s", country_code, price_number, monthly_equivalent_price)
                             else:
                                 monthly_equivalent_price = price_number
                             
@@ -1337,26 +1009,29 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                 "currency": currency
                             }
                             plans.append(plan_data)
-                            print(f"✅ {country_code}: {normalized_name} ({cycle_label}) - {price} ({currency})")
+                            log.debug("✅ %s: %s (%s) - %s (%s)", country_code, normalized_name, cycle_label, price, currency)
                     
                     except Exception as e:
-                        print(f"⚠️ {country_code}: 解析年付套餐失败 - {e}")
+                        log.warning(f"⚠️ {country_code}: 解析年付套餐失败 - {e}")
                         continue
             
             # 如果找到了计划，返回结果
             if plans:
+                method_span.stop()
                 out = [f"**HBO Max {country_code.upper()} 订阅价格:**"]
                 for item in plans:
                     out.append(f"✅ {item['name']} ({item['label']}): **{item['price']}**")
                 return plans, "\n".join(out)
+        method_span.stop(ok=False)
         
         # 如果没有找到标准结构，尝试其他解析方法
-        print(f"🔍 {country_code}: 未找到标准价格结构，尝试备用解析...")
+        method_span = SCRAPER_METRICS.span("parse.method3", country_code)
+        log.info(f"🔍 {country_code}: 未找到标准价格结构，尝试备用解析...")
         
         # 查找价格相关的元素
         price_elements = soup.find_all(['div', 'span', 'p'], class_=re.compile(r'price|cost|plan', re.I))
         if price_elements:
-            print(f"📊 {country_code}: 找到 {len(price_elements)} 个价格相关元素")
+            log.info(f"📊 {country_code}: 找到 {len(price_elements)} 个价格相关元素")
             for elem in price_elements[:10]:  # 增加检查数量
                 text = elem.get_text(strip=True)
                 # 检查是否包含价格信息
@@ -1400,7 +1075,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                         for keyword, name in plan_keywords.items():
                                             if keyword in sibling_text and len(sibling_text) < 100:
                                                 plan_name = name
-                                                print(f"    🔍 {country_code}: 从兄弟元素找到套餐名: '{sibling_text}' -> {name}")
+                                                log.debug("    🔍 %s: 从兄弟元素找到套餐名: '%s' -> %s", country_code, sibling_text, name)
                                                 break
                                         if plan_name != "HBO Max Plan":
                                             break
@@ -1409,14 +1084,14 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                 if plan_name == "HBO Max Plan" and country_code.lower() == 'tr':
                                     # 过滤掉节省金额，只保留实际套餐价格
                                     if price_number in [459.8, 599.8]:
-                                        print(f"    ⚠️ {country_code}: 跳过节省金额: {price_number} TL")
+                                        log.warning("    ⚠️ %s: 跳过节省金额: %s TL", country_code, price_number)
                                         continue
                                     elif price_number in [229.9, 2299.0]:
                                         plan_name = "Standard"
-                                        print(f"    💡 {country_code}: 基于价格推断套餐: {price_number} TL -> Standard")
+                                        log.debug("    💡 %s: 基于价格推断套餐: %s TL -> Standard", country_code, price_number)
                                     elif price_number in [299.9, 2999.0]:
                                         plan_name = "Premium" 
-                                        print(f"    💡 {country_code}: 基于价格推断套餐: {price_number} TL -> Premium")
+                                        log.debug("    💡 %s: 基于价格推断套餐: %s TL -> Premium", country_code, price_number)
                                 
                                 # 方法3: 从当前元素的class或data属性推断
                                 if plan_name == "HBO Max Plan" and elem.get('class'):
@@ -1428,7 +1103,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                     elif 'premium' in class_str.lower() or 'ultimate' in class_str.lower():
                                         plan_name = "Premium"
                                 
-                                normalized_name = normalize_plan_name(plan_name)
+                                normalized_name = normalize_plan_name_timed(plan_name, country_code)
                                 
                                 # 使用全局周期检测
                                 plan_group, label = detect_billing_cycle_globally(price_text, price_number, country_code)
@@ -1436,7 +1111,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                 # Calculate correct monthly_price based on detected cycle
                                 if plan_group == 'yearly':
                                     monthly_equivalent_price = round(price_number / 12, 2)
-                                    print(f"    💰 {country_code}: 备用解析年付套餐 - 年总价: {price_number}, 月等价: {monthly_equivalent_price}")
+                                    log.debug("    💰 %s: 备用解析年付套餐 - 年总价: %s, 月等价: %s", country_code, price_number, monthly_equivalent_price)
                                 else:
                                     monthly_equivalent_price = price_number
                                 
@@ -1456,14 +1131,14 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                     "monthly_price": monthly_equivalent_price,
                                     "currency": currency
                                 })
-                                print(f"✅ {country_code}: 备用解析 - {normalized_name}: {price_text} ({currency})")
+                                log.debug("✅ %s: 备用解析 - %s: %s (%s)", country_code, normalized_name, price_text, currency)
                     else:
                         # 如果没有匹配到具体价格，使用原来的逻辑（但限制文本长度）
                         if len(text) < 200:  # 只处理较短的文本，避免整页内容
                             price_number = extract_price_number(text)
                             currency = detect_currency(text, country_code)
                             if price_number > 0:
-                                normalized_name = normalize_plan_name("HBO Max Plan")
+                                normalized_name = normalize_plan_name_timed("HBO Max Plan", country_code)
                                 
                                 # 使用全局周期检测
                                 plan_group, label = detect_billing_cycle_globally(text, price_number, country_code)
@@ -1471,7 +1146,7 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                 # Calculate correct monthly_price based on detected cycle
                                 if plan_group == 'yearly':
                                     monthly_equivalent_price = round(price_number / 12, 2)
-                                    print(f"    💰 {country_code}: 备用解析2年付套餐 - 年总价: {price_number}, 月等价: {monthly_equivalent_price}")
+                                    log.debug("    💰 %s: 备用解析2年付套餐 - 年总价: %s, 月等价: %s", country_code, price_number, monthly_equivalent_price)
                                 else:
                                     monthly_equivalent_price = price_number
                                 
@@ -1491,9 +1166,10 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
                                     "monthly_price": monthly_equivalent_price,
                                     "currency": currency
                                 })
-                                print(f"✅ {country_code}: 备用解析 - {text} ({currency})")
+                                log.debug("✅ %s: 备用解析 - %s (%s)", country_code, text, currency)
                                 break
         
+        method_span.stop(ok=bool(plans))
         if plans:
             out = [f"**HBO Max {country_code.upper()} 订阅价格:**"]
             for item in plans:
@@ -1501,9 +1177,13 @@ async def parse_max_prices(html: str, country_code: str) -> Tuple[List[Dict[str,
             return plans, "\n".join(out)
         
     except Exception as e:
-        print(f"❌ {country_code}: 解析失败 - {e}")
+        log.error(f"❌ {country_code}: 解析失败 - {e}")
         err = f"❌ 解析出错: {e}"
         return [], err
+    finally:
+        # soup 树内部是循环引用，要等 GC 才会回收；解析完立即拆除，避免并发时页面树堆积
+        if soup is not None:
+            soup.decompose()
     
     return [], f"❌ {country_code}: 未解析到任何价格"
 
@@ -1516,17 +1196,31 @@ async def get_max_prices_for_country(country_code: str, max_retries: int = 2, se
         return await _get_max_prices_for_country_impl(country_code, max_retries)
 
 async def _get_max_prices_for_country_impl(country_code: str, max_retries: int) -> Optional[Dict[str, Any]]:
-    """获取指定国家的HBO Max价格的内部实现"""
-    country_name = COUNTRY_NAMES.get(country_code.lower(), country_code.upper())
+    """获取指定国家的HBO Max价格的内部实现（标记当前国家并计时）"""
+    # 内存超出预算时在这里等待，直到在途的国家完成
+    await SCRAPER_MEMORY.acquire(country_code)
+    token = current_country.set(country_code.upper())
+    span = SCRAPER_METRICS.span("country", country_code)
+    try:
+        result = await _get_max_prices_for_country_attempts(country_code, max_retries)
+        span.stop(ok=result is not None)
+        return result
+    finally:
+        current_country.reset(token)
+        SCRAPER_MEMORY.release()
+
+async def _get_max_prices_for_country_attempts(country_code: str, max_retries: int) -> Optional[Dict[str, Any]]:
+    """按重试次数依次尝试获取代理、页面并解析"""
+    country_name = max_reference.country_names().get(country_code.lower(), country_code.upper())
     
     for attempt in range(max_retries):
         try:
-            print(f"\n🌍 {country_code} ({country_name}) - 尝试 {attempt + 1}/{max_retries}")
+            log.info(f"\n🌍 {country_code} ({country_name}) - 尝试 {attempt + 1}/{max_retries}")
             
             # 获取代理（使用重试机制）
             proxies = await get_proxy_with_retry(country_code)
             if not proxies:
-                print(f"❌ {country_code}: 无法获取代理，尝试下一次")
+                log.error(f"❌ {country_code}: 无法获取代理，尝试下一次")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(random.uniform(2, 5))
                     continue
@@ -1537,20 +1231,28 @@ async def _get_max_prices_for_country_impl(country_code: str, max_retries: int)
             headers = {**BASE_HEADERS, 'User-Agent': random.choice(USER_AGENTS)}
             
             # 获取页面内容
-            html = await fetch_max_page(country_code, proxies, headers)
+            with SCRAPER_MEMORY.stage("fetch", country_code) as mem:
+                html = await fetch_max_page(country_code, proxies, headers)
+                mem.size = len(html) if html else 0
             if not html:
-                print(f"❌ {country_code}: 无法获取页面内容")
+                log.error(f"❌ {country_code}: 无法获取页面内容")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(random.uniform(2, 5))
                     continue
                 else:
                     return None
             
-            # 解析价格
-            plans, result_text = await parse_max_prices(html, country_code)
+            # 解析价格（parse_max_prices 内部没有 await，可作为独占阶段统计分配峰值）
+            with SCRAPER_MEMORY.stage("parse", country_code, exclusive=True) as mem:
+                mem.size = len(html)
+                plans, result_text = await parse_max_prices(html, country_code)
+            # 页面原文不再需要，重试等待期间不再持有
+            del html
             
             if plans:
-                print(f"🎯 {country_code}: 成功获取 {len(plans)} 个套餐")
+                log.info(f"🎯 {country_code}: 成功获取 {len(plans)} 个套餐")
+                # 套餐名已经标准化，写入版本后转换器不再重复处理
+                stamp_normalizer_version(plans)
                 return {
                     'country_code': country_code.upper(),
                     'country_name': country_name,
@@ -1560,7 +1262,7 @@ async def _get_max_prices_for_country_impl(country_code: str, max_retries: int)
                     'success': True
                 }
             else:
-                print(f"⚠️ {country_code}: 未获取到价格信息")
+                log.warning(f"⚠️ {country_code}: 未获取到价格信息")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(random.uniform(2, 5))
                     continue
@@ -1568,7 +1270,7 @@ async def _get_max_prices_for_country_impl(country_code: str, max_retries: int)
                     return None
                     
         except Exception as e:
-            print(f"❌ {country_code}: 处理失败 - {e}")
+            log.error(f"❌ {country_code}: 处理失败 - {e}")
             if attempt < max_retries - 1:
                 await asyncio.sleep(random.uniform(2, 5))
                 continue
@@ -1577,38 +1279,62 @@ async def _get_max_prices_for_country_impl(country_code: str, max_retries: int)
     
     return None
 
-async def main():
-    """主函数：并发获取各国HBO Max价格"""
-    print("🎬 HBO Max Global Price Scraper 启动...")
-    print("🚀 使用并发模式，同时处理多个国家")
+def check_dependencies():
+    """
+    httpx 和 BeautifulSoup4 只在抓取/解析时才导入（只读取 JSON 的工具不必加载它们），
+    抓取开始前先确认两者都已安装，缺失时立即退出
+    """
+    missing = []
+    for module, package in (("httpx", "httpx"), ("bs4", "beautifulsoup4")):
+        try:
+            __import__(module)
+        except ImportError:
+            missing.append(package)
+    if missing:
+        log.error(f"❌ 请安装依赖: pip install {' '.join(missing)}")
+        sys.exit(1)
+
+async def main(save: bool = True, countries: Optional[List[str]] = None):
+    """
+    主函数：并发获取各国HBO Max价格
+    save 为 False 时只返回结果、不写 JSON 文件（由流水线统一写出）；countries 只抓取指定的国家代码
+    """
+    check_dependencies()
+    log.info("🎬 HBO Max Global Price Scraper 启动...")
+    log.info("🚀 使用并发模式，同时处理多个国家")
+    SCRAPER_METRICS.reset()
+    SCRAPER_MEMORY.start()
     
     results = {}
     failed_countries = []
     
     # 获取所有国家代码
-    all_countries = list(REGION_PATHS.keys())
+    all_countries = list(max_reference.region_paths().keys())
+    if countries:
+        wanted = {code.lower() for code in countries}
+        all_countries = [code for code in all_countries if code in wanted]
     total_countries = len(all_countries)
     max_concurrent = 5  # 最大并发数，避免过多请求
     
-    print(f"📊 准备处理 {total_countries} 个国家/地区")
+    log.info(f"📊 准备处理 {total_countries} 个国家/地区")
     
     # 创建信号量来限制并发数
     semaphore = asyncio.Semaphore(max_concurrent)
     
     async def process_country_with_semaphore(country_code: str, index: int):
         """使用信号量控制并发的国家处理函数"""
-        print(f"\n🔄 开始处理: {index+1}/{total_countries} - {country_code}")
+        log.info(f"\n🔄 开始处理: {index+1}/{total_countries} - {country_code}")
         
         # 获取该国家的价格
         country_data = await get_max_prices_for_country(country_code, semaphore=semaphore)
         
         if country_data:
             results[country_code.upper()] = country_data
-            print(f"✅ {country_code}: 成功获取 {len(country_data['plans'])} 个套餐")
+            log.info(f"✅ {country_code}: 成功获取 {len(country_data['plans'])} 个套餐")
             return True, country_code
         else:
-            failed_countries.append(f"{country_code} ({COUNTRY_NAMES.get(country_code.lower(), country_code)})")
-            print(f"❌ {country_code}: 获取失败")
+            failed_countries.append(f"{country_code} ({max_reference.country_names().get(country_code.lower(), country_code)})")
+            log.error(f"❌ {country_code}: 获取失败")
             return False, country_code
     
     # 创建所有任务
@@ -1620,14 +1346,14 @@ async def main():
     # 分批处理以避免过载
     batch_size = 15  # 每批处理15个国家
     
-    print(f"🚀 开始并发处理（最大并发数: {max_concurrent}，批处理大小: {batch_size}）...")
+    log.info(f"🚀 开始并发处理（最大并发数: {max_concurrent}，批处理大小: {batch_size}）...")
     
     for i in range(0, len(tasks), batch_size):
         batch = tasks[i:i+batch_size]
         batch_start = i + 1
         batch_end = min(i + batch_size, len(tasks))
         
-        print(f"\n📦 处理批次 {batch_start}-{batch_end}/{total_countries}")
+        log.info(f"\n📦 处理批次 {batch_start}-{batch_end}/{total_countries}")
         
         # 并发执行当前批次
         batch_results = await asyncio.gather(*batch, return_exceptions=True)
@@ -1635,80 +1361,112 @@ async def main():
         # 处理批次结果
         for result in batch_results:
             if isinstance(result, Exception):
-                print(f"❌ 批次中发生异常: {result}")
+                log.error(f"❌ 批次中发生异常: {result}")
             elif isinstance(result, tuple) and len(result) == 2:
                 success, country_code = result
                 if success:
-                    print(f"📊 批次完成: {country_code} ✅")
+                    log.info(f"📊 批次完成: {country_code} ✅")
                 else:
-                    print(f"📊 批次完成: {country_code} ❌")
+                    log.info(f"📊 批次完成: {country_code} ❌")
         
         # 批次间添加延迟
         if i + batch_size < len(tasks):
             delay = random.uniform(3, 8)
-            print(f"⏱️  批次间等待 {delay:.1f} 秒...")
+            log.info(f"⏱️  批次间等待 {delay:.1f} 秒...")
             await asyncio.sleep(delay)
     
-    # 保存结果
-    timestamp = time.strftime('%Y%m%d_%H%M%S')
-    output_file = f'max_prices_all_countries_{timestamp}.json'
-    output_file_latest = 'max_prices_all_countries.json'
-    
-    # 确保归档目录结构存在
-    archive_dir = 'archive'
-    if not os.path.exists(archive_dir):
-        os.makedirs(archive_dir)
-    
-    # 根据时间戳创建年份子目录
-    year_archive_dir = create_archive_directory_structure(archive_dir, timestamp)
-    
-    # 保存带时间戳的版本到对应年份归档目录
-    archive_file = os.path.join(year_archive_dir, output_file)
-    with open(archive_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    
-    # 保存最新版本（供转换器使用）
-    with open(output_file_latest, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    if save:
+        # 保存结果
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+        output_file = f'max_prices_all_countries_{timestamp}.json'
+        output_file_latest = 'max_prices_all_countries.json'
+        
+        # 确保归档目录结构存在
+        archive_dir = 'archive'
+        if not os.path.exists(archive_dir):
+            os.makedirs(archive_dir)
+        
+        # 根据时间戳创建年份子目录
+        year_archive_dir = create_archive_directory_structure(archive_dir, timestamp)
+        
+        # 保存带时间戳的版本到对应年份归档目录（快照存储：压缩对象 + 原文件名的引用）
+        archive_file = os.path.join(year_archive_dir, output_file)
+        with SCRAPER_METRICS.span("output.write"), SCRAPER_MEMORY.stage("output", exclusive=True):
+            from max_snapshot_store import SnapshotStore
+            content = json.dumps(results, ensure_ascii=False, indent=2).encode('utf-8')
+            SnapshotStore(archive_dir).write(archive_file, results, content)
+            
+            # 保存最新版本（供转换器使用）
+            with open(output_file_latest, 'wb') as f:
+                f.write(content)
+            
+            # 登记到归档清单
+            ArchiveManifest(archive_dir).add(archive_file, content, countries=len(results))
     
     # 打印统计信息
-    print(f"\n" + "="*60)
-    print(f"🎉 HBO Max 价格抓取完成！")
-    print(f"✅ 成功: {len(results)} 个国家")
-    print(f"❌ 失败: {len(failed_countries)} 个国家")
-    print(f"📁 历史版本已保存到: {archive_file}")
-    print(f"📁 最新版本已保存到: {output_file_latest}")
+    log.info(f"\n" + "="*60)
+    log.info(f"🎉 HBO Max 价格抓取完成！")
+    log.info(f"✅ 成功: {len(results)} 个国家")
+    log.info(f"❌ 失败: {len(failed_countries)} 个国家")
+    if save:
+        log.info(f"📁 历史版本已保存到: {archive_file}")
+        log.info(f"📁 最新版本已保存到: {output_file_latest}")
     
     if failed_countries:
-        print(f"\n❌ 失败的国家: {', '.join(failed_countries)}")
+        log.error(f"\n❌ 失败的国家: {', '.join(failed_countries)}")
     
     # 显示成功率统计
-    success_rate = len(results) / total_countries * 100
-    print(f"\n📊 统计信息:")
-    print(f"  总国家数: {total_countries}")
-    print(f"  成功获取: {len(results)} 个国家")
-    print(f"  失败数量: {len(failed_countries)} 个国家")
-    print(f"  成功率: {success_rate:.1f}%")
+    success_rate = len(results) / total_countries * 100 if total_countries else 0.0
+    log.info(f"\n📊 统计信息:")
+    log.info(f"  总国家数: {total_countries}")
+    log.info(f"  成功获取: {len(results)} 个国家")
+    log.info(f"  失败数量: {len(failed_countries)} 个国家")
+    log.info(f"  成功率: {success_rate:.1f}%")
+    
+    # 输出本次运行的性能报告
+    memory_report = SCRAPER_MEMORY.report()
+    SCRAPER_MEMORY.stop()
+    SCRAPER_MEMORY.log_table(memory_report)
+    report_file, prom_file = SCRAPER_METRICS.write_report(extra={
+        "total_countries": total_countries,
+        "successful_countries": len(results),
+        "failed_countries": len(failed_countries),
+        "memory": memory_report,
+    })
+    log.info(f"⏱️ 性能报告: {report_file} (Prometheus: {prom_file})")
     
     return results
 
-if __name__ == '__main__':
+def cli(argv: Optional[List[str]] = None):
+    """爬虫命令行入口（python max_scraper.py / python max_cli.py scrape）"""
+    import argparse
+    from max_profiler import add_profile_arguments, profiling_from_args
+
+    parser = argparse.ArgumentParser(description="HBO Max 全球价格爬虫")
+    add_profile_arguments(parser)
+    cli_args = parser.parse_args(argv)
+
     # 运行爬虫
     try:
-        results = asyncio.run(main())
+        with profiling_from_args("scraper", cli_args):
+            results = asyncio.run(main())
         
         # 显示一些样本数据
         if results:
-            print(f"\n📋 样本数据:")
+            log.info(f"\n📋 样本数据:")
             for country_code, data in list(results.items())[:3]:
-                print(f"\n{country_code} - {data.get('country_name', 'Unknown')}:")
+                log.info(f"\n{country_code} - {data.get('country_name', 'Unknown')}:")
                 for plan in data.get('plans', []):
-                    print(f"  📦 {plan.get('name', 'Unknown')}: {plan.get('price', 'N/A')}")
+                    log.info(f"  📦 {plan.get('name', 'Unknown')}: {plan.get('price', 'N/A')}")
         
-        print(f"\n🎬 HBO Max 价格抓取任务完成！")
+        log.info(f"\n🎬 HBO Max 价格抓取任务完成！")
         
     except KeyboardInterrupt:
-        print(f"\n⚠️ 用户中断，程序退出")
+        log.warning(f"\n⚠️ 用户中断，程序退出")
     except Exception as e:
-        print(f"\n❌ 程序执行错误: {e}")
-        print(traceback.format_exc())
\ No newline at end of file
+        log.error(f"\n❌ 程序执行错误: {e}")
+        log.error(traceback.format_exc())
+
+
+if __name__ == '__main__':
+    cli()
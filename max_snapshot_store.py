@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 快照内容寻址存储
+归档快照不再以 indent=2 的完整 JSON 保存，而是拆成按内容寻址的压缩对象，保存在 archive/objects/：
+- 每个国家（以及 _ 开头的元数据）的记录单独序列化，以 sha256 为名压缩保存；
+  与已有对象相同的记录不再写入，相邻快照中未变化的国家只保存一次
+- 每次抓取都会变化的字段（scraped_at、attempt）不参与国家记录的哈希，连同原位置一起保存在快照目录对象中，
+  还原时放回原位置，键的顺序与原快照一致
+- archive/<年份>/ 下原来的文件名保留为几百字节的引用文件（目录对象哈希、完整 JSON 的 sha256、大小、国家数），
+  归档清单、历史库和重算脚本按原路径读取，由 load_snapshot 透明还原
+- 压缩优先使用 zstd（需安装 zstandard），未安装时使用标准库 gzip；对象按魔数识别编码，两种对象可以混用；
+  读取时校验对象的 sha256
+- 同一类快照按时间组成链：每 MAX_ARCHIVE_KEYFRAME_INTERVAL 期保存一个完整目录对象（关键帧），
+  中间各期只保存相对上一期的差量目录（调价的国家、增删的键、变化的易变字段），还原时从最近的关键帧向后应用差量
+- archive/snapshots.json 为关键帧索引：每类快照按时间记录 (时间戳, 引用路径, 目录对象, 距关键帧的期数)，
+  按时间戳取快照或取单个国家的历史时不必扫描归档目录；单个国家的历史只读取差量目录和该国家的记录对象
+
+用法:
+  python max_snapshot_store.py pack      # 把 archive/ 中的完整 JSON 快照转换为引用 + 对象
+  python max_snapshot_store.py stats     # 原始大小、实际占用和去重情况
+  python max_snapshot_store.py verify    # 检查全部引用能否还原、对象哈希是否一致
+  python max_snapshot_store.py gc        # 从索引中去掉已删除的引用，再删除不再使用的对象
+  python max_snapshot_store.py index     # 扫描引用文件重建关键帧索引
+  python max_snapshot_store.py country --country AR --since 2025   # 单个国家在各期快照中的记录
+"""
+
+import hashlib
+import json
+import os
+import sys
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from max_logger import get_logger
+
+log = get_logger("snapshot-store")
+
+ARCHIVE_DIR = 'archive'
+OBJECTS_DIR = 'objects'
+REF_FORMAT = "max-snapshot/1"
+# 压缩编码：auto（有 zstandard 时用 zstd，否则 gzip）/ zstd / gzip
+CODEC = os.getenv("MAX_ARCHIVE_CODEC") or "auto"
+ZSTD_LEVEL = 19
+GZIP_LEVEL = 9
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_MAGIC = b'\x1f\x8b'
+# 国家记录中每次抓取都会变化的字段，不参与去重
+VOLATILE_FIELDS = ("scraped_at", "attempt")
+# 引用文件的大小上限：超过的文件一定是完整 JSON
+REF_MAX_SIZE = 4096
+# 进程内缓存的解压后对象数（相邻快照共享大部分对象，回填和历史库导入时命中率很高）
+CACHE_LIMIT = 4096
+SNAPSHOT_INDEX = 'snapshots.json'
+# 关键帧索引格式版本：修改条目结构时递增，旧版本索引会被重建
+INDEX_VERSION = 1
+# 每隔多少期保存一个完整目录对象；1 表示每期都是关键帧（不使用差量）
+KEYFRAME_INTERVAL = int(os.getenv("MAX_ARCHIVE_KEYFRAME_INTERVAL") or 8)
+# 进程内缓存的已还原目录数（顺序读取时每期只需在上一期的基础上应用一个差量）
+TREE_CACHE_LIMIT = 64
+
+# 目录：键 -> (记录对象, 易变字段)，保持原快照的键顺序
+Entries = Dict[str, Tuple[str, Optional[List[List[Any]]]]]
+
+_cache: Dict[str, bytes] = {}
+_trees: Dict[str, Entries] = {}
+
+
+def clear_cache():
+    """清空进程内的对象和目录缓存"""
+    _cache.clear()
+    _trees.clear()
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_codec(codec: Optional[str] = None) -> str:
+    codec = codec or CODEC
+    if codec == "auto":
+        return "zstd" if _zstandard() else "gzip"
+    if codec not in ("zstd", "gzip"):
+        raise ValueError(f"未知的压缩编码: {codec}（可选 auto / zstd / gzip）")
+    if codec == "zstd" and not _zstandard():
+        raise ValueError("zstd 编码需要安装 zstandard: pip install zstandard")
+    return codec
+
+
+def compress(payload: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    import gzip
+    return gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def decompress(blob: bytes) -> bytes:
+    """按魔数识别编码并解压"""
+    if blob.startswith(ZSTD_MAGIC):
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("归档对象使用 zstd 压缩，需要安装 zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if blob.startswith(GZIP_MAGIC):
+        import gzip
+        return gzip.decompress(blob)
+    raise ValueError("无法识别的归档对象编码")
+
+
+def encode(value: Any) -> bytes:
+    """对象内容的序列化（紧凑、保持键顺序）"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def split_record(value: Any) -> Tuple[Any, Optional[List[List[Any]]]]:
+    """国家记录 -> (参与去重的部分, [[原位置, 字段, 值]])；不含易变字段时第二项为 None"""
+    if not isinstance(value, dict) or not any(field in value for field in VOLATILE_FIELDS):
+        return value, None
+    stable, volatile = {}, []
+    for position, (field, item) in enumerate(value.items()):
+        if field in VOLATILE_FIELDS:
+            volatile.append([position, field, item])
+        else:
+            stable[field] = item
+    return stable, volatile
+
+
+def merge_record(stable: Any, volatile: Optional[List[List[Any]]]) -> Any:
+    """split_record 的逆操作：易变字段放回原位置"""
+    if not volatile:
+        return stable
+    items = list(stable.items())
+    for position, field, item in volatile:
+        items.insert(position, (field, item))
+    return dict(items)
+
+
+def tree_delta(parent: Entries, entries: Entries) -> Dict[str, Any]:
+    """
+    entries 相对 parent 的差量：{"set": {键: 记录对象}, "drop": [键], "volatile": {键: 易变字段}, "order": [键]}
+    只包含有变化的部分；新增的键按出现顺序追加在末尾，顺序仍不一致时才记录完整的 order
+    """
+    delta: Dict[str, Any] = {}
+    changed = {key: digest for key, (digest, _) in entries.items() if key not in parent or parent[key][0] != digest}
+    dropped = [key for key in parent if key not in entries]
+    volatile = {key: value for key, (_, value) in entries.items()
+                if value != (parent[key][1] if key in parent else None)}
+    if changed:
+        delta["set"] = changed
+    if dropped:
+        delta["drop"] = dropped
+    if volatile:
+        delta["volatile"] = volatile
+    order = [key for key in parent if key in entries] + [key for key in entries if key not in parent]
+    if order != list(entries):
+        delta["order"] = list(entries)
+    return delta
+
+
+def apply_delta(parent: Entries, delta: Dict[str, Any]) -> Entries:
+    """tree_delta 的逆操作：返回新的目录，不修改 parent"""
+    entries = dict(parent)
+    for key in delta.get("drop", ()):
+        del entries[key]
+    for key, digest in delta.get("set", {}).items():
+        entries[key] = (digest, entries[key][1] if key in entries else None)
+    for key, value in delta.get("volatile", {}).items():
+        entries[key] = (entries[key][0], value)
+    if "order" in delta:
+        entries = {key: entries[key] for key in delta["order"]}
+    return entries
+
+
+def reference_info(content: bytes) -> Optional[Dict[str, Any]]:
+    """文件内容是快照引用时返回引用，否则返回 None（完整 JSON 快照）"""
+    if len(content) > REF_MAX_SIZE or b'"$snapshot"' not in content:
+        return None
+    try:
+        ref = json.loads(content)
+    except ValueError:
+        return None
+    return ref if isinstance(ref, dict) and ref.get("$snapshot") == REF_FORMAT else None
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """读取快照文件：引用文件还原为完整快照，完整 JSON 直接解析"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    ref = reference_info(content)
+    if ref is None:
+        return json.loads(content)
+    objects_dir = os.path.normpath(os.path.join(os.path.dirname(path), ref["objects"]))
+    return SnapshotStore(os.path.dirname(objects_dir), objects_dir=objects_dir).expand(ref)
+
+
+class SnapshotStore:
+    """archive/objects/ 中的内容寻址对象，以及 archive/<年份>/ 下的引用文件"""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, objects_dir: Optional[str] = None,
+                 codec: Optional[str] = None, keyframe_interval: Optional[int] = None):
+        self.archive_dir = archive_dir
+        self.objects_dir = objects_dir or os.path.join(archive_dir, OBJECTS_DIR)
+        self.codec = codec
+        self.keyframe_interval = max(1, keyframe_interval or KEYFRAME_INTERVAL)
+        self.index_path = os.path.join(archive_dir, SNAPSHOT_INDEX)
+        # {类型: [{"timestamp", "path", "tree", "depth"}]}，按时间升序；首次查询时才加载
+        self._index: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def put(self, payload: bytes) -> Tuple[str, int]:
+        """保存一个对象，返回 (sha256, 新写入的字节数)；已存在的对象不再写入"""
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        if self.codec in (None, "auto"):
+            self.codec = resolve_codec(self.codec)
+        blob = compress(payload, self.codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return digest, len(blob)
+
+    def get(self, digest: str) -> bytes:
+        """读取并校验一个对象（解压后的内容）"""
+        payload = _cache.get(digest)
+        if payload is not None:
+            return payload
+        with open(self.object_path(digest), 'rb') as f:
+            payload = decompress(f.read())
+        if hashlib.sha256(payload).hexdigest() != digest:
+            raise ValueError(f"归档对象内容与哈希不一致: {digest[:12]}")
+        if len(_cache) >= CACHE_LIMIT:
+            _cache.clear()
+        _cache[digest] = payload
+        return payload
+
+    def tree_object(self, digest: str) -> Dict[str, Any]:
+        """目录对象：关键帧 {"keys": [[键, 记录对象(, 易变字段)]]} 或差量 {"parent", "depth", ...}"""
+        return json.loads(self.get(digest))
+
+    def tree_entries(self, digest: str) -> Entries:
+        """还原目录：从最近的关键帧（或已缓存的目录）开始依次应用差量；返回值为缓存对象，调用方不要修改"""
+        chain = []
+        while digest not in _trees:
+            tree = self.tree_object(digest)
+            chain.append((digest, tree))
+            if "parent" not in tree:
+                break
+            digest = tree["parent"]
+        entries = _trees.get(digest) if not chain or "parent" in chain[-1][1] else None
+        for digest, tree in reversed(chain):
+            if "parent" in tree:
+                entries = apply_delta(entries, tree)
+            else:
+                entries = {entry[0]: (entry[1], entry[2] if len(entry) > 2 else None) for entry in tree["keys"]}
+            if len(_trees) >= TREE_CACHE_LIMIT:
+                _trees.clear()
+            _trees[digest] = entries
+        return entries
+
+    @property
+    def index(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            payload = None
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"⚠️ 关键帧索引无法读取，重新扫描: {self.index_path} - {e}")
+            payload = None
+        if isinstance(payload, dict) and payload.get("version") == INDEX_VERSION:
+            return payload.get("chains", {})
+        return self.rebuild_index()
+
+    def rebuild_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        """扫描引用文件重建关键帧索引（没有引用文件时为空索引，不写文件）"""
+        from max_archive import parse_snapshot_name
+
+        chains: Dict[str, List[Dict[str, Any]]] = {}
+        for path, ref in self.references():
+            parsed = parse_snapshot_name(path)
+            if parsed is None:
+                continue
+            try:
+                depth = self.tree_object(ref["tree"]).get("depth", 0)
+            except (OSError, ValueError) as e:
+                log.warning(f"⚠️ 跳过目录对象无法读取的引用: {path} - {e}")
+                continue
+            chains.setdefault(parsed["kind"], []).append(self._index_entry(path, parsed["timestamp"], ref, depth))
+        for items in chains.values():
+            items.sort(key=lambda item: item["timestamp"])
+        self._index = chains
+        if chains:
+            self.save_index()
+            log.info(f"🗂️ 关键帧索引已重建: {self.index_path}（{sum(len(v) for v in chains.values())} 份快照）")
+        return chains
+
+    def _index_entry(self, path: str, timestamp: str, ref: Dict[str, Any], depth: int) -> Dict[str, Any]:
+        return {"timestamp": timestamp, "path": os.path.relpath(path, self.archive_dir).replace(os.sep, '/'),
+                "tree": ref["tree"], "depth": depth}
+
+    def save_index(self):
+        """原子写入关键帧索引"""
+        payload = {"version": INDEX_VERSION, "keyframe_interval": self.keyframe_interval, "chains": self.index}
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def chain(self, kind: str, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """某类快照在 [since, until] 范围内的索引条目（按时间升序；边界为归档时间戳格式，为空表示不限）"""
+        return [item for item in self.index.get(kind, [])
+                if (not since or item["timestamp"] >= since) and (not until or item["timestamp"] <= until)]
+
+    def _parent(self, kind: str, timestamp: str) -> Optional[Dict[str, Any]]:
+        """写入 timestamp 一期时作为差量基准的上一期索引条目；应当写关键帧时返回 None"""
+        items = self.index.get(kind, [])
+        position = bisect_left([item["timestamp"] for item in items], timestamp)
+        if not position or items[position - 1]["depth"] + 1 >= self.keyframe_interval:
+            return None
+        return items[position - 1]
+
+    def _store(self, path: str, data: Dict[str, Any], content: bytes) -> Tuple[Dict[str, Any], int, int]:
+        """保存记录对象和目录对象，返回 (引用, 新写入的字节数, 距关键帧的期数)"""
+        from max_archive import parse_snapshot_name
+
+        entries: Entries = {}
+        stored = 0
+        for key, value in data.items():
+            stable, volatile = split_record(value)
+            digest, written = self.put(encode(stable))
+            stored += written
+            entries[key] = (digest, volatile)
+        keys = [[key, digest, volatile] if volatile else [key, digest] for key, (digest, volatile) in entries.items()]
+        tree, depth = {"keys": keys}, 0
+        parsed = parse_snapshot_name(path)
+        parent = self._parent(parsed["kind"], parsed["timestamp"]) if parsed else None
+        if parent is not None:
+            try:
+                delta = {"parent": parent["tree"], "depth": parent["depth"] + 1,
+                         **tree_delta(self.tree_entries(parent["tree"]), entries)}
+            except (OSError, ValueError, KeyError) as e:
+                log.warning(f"⚠️ 上一期目录无法还原，保存为关键帧: {parent['path']} - {e}")
+            else:
+                # 几乎所有国家都变化时差量不比完整目录小，直接保存关键帧
+                if len(encode(delta)) < len(encode(tree)):
+                    tree, depth = delta, delta["depth"]
+        digest, written = self.put(encode(tree))
+        if len(_trees) >= TREE_CACHE_LIMIT:
+            _trees.clear()
+        _trees[digest] = entries
+        ref = {
+            "$snapshot": REF_FORMAT,
+            "objects": os.path.relpath(self.objects_dir, os.path.dirname(path) or '.').replace(os.sep, '/'),
+            "tree": digest,
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "size": len(content),
+            "countries": sum(1 for key in data if not key.startswith('_')),
+        }
+        return ref, stored + written, depth
+
+    def _write_ref(self, path: str, ref: Dict[str, Any], depth: int):
+        """原子写入引用文件，并登记到关键帧索引"""
+        from max_archive import parse_snapshot_name
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(ref, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        parsed = parse_snapshot_name(path)
+        if parsed is None:
+            return
+        items = self.index.setdefault(parsed["kind"], [])
+        items[:] = [item for item in items if item["timestamp"] != parsed["timestamp"]]
+        position = bisect_left([item["timestamp"] for item in items], parsed["timestamp"])
+        items.insert(position, self._index_entry(path, parsed["timestamp"], ref, depth))
+        self.save_index()
+
+    def write(self, path: str, data: Dict[str, Any], content: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        把快照保存为对象，并在 path 写入引用文件
+        content 为完整 JSON 序列化结果（引用中记录它的 sha256 和大小，与归档清单一致），为空时按 indent=2 序列化
+        path 为归档文件名时，按关键帧索引中的上一期保存为差量目录，并登记到索引
+        返回 {"size", "sha256", "countries", "stored"}（stored 为本次新写入的对象字节数）
+        """
+        if content is None:
+            content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        ref, stored, depth = self._store(path, data, content)
+        self._write_ref(path, ref, depth)
+        return {"size": ref["size"], "sha256": ref["sha256"], "countries": ref["countries"], "stored": stored}
+
+    def expand(self, ref: Dict[str, Any]) -> Dict[str, Any]:
+        """引用 -> 完整快照"""
+        return {key: merge_record(json.loads(self.get(digest)), volatile)
+                for key, (digest, volatile) in self.tree_entries(ref["tree"]).items()}
+
+    def snapshot(self, kind: str, timestamp: str) -> Optional[Dict[str, Any]]:
+        """按关键帧索引还原某一期快照；索引中没有该期时返回 None"""
+        for item in self.chain(kind, timestamp, timestamp):
+            return self.expand(item)
+        return None
+
+    def country_history(self, kind: str, country: str, since: Optional[str] = None,
+                        until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        单个国家（或 _ 开头的元数据键）在各期快照中的记录，按时间升序，不含该键的期次跳过
+        返回 [{"timestamp", "path", "object", "record"}]（object 为记录对象的哈希，不变即内容未变）
+        差量目录的基准正好是上一期时只看差量中这个键的变化，不还原整个目录
+        """
+        history = []
+        previous, state = None, None
+        for item in self.chain(kind, since, until):
+            tree = self.tree_object(item["tree"])
+            if previous is not None and tree.get("parent") == previous:
+                if country in tree.get("drop", ()):
+                    state = None
+                elif country in tree.get("set", {}) or state is not None:
+                    digest = tree.get("set", {}).get(country) or state[0]
+                    volatile = tree.get("volatile", {})
+                    state = (digest, volatile[country] if country in volatile else (state[1] if state else None))
+            else:
+                state = self.tree_entries(item["tree"]).get(country)
+            previous = item["tree"]
+            if state is not None:
+                history.append({"timestamp": item["timestamp"], "path": item["path"], "object": state[0],
+                                "record": merge_record(json.loads(self.get(state[0])), state[1])})
+        return history
+
+    def references(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """归档目录中的全部引用文件 -> (路径, 引用)"""
+        for root, dirs, files in os.walk(self.archive_dir):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != self.objects_dir]
+            for name in sorted(files):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                if os.path.getsize(path) > REF_MAX_SIZE:
+                    continue
+                with open(path, 'rb') as f:
+                    ref = reference_info(f.read())
+                if ref is not None:
+                    yield path, ref
+
+    def pack(self, path: str) -> Optional[int]:
+        """
+        把一份完整 JSON 快照转换为引用 + 对象，返回节省的字节数；已是引用时返回 None
+        转换前先确认由对象还原的结果与原快照相同
+        """
+        with open(path, 'rb') as f:
+            content = f.read()
+        if reference_info(content) is not None:
+            return None
+        data = json.loads(content)
+        ref, _, depth = self._store(path, data, content)
+        _trees.clear()
+        if self.expand(ref) != data:
+            raise ValueError(f"还原结果与原快照不一致，保留原文件: {path}")
+        self._write_ref(path, ref, depth)
+        return len(content) - os.path.getsize(path)
+
+    def referenced_objects(self) -> Set[str]:
+        """全部引用用到的对象（目录对象、差量链上直到关键帧的各个目录对象，以及还原后目录中的记录对象）"""
+        used: Set[str] = set()
+        for _, ref in self.references():
+            used.update(digest for digest, _ in self.tree_entries(ref["tree"]).values())
+            digest = ref["tree"]
+            while digest and digest not in used:
+                used.add(digest)
+                digest = self.tree_object(digest).get("parent")
+        return used
+
+    def objects(self) -> Iterator[Tuple[str, str]]:
+        """全部对象 -> (sha256, 路径)"""
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in sorted(os.listdir(self.objects_dir)):
+            directory = os.path.join(self.objects_dir, prefix)
+            if os.path.isdir(directory):
+                for name in sorted(os.listdir(directory)):
+                    if not name.endswith('.tmp'):
+                        yield name, os.path.join(directory, name)
+
+    def prune_index(self) -> int:
+        """从关键帧索引中去掉引用文件已不存在的期次，返回去掉的条数"""
+        pruned = 0
+        for items in self.index.values():
+            kept = [item for item in items if os.path.exists(os.path.join(self.archive_dir, item["path"]))]
+            pruned += len(items) - len(kept)
+            items[:] = kept
+        if pruned:
+            self.save_index()
+        return pruned
+
+    def gc(self) -> int:
+        """删除没有被引用的对象，返回删除的对象数"""
+        # 已删除的引用先移出索引，否则按索引读取（snapshot、country_history）时会用到下面删除的记录对象
+        self.prune_index()
+        used = self.referenced_objects()
+        removed = 0
+        for digest, path in list(self.objects()):
+            if digest not in used:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def verify(self) -> List[str]:
+        """检查每个引用都能还原、每个对象的内容与哈希一致，返回发现的问题"""
+        problems = []
+        for path, ref in self.references():
+            try:
+                self.expand(ref)
+            except (OSError, ValueError, KeyError) as e:
+                problems.append(f"{path}: {e}")
+        from max_archive import parse_snapshot_name
+
+        indexed = {item["path"]: item["tree"] for items in self.index.values() for item in items}
+        for path, ref in self.references():
+            relative = os.path.relpath(path, self.archive_dir).replace(os.sep, '/')
+            if parse_snapshot_name(path) and indexed.get(relative) != ref["tree"]:
+                problems.append(f"{path}: 关键帧索引中缺少或不一致（运行 index 重建）")
+        for relative in indexed:
+            if not os.path.exists(os.path.join(self.archive_dir, relative)):
+                problems.append(f"{relative}: 关键帧索引中的引用文件不存在（运行 gc 或 index 重建）")
+        clear_cache()
+        for digest, path in self.objects():
+            try:
+                self.get(digest)
+            except (OSError, ValueError) as e:
+                problems.append(f"{path}: {e}")
+        return problems
+
+    def stats(self) -> Dict[str, int]:
+        refs = list(self.references())
+        stored = sum(os.path.getsize(path) for _, path in self.objects())
+        return {
+            "snapshots": len(refs),
+            "keyframes": sum(1 for items in self.index.values() for item in items if not item["depth"]),
+            "logical_bytes": sum(ref["size"] for _, ref in refs),
+            "objects": sum(1 for _ in self.objects()),
+            "stored_bytes": stored + sum(os.path.getsize(path) for path, _ in refs),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """快照存储命令行入口（python max_snapshot_store.py / python max_cli.py snapshots）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max 快照内容寻址存储（archive/objects/）")
+    parser.add_argument("action", choices=["stats", "pack", "verify", "gc", "index", "country"],
+                        nargs="?", default="stats")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="归档目录")
+    parser.add_argument("--codec", default=None, help="压缩编码：auto / zstd / gzip（也可用 MAX_ARCHIVE_CODEC）")
+    parser.add_argument("--keyframe-interval", type=int, default=None,
+                        help="pack 时每隔多少期保存一个关键帧（也可用 MAX_ARCHIVE_KEYFRAME_INTERVAL）")
+    parser.add_argument("--country", default="", help="country：国家代码或英文国家名，如 AR / Argentina")
+    parser.add_argument("--kind", default="cny_sorted", help="country：快照类型 cny_sorted / all_countries")
+    parser.add_argument("--since", default="", help="country：起始时间（含），如 2025 或 2025-07-01")
+    parser.add_argument("--until", default="", help="country：结束时间（含）")
+    parser.add_argument("--json", dest="json_path", default="", help="把 country 的结果保存为 JSON")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.archive_dir, codec=args.codec, keyframe_interval=args.keyframe_interval)
+    if args.action == "country":
+        import time
+        from max_history_store import resolve_country, timestamp_bound
+
+        if not args.country:
+            parser.error("country 需要 --country")
+        try:
+            since = timestamp_bound(args.since) if args.since else None
+            until = timestamp_bound(args.until, upper=True) if args.until else None
+        except ValueError as e:
+            parser.error(str(e))
+        start = time.perf_counter()
+        history = store.country_history(args.kind, resolve_country(args.country), since, until)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        previous = None
+        for item in history:
+            record = item["record"]
+            plans = len(record.get("plans", ())) if isinstance(record, dict) else 0
+            flag = "" if item["object"] == previous else " ✱"
+            print(f"{item['timestamp']}  {item['object'][:12]}  套餐 {plans:>3}{flag}")
+            previous = item["object"]
+        print(f"\n共 {len(history)} 期（✱ 表示记录有变化），读取耗时 {elapsed_ms:.1f} ms")
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=1)
+            log.info(f"✅ 已保存到: {args.json_path}")
+        return 0
+    if args.action == "pack":
+        from max_archive import ArchiveManifest, KINDS
+
+        try:
+            store.codec = resolve_codec(args.codec)
+        except ValueError as e:
+            parser.error(str(e))
+        manifest = ArchiveManifest(args.archive_dir)
+        packed = saved = 0
+        for kind in KINDS:
+            for entry in manifest.entries[kind]:
+                path = manifest.resolve(entry)
+                try:
+                    result = store.pack(path)
+                except (OSError, ValueError) as e:
+                    log.warning(f"⚠️ 跳过: {path} - {e}")
+                    continue
+                if result is not None:
+                    packed += 1
+                    saved += result
+        log.info(f"✅ 转换 {packed} 份快照（编码 {store.codec}），节省 {saved / 1024:.0f} KB（未计入新增对象）")
+    elif args.action == "verify":
+        problems = store.verify()
+        for problem in problems:
+            log.error(f"❌ {problem}")
+        if problems:
+            return 1
+        log.info("✅ 全部引用均可还原，对象哈希一致")
+    elif args.action == "index":
+        store.rebuild_index()
+    elif args.action == "gc":
+        log.info(f"🧹 删除 {store.gc()} 个未被引用的对象")
+    stats = store.stats()
+    ratio = stats["logical_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0
+    print(f"{args.archive_dir}: {stats['snapshots']} 份引用快照，原始 {stats['logical_bytes'] / 1024:.0f} KB，"
+          f"实际占用 {stats['stored_bytes'] / 1024:.0f} KB（{stats['objects']} 个对象，{ratio:.1f}x），"
+          f"关键帧 {stats['keyframes']} 份")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 变化摘要日志
+每次检测的变化摘要追加到 max_price_changes.jsonl（每行一条），不再在根目录为每次运行写一个
+max_price_changes_summary_<时间戳>.json：
+- 摘要内容（不含 date/timestamp）的 sha256 与上一条相同时，只追加一行引用 {"date", "timestamp", "same_as"}，
+  完整内容只保存一次，但每次运行仍有记录
+- max_price_changes.index.json 记录每一行的 (时间, 字节偏移, 长度, 哈希, 是否引用)；
+  按时间范围读取时二分查找索引，再 seek 到对应行，不必解析整个日志
+- 日志只追加；索引与日志大小不一致（手工编辑、中断）时扫描日志重建，索引以临时文件 + os.replace 原子更新
+
+用法:
+  python max_summary_log.py show --since 2026-01 --until 2026-03   # 按时间范围列出摘要
+  python max_summary_log.py migrate                                # 导入根目录的旧摘要文件并删除
+  python max_summary_log.py rebuild                                # 扫描日志重建索引
+"""
+
+import json
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional
+
+from max_logger import get_logger
+
+log = get_logger("summary")
+
+LOG_FILE = "max_price_changes.jsonl"
+INDEX_FILE = "max_price_changes.index.json"
+LEGACY_PATTERN = "max_price_changes_summary_*.json"
+# 索引格式版本：修改条目结构时递增，旧版本索引会被重建
+INDEX_VERSION = 1
+# 不参与去重哈希的字段（每次运行都不同）
+VOLATILE_FIELDS = ("date", "timestamp")
+
+
+def content_hash(summary: Dict[str, Any]) -> str:
+    """摘要内容（不含 date/timestamp）的 sha256"""
+    import hashlib
+    content = {key: value for key, value in summary.items() if key not in VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def date_key(date: str) -> str:
+    """摘要时间 YYYY-MM-DD HH:MM:SS -> 14 位数字，用于排序和范围比较"""
+    return ''.join(ch for ch in date if ch.isdigit()).ljust(14, '0')[:14]
+
+
+def range_bound(text: str, upper: bool = False) -> str:
+    """时间范围参数（2026、2026-01、2026-01-19 等）-> 与 date_key 可比较的边界"""
+    digits = ''.join(ch for ch in text if ch.isdigit())
+    if not digits or len(digits) > 14 or len(digits) % 2:
+        raise ValueError(f"无法识别的时间: {text}")
+    return digits.ljust(14, '9' if upper else '0')
+
+
+class SummaryLog:
+    """变化摘要的 JSONL 日志及其偏移索引；首次查询时才加载索引"""
+
+    def __init__(self, path: str = LOG_FILE, index_path: str = INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        # [[date_key, 偏移, 长度, 哈希, 是否引用]]，按写入顺序
+        self._entries: Optional[List[List[Any]]] = None
+
+    @property
+    def entries(self) -> List[List[Any]]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _log_size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _load(self) -> List[List[Any]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            payload = None
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"⚠️ 摘要索引无法读取，重新扫描: {self.index_path} - {e}")
+            payload = None
+        if (isinstance(payload, dict) and payload.get("version") == INDEX_VERSION
+                and payload.get("log_size") == self._log_size()):
+            return payload.get("entries", [])
+        return self.rebuild()
+
+    def rebuild(self) -> List[List[Any]]:
+        """扫描日志重建索引（跳过无法解析的行）"""
+        entries: List[List[Any]] = []
+        if os.path.exists(self.path):
+            offset = 0
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        entries.append(self._index_entry(record, offset, len(line)))
+                    except (ValueError, KeyError, TypeError) as e:
+                        log.warning(f"⚠️ 跳过无法解析的摘要行（偏移 {offset}）: {e}")
+                    offset += len(line)
+        self._entries = entries
+        if os.path.exists(self.path):
+            self.save_index()
+            log.info(f"🗂️ 摘要索引已重建: {self.index_path}（{len(entries)} 条）")
+        return entries
+
+    @staticmethod
+    def _index_entry(record: Dict[str, Any], offset: int, length: int) -> List[Any]:
+        if "same_as" in record:
+            return [date_key(record["date"]), offset, length, record["same_as"], 1]
+        return [date_key(record["date"]), offset, length, record.get("hash") or content_hash(record), 0]
+
+    def save_index(self):
+        """原子写入索引"""
+        payload = {"version": INDEX_VERSION, "log_size": self._log_size(), "entries": self.entries}
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def append(self, summary: Dict[str, Any]) -> bool:
+        """
+        追加一条摘要并更新索引；内容与上一条相同时只追加引用行
+        返回是否写入了完整内容
+        """
+        digest = content_hash(summary)
+        entries = self.entries
+        duplicate = bool(entries) and entries[-1][3] == digest
+        if duplicate:
+            record = {"date": summary["date"], "timestamp": summary.get("timestamp"), "same_as": digest}
+        else:
+            record = {**summary, "hash": digest}
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        offset = self._log_size()
+        with open(self.path, 'ab') as f:
+            f.write(line)
+        entries.append(self._index_entry(record, offset, len(line)))
+        self.save_index()
+        return not duplicate
+
+    def _read_line(self, f, offset: int, length: int) -> Dict[str, Any]:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+    def read(self, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间升序逐条读取 [since, until] 范围内的摘要（range_bound 的结果，为空表示不限）
+        引用行展开为被引用的完整内容，并带有该次运行自己的 date/timestamp 和 same_as 字段
+        """
+        entries = self.entries
+        if not entries:
+            return
+        order = sorted(range(len(entries)), key=lambda i: (entries[i][0], i))
+        keys = [entries[i][0] for i in order]
+        start = bisect_left(keys, since) if since else 0
+        stop = bisect_right(keys, until) if until else len(keys)
+        full_by_hash: Optional[Dict[str, List[Any]]] = None
+        with open(self.path, 'rb') as f:
+            for i in order[start:stop]:
+                key, offset, length, digest, is_ref = entries[i]
+                record = self._read_line(f, offset, length)
+                if is_ref:
+                    if full_by_hash is None:
+                        full_by_hash = {e[3]: e for e in entries if not e[4]}
+                    full = full_by_hash.get(digest)
+                    if full is None:
+                        log.warning(f"⚠️ 摘要引用的内容不存在: {digest[:12]}")
+                        continue
+                    record = {**self._read_line(f, full[1], full[2]), **record}
+                yield record
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最新的一条摘要"""
+        if not self.entries:
+            return None
+        key = max(entry[0] for entry in self.entries)
+        return next(self.read(key, key), None)
+
+    def migrate(self, pattern: str = LEGACY_PATTERN, remove: bool = True) -> int:
+        """按时间顺序导入旧的单文件摘要，返回导入的文件数；remove 时导入后删除旧文件"""
+        import glob
+        files = sorted(glob.glob(pattern))
+        imported = []
+        for path in files:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning(f"⚠️ 跳过无法读取的摘要文件: {path} - {e}")
+                continue
+            if not isinstance(summary, dict) or "date" not in summary:
+                log.warning(f"⚠️ 跳过缺少 date 字段的摘要文件: {path}")
+                continue
+            self.append(summary)
+            imported.append(path)
+        if remove:
+            for path in imported:
+                os.remove(path)
+        return len(imported)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """摘要日志命令行入口（python max_summary_log.py / python max_cli.py summary）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="HBO Max 变化摘要日志（max_price_changes.jsonl）")
+    parser.add_argument("action", choices=["show", "migrate", "rebuild"], nargs="?", default="show")
+    parser.add_argument("--since", default="", help="起始时间（含），如 2026 或 2026-01-19")
+    parser.add_argument("--until", default="", help="结束时间（含）")
+    parser.add_argument("--keep", action="store_true", help="migrate 时保留旧的摘要文件")
+    parser.add_argument("--json", dest="json_path", default="", help="把 show 的结果保存为 JSON")
+    args = parser.parse_args(argv)
+
+    summary_log = SummaryLog()
+    if args.action == "migrate":
+        count = summary_log.migrate(remove=not args.keep)
+        unique = sum(1 for entry in summary_log.entries if not entry[4])
+        log.info(f"✅ 导入 {count} 个旧摘要文件，日志共 {len(summary_log.entries)} 条（{unique} 条完整内容）")
+        return 0
+    if args.action == "rebuild":
+        summary_log.rebuild()
+        return 0
+
+    try:
+        since = range_bound(args.since) if args.since else None
+        until = range_bound(args.until, upper=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    records = list(summary_log.read(since, until))
+    for record in records:
+        flag = " ↺" if "same_as" in record else ""
+        print(f"{record['date']}  变化 {record.get('total_changes', 0):>4}  涨价 {record.get('price_increases', 0):>3}  "
+              f"降价 {record.get('price_decreases', 0):>3}  新增 {record.get('new_plans', 0):>3}  "
+              f"移除 {record.get('removed_plans', 0):>3}{flag}")
+    print(f"\n共 {len(records)} 条（↺ 表示与上一次运行相同）")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        log.info(f"✅ 已保存到: {args.json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBO Max 合成数据生成器
+按当前快照的结构生成任意规模的爬虫快照和汇率表，用于规模基准测试
+前 96 个国家沿用真实快照，超出部分用合成国家代码补齐；同一 seed 生成的数据完全一致
+"""
+
+import copy
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from max_normalizer import NORMALIZER_FIELD, NORMALIZER_VERSION
+
+SNAPSHOT_FILE = 'max_prices_all_countries.json'
+CONVERTED_FILE = 'max_prices_cny_sorted.json'
+
+# 合成套餐使用的名称和周期，按当前快照的大致分布
+PLAN_NAMES = ["Standard", "Standard", "Basic", "Premium", "Platinum", "Ultimate", "Mobile"]
+PLAN_GROUPS = [("monthly", "每月"), ("monthly", "每月"), ("yearly", "每年")]
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    """读取快照（归档中的引用文件由快照存储还原）"""
+    from max_snapshot_store import load_snapshot
+    return load_snapshot(path)
+
+
+def snapshot_rates(converted_file: str = CONVERTED_FILE) -> Dict[str, float]:
+    """
+    从已转换的结果还原当时使用的汇率表（USD 为基准）
+    非 USD 套餐的 exchange_rate_used 是 rates[currency]，USD 套餐记录的是 rates['CNY']
+    """
+    rates: Dict[str, float] = {"USD": 1.0}
+    if not os.path.exists(converted_file):
+        rates["CNY"] = 7.0
+        return rates
+    data = load_json(converted_file)
+    rates["CNY"] = data.get("_metadata", {}).get("cny_exchange_rate") or 7.0
+    for key, value in data.items():
+        if key.startswith('_') or not isinstance(value, dict):
+            continue
+        for plan in value.get("plans", []):
+            currency = plan.get("original_currency")
+            if currency and currency != "USD" and plan.get("exchange_rate_used"):
+                rates[currency] = plan["exchange_rate_used"]
+    return rates
+
+
+def synthetic_country_code(index: int) -> str:
+    """合成国家代码：Z + 序号，不会与真实的两位代码冲突"""
+    return f"Z{index:05d}"
+
+
+def format_price(currency: str, amount: float, plan_group: str) -> str:
+    period = "year" if plan_group == "yearly" else "month"
+    return f"{currency} {amount:,.2f}/{period}"
+
+
+def generate_snapshot(countries: int, plans: int, seed: int = 42,
+                      base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    生成 countries 个国家、共 plans 个套餐的爬虫快照（与 max_prices_all_countries.json 结构相同）
+    基准快照中的国家原样保留（直到数量用完），其余国家按真实快照的货币和价格区间合成
+    """
+    rng = random.Random(seed)
+    base = base if base is not None else (load_json(SNAPSHOT_FILE) if os.path.exists(SNAPSHOT_FILE) else {})
+    base_items = list(base.items())[:countries]
+
+    # 每种货币的价格区间，合成国家从中取值，使转换后的人民币价格保持合理
+    currency_ranges: Dict[str, List[float]] = {}
+    for _, data in base.items():
+        for plan in data.get("plans", []):
+            value = plan.get("price_number") or 0
+            if value > 0:
+                currency_ranges.setdefault(plan.get("currency", "USD"), []).append(value)
+    currencies = sorted(currency_ranges) or ["USD"]
+    if not currency_ranges:
+        currency_ranges["USD"] = [5.99, 15.99]
+
+    snapshot: Dict[str, Any] = {}
+    used_plans = 0
+    for code, data in base_items:
+        snapshot[code] = copy.deepcopy(data)
+        used_plans += len(data.get("plans", []))
+
+    remaining_countries = countries - len(snapshot)
+    remaining_plans = max(0, plans - used_plans)
+    for i in range(remaining_countries):
+        code = synthetic_country_code(i)
+        # 剩余套餐平均分配给剩余国家
+        count = remaining_plans // (remaining_countries - i) if remaining_countries - i else 0
+        remaining_plans -= count
+        currency = currencies[i % len(currencies)]
+        low, high = min(currency_ranges[currency]), max(currency_ranges[currency])
+        country_plans = []
+        for j in range(count):
+            plan_group, label = PLAN_GROUPS[j % len(PLAN_GROUPS)]
+            name = PLAN_NAMES[(i + j) % len(PLAN_NAMES)]
+            amount = round(rng.uniform(low, high), 2)
+            country_plans.append({
+                "plan_group": plan_group,
+                "label": label,
+                "name": name,
+                "original_name": name,
+                "price": format_price(currency, amount, plan_group),
+                "price_number": amount,
+                "monthly_price": round(amount / 12, 2) if plan_group == "yearly" else amount,
+                "currency": currency,
+                NORMALIZER_FIELD: NORMALIZER_VERSION,
+            })
+        snapshot[code] = {
+            "country_code": code,
+            "country_name": f"Synthetic {code}",
+            "plans": country_plans,
+            "scraped_at": "2026-01-01T00:00:00",
+            "attempt": 1,
+            "success": True,
+        }
+    return snapshot
+
+
+def perturb_converted(converted: Dict[str, Any], change_ratio: float = 0.05, remove_ratio: float = 0.01,
+                      seed: int = 7, cycle_ratio: float = 0.0) -> Dict[str, Any]:
+    """
+    以转换结果为基础生成"上一期"数据：部分套餐改价、部分套餐删除、部分套餐换计费周期（月付 <-> 年付），
+    用于价格变化检测的基准
+    """
+    rng = random.Random(seed)
+    previous: Dict[str, Any] = {}
+    for key, value in converted.items():
+        if key.startswith('_') or not isinstance(value, dict) or 'plans' not in value:
+            previous[key] = value
+            continue
+        plans = []
+        for plan in value["plans"]:
+            roll = rng.random()
+            if roll < remove_ratio:
+                continue
+            if roll < remove_ratio + change_ratio:
+                plan = dict(plan)
+                plan["price_cny"] = round(plan["price_cny"] * rng.uniform(0.8, 1.2), 2)
+            elif roll < remove_ratio + change_ratio + cycle_ratio:
+                plan = dict(plan)
+                group, cycle = PLAN_GROUPS[2] if plan.get("plan_group") != "yearly" else PLAN_GROUPS[0]
+                plan["plan_group"], plan["billing_cycle"] = group, cycle
+            plans.append(plan)
+        previous[key] = dict(value, plans=plans, total_plans=len(plans))
+    return previous
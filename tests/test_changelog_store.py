@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""max_changelog_store：追加、渲染、从 markdown 导入、季度归档、索引重建"""
+
+import os
+
+import pytest
+
+from max_changelog_store import ChangelogStore, render_entry
+
+
+def price_change(plan: str, old: float, new: float) -> dict:
+    return {"country": "Taiwan", "plan": plan, "original_price": "NT$290", "currency": "TWD",
+            "billing_cycle": "月付", "plan_group": "monthly", "old_price_cny": old, "new_price_cny": new,
+            "change_amount": new - old, "change_percent": (new - old) / old * 100, "type": "price_change"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChangelogStore(str(tmp_path / "changelog_data"), str(tmp_path / "CHANGELOG.md"),
+                          str(tmp_path / "changelog_archive"))
+
+
+def read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_render_and_migrate_round_trip(store, tmp_path):
+    store.add("2025-08-05 10:00:00", [price_change("Mobile", 60.0, 66.0), price_change("Ultimate", 120.0, 110.0)])
+    store.add("2025-08-12 10:00:00", [])
+    store.render()
+
+    # 从渲染出的 CHANGELOG.md 重新导入，条目渲染结果不变
+    imported = ChangelogStore(str(tmp_path / "imported"), store.changelog_file, store.archive_dir)
+    assert [entry["date"] for entry in imported.all_entries()] == ["2025-08-05 10:00:00", "2025-08-12 10:00:00"]
+    assert [render_entry(entry) for entry in imported.sorted_entries("2025-Q3")] == \
+        [render_entry(entry) for entry in store.sorted_entries("2025-Q3")]
+    # 无变化条目还原为结构化的空变化列表
+    assert imported.entries("2025-Q3")[1] == {"date": "2025-08-12 10:00:00", "changes": []}
+
+
+def test_backfilled_entry_is_sorted_by_date(store):
+    store.add("2025-08-12 10:00:00", [price_change("Mobile", 60.0, 66.0)])
+    store.add("2025-07-20 10:00:00", [])
+
+    meta = store.quarters["2025-Q3"]
+    assert (meta["entries"], meta["first"], meta["last"]) == (2, "2025-07-20 10:00:00", "2025-08-12 10:00:00")
+    store.render()
+    changelog = read(store.changelog_file)
+    assert changelog.index("## 2025-08-12 10:00:00") < changelog.index("## 2025-07-20 10:00:00")
+
+
+def test_archive_renders_only_changed_quarters(store):
+    store.add("2025-08-05 10:00:00", [price_change("Mobile", 60.0, 66.0)])
+    store.add("2026-01-19 10:00:00", [])
+
+    assert store.archive(before="2026-Q1") == (1, ["changelog_2025-Q3.md"])
+    assert "2025-08-05" not in read(store.changelog_file)
+    assert "2025-08-05" in read(os.path.join(store.archive_dir, "changelog_2025-Q3.md"))
+    assert store.render() == []
+
+    # 已归档季度补写条目后只重新渲染该季度
+    store.add("2025-09-01 10:00:00", [])
+    assert store.render() == ["changelog_2025-Q3.md"]
+    assert "2025-09-01" in read(os.path.join(store.archive_dir, "changelog_2025-Q3.md"))
+
+
+def test_index_is_rebuilt_from_quarter_files(store, tmp_path):
+    store.add("2025-08-05 10:00:00", [price_change("Mobile", 60.0, 66.0)])
+    store.add("2026-01-19 10:00:00", [])
+    with open(store.index_path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+
+    reloaded = ChangelogStore(store.directory, store.changelog_file, store.archive_dir)
+    assert {quarter: meta["entries"] for quarter, meta in reloaded.quarters.items()} == {"2025-Q3": 1, "2026-Q1": 1}
+    assert reloaded.all_entries() == store.all_entries()
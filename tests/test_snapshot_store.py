@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""max_snapshot_store：写入与还原、去重、pack、关键帧 + 差量链、单国历史、gc、校验、索引重建"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from max_snapshot_store import SnapshotStore, clear_cache, load_snapshot, reference_info
+
+KIND = "all_countries"
+
+
+def snapshot(stamp: str, hk_price: float = 52.0) -> dict:
+    """两个国家的原始快照；scraped_at/attempt 位于记录中间，每次抓取都不同"""
+    scraped_at = f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]}T{stamp[9:11]}:{stamp[11:13]}:{stamp[13:15]}"
+
+    def record(code: str, name: str, price: float, currency: str) -> dict:
+        return {"country_code": code, "country_name": name, "scraped_at": scraped_at,
+                "plans": [{"plan_group": "monthly", "name": "Mobile", "price": f"{price:.2f}",
+                           "price_number": price, "currency": currency}],
+                "attempt": 2 if code == "TW" else 1, "success": True}
+
+    return {"HK": record("HK", "Hong Kong", hk_price, "HKD"), "TW": record("TW", "Taiwan", 290.0, "TWD")}
+
+
+def archive_path(store: SnapshotStore, stamp: str) -> str:
+    return os.path.join(store.archive_dir, stamp[:4], f"max_prices_all_countries_{stamp}.json")
+
+
+def content_of(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def step_stamp(step: int) -> str:
+    return f"202601{step + 1:02d}_120000"
+
+
+def chain_snapshot(step: int, countries: int = 12, skip: tuple = ()) -> dict:
+    """多国快照序列的第 step 期：只有 C00 每期调价，scraped_at 每期都变，skip 中的国家本期缺失"""
+    scraped_at = f"2026-01-{step + 1:02d}T12:00:00"
+    data = {}
+    for n in range(countries):
+        code = f"C{n:02d}"
+        if code in skip:
+            continue
+        price = 10.0 + n + (step if n == 0 else 0)
+        data[code] = {"country_code": code, "scraped_at": scraped_at,
+                      "plans": [{"name": "Mobile", "price_number": price, "currency": "USD"}],
+                      "attempt": 1, "success": True}
+    return data
+
+
+def write_step(store: SnapshotStore, step: int, **kwargs) -> str:
+    path = archive_path(store, step_stamp(step))
+    store.write(path, chain_snapshot(step, **kwargs))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_object_cache():
+    # 对象和目录缓存是模块级的：不同测试写入相同内容时哈希相同，清空后才会真正读取各自目录中的对象
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "archive"), codec="gzip")
+
+
+def test_write_and_load_round_trip_is_byte_exact(store):
+    data = snapshot("20260105_120000")
+    path = archive_path(store, "20260105_120000")
+    info = store.write(path, data, content_of(data))
+
+    assert os.path.getsize(path) < 1024
+    loaded = load_snapshot(path)
+    # 易变字段放回原位置，键顺序与原快照一致，重新序列化后逐字节相同
+    assert list(loaded["HK"]) == list(data["HK"])
+    assert content_of(loaded) == content_of(data)
+    assert info["size"] == len(content_of(data)) and info["countries"] == 2
+
+
+def test_unchanged_countries_are_stored_once(store):
+    first = store.write(archive_path(store, "20260105_120000"), snapshot("20260105_120000"))
+    second = store.write(archive_path(store, "20260112_120000"), snapshot("20260112_120000", hk_price=55.0))
+
+    # 第二份只新增 HK 的记录和目录对象；TW 只有易变字段不同，沿用已有对象
+    assert 0 < second["stored"] < first["stored"]
+    assert sum(1 for _ in store.objects()) == 2 + 2 + 1
+    assert load_snapshot(archive_path(store, "20260112_120000"))["TW"]["attempt"] == 2
+
+
+def test_pack_converts_full_json_in_place(store):
+    data = snapshot("20260105_120000")
+    path = archive_path(store, "20260105_120000")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(content_of(data))
+
+    assert store.pack(path) > 0
+    with open(path, "rb") as f:
+        ref = reference_info(f.read())
+    assert ref is not None and ref["sha256"] and ref["size"] == len(content_of(data))
+    assert content_of(load_snapshot(path)) == content_of(data)
+    assert store.pack(path) is None
+
+
+def test_gc_keeps_objects_of_remaining_references(store):
+    old_path = archive_path(store, "20260105_120000")
+    new_path = archive_path(store, "20260112_120000")
+    store.write(old_path, snapshot("20260105_120000"))
+    store.write(new_path, snapshot("20260112_120000", hk_price=55.0))
+
+    os.remove(old_path)
+    # 只删除旧快照独有的目录对象和 HK 记录，共用的 TW 记录保留
+    assert store.gc() == 2
+    assert store.gc() == 0
+    assert store.verify() == []
+    assert load_snapshot(new_path) == snapshot("20260112_120000", hk_price=55.0)
+
+
+def test_corrupt_object_is_reported(store):
+    path = archive_path(store, "20260105_120000")
+    store.write(path, snapshot("20260105_120000"))
+    digest, object_path = next(store.objects())
+    with open(object_path, "wb") as f:
+        f.write(gzip.compress(b'{"tampered":true}'))
+
+    assert any(digest[:12] in problem or object_path in problem for problem in store.verify())
+    with pytest.raises(ValueError):
+        SnapshotStore(store.archive_dir).get(digest)
+
+
+def test_delta_chain_resets_at_keyframe_interval(tmp_path):
+    store = SnapshotStore(str(tmp_path / "archive"), codec="gzip", keyframe_interval=3)
+    paths = [write_step(store, step) for step in range(7)]
+
+    assert [item["depth"] for item in store.chain(KIND)] == [0, 1, 2, 0, 1, 2, 0]
+    clear_cache()
+    for step, path in enumerate(paths):
+        assert content_of(load_snapshot(path)) == content_of(chain_snapshot(step))
+        assert store.snapshot(KIND, step_stamp(step)) == chain_snapshot(step)
+
+
+def test_backfilled_snapshot_is_stored_in_timestamp_order(store):
+    for step in (0, 1, 3, 4, 2):
+        write_step(store, step)
+
+    assert [item["timestamp"] for item in store.chain(KIND)] == [step_stamp(step) for step in range(5)]
+    clear_cache()
+    for step in range(5):
+        assert content_of(load_snapshot(archive_path(store, step_stamp(step)))) == content_of(chain_snapshot(step))
+    history = store.country_history(KIND, "C00")
+    assert [entry["record"]["plans"][0]["price_number"] for entry in history] == [10.0, 11.0, 12.0, 13.0, 14.0]
+
+
+def test_country_history_matches_full_reconstruction(store):
+    # C05 在第 2、3 期缺失，第 4 期重新出现
+    skips = {2: ("C05",), 3: ("C05",)}
+    for step in range(6):
+        write_step(store, step, skip=skips.get(step, ()))
+    clear_cache()
+
+    for country in ("C00", "C05", "C07"):
+        expected = [(step_stamp(step), chain_snapshot(step, skip=skips.get(step, ()))[country])
+                    for step in range(6) if country not in skips.get(step, ())]
+        history = store.country_history(KIND, country)
+        assert [(entry["timestamp"], entry["record"]) for entry in history] == expected
+    assert [entry["timestamp"] for entry in store.country_history(KIND, "C00", since=step_stamp(4))] == \
+        [step_stamp(4), step_stamp(5)]
+
+
+def test_gc_keeps_parent_trees_of_remaining_snapshots(store):
+    paths = [write_step(store, step) for step in range(5)]
+    with open(paths[3], "rb") as f:
+        parent = store.tree_object(reference_info(f.read())["tree"])["parent"]
+    os.remove(paths[2])
+    assert any(step_stamp(2) in problem for problem in store.verify())
+
+    store.gc()
+    clear_cache()
+    # 第 2 期的引用已删除，但它的目录对象仍是第 3 期差量的基准
+    assert any(digest == parent for digest, _ in store.objects())
+    for step in (0, 1, 3, 4):
+        assert load_snapshot(paths[step]) == chain_snapshot(step)
+    assert store.verify() == []
+    assert [entry["timestamp"] for entry in store.country_history(KIND, "C00")] == \
+        [step_stamp(step) for step in (0, 1, 3, 4)]
+
+
+def test_index_is_rebuilt_from_reference_files(tmp_path):
+    store = SnapshotStore(str(tmp_path / "archive"), codec="gzip", keyframe_interval=2)
+    for step in range(4):
+        write_step(store, step)
+    chain = store.chain(KIND)
+    os.remove(store.index_path)
+    clear_cache()
+
+    reloaded = SnapshotStore(store.archive_dir)
+    assert reloaded.chain(KIND) == chain
+    assert os.path.exists(store.index_path)
+    assert reloaded.snapshot(KIND, step_stamp(3)) == chain_snapshot(3)
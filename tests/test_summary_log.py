@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""max_summary_log：追加、去重引用、按时间范围读取、索引重建"""
+
+import json
+
+import pytest
+
+from max_summary_log import SummaryLog, range_bound
+
+
+def summary(date: str, total: int) -> dict:
+    return {"date": date, "timestamp": date.replace(" ", "T"), "total_changes": total,
+            "price_increases": total, "price_decreases": 0, "new_plans": 0, "removed_plans": 0}
+
+
+@pytest.fixture
+def summary_log(tmp_path):
+    return SummaryLog(str(tmp_path / "changes.jsonl"), str(tmp_path / "changes.index.json"))
+
+
+def test_append_and_read_round_trip(summary_log):
+    first, second = summary("2026-01-19 10:00:00", 3), summary("2026-02-01 10:00:00", 5)
+    assert summary_log.append(first)
+    assert summary_log.append(second)
+
+    records = list(SummaryLog(summary_log.path, summary_log.index_path).read())
+    assert [{k: v for k, v in record.items() if k != "hash"} for record in records] == [first, second]
+    # 键的顺序与写入时一致
+    assert list(records[0])[:len(first)] == list(first)
+
+
+def test_duplicate_content_is_stored_as_reference(summary_log):
+    first, repeat = summary("2026-01-19 10:00:00", 3), summary("2026-01-26 10:00:00", 3)
+    assert summary_log.append(first)
+    assert not summary_log.append(repeat)
+
+    with open(summary_log.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert set(lines[1]) == {"date", "timestamp", "same_as"}
+
+    expanded = list(summary_log.read())[1]
+    assert expanded["date"] == repeat["date"] and expanded["timestamp"] == repeat["timestamp"]
+    assert expanded["total_changes"] == 3 and expanded["same_as"] == lines[0]["hash"]
+
+
+def test_read_range_and_latest(summary_log):
+    for date, total in (("2026-01-19 10:00:00", 1), ("2026-03-05 10:00:00", 2), ("2026-02-10 10:00:00", 4)):
+        summary_log.append(summary(date, total))
+
+    in_february = list(summary_log.read(range_bound("2026-02"), range_bound("2026-02", upper=True)))
+    assert [record["total_changes"] for record in in_february] == [4]
+    # 补写的较早记录按时间排序，最新一条取时间最大的
+    assert [record["total_changes"] for record in summary_log.read()] == [1, 4, 2]
+    assert summary_log.latest()["total_changes"] == 2
+
+
+def test_index_is_rebuilt_when_log_size_changes(summary_log):
+    summary_log.append(summary("2026-01-19 10:00:00", 1))
+    # 索引之外手工追加一行：log_size 不一致，下次加载时扫描日志重建
+    with open(summary_log.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary("2026-01-20 10:00:00", 2)) + "\n")
+        f.write("not json\n")
+
+    reloaded = SummaryLog(summary_log.path, summary_log.index_path)
+    assert [record["total_changes"] for record in reloaded.read()] == [1, 2]
+    with open(summary_log.index_path, encoding="utf-8") as f:
+        index = json.load(f)
+    assert len(index["entries"]) == 2 and index["log_size"] == reloaded._log_size()
+
+
+def test_migrate_imports_legacy_files_in_order(summary_log, tmp_path):
+    for name, date, total in (("b", "2026-02-01 10:00:00", 2), ("a", "2026-01-01 10:00:00", 1)):
+        with open(tmp_path / f"max_price_changes_summary_{name}.json", "w", encoding="utf-8") as f:
+            json.dump(summary(date, total), f)
+
+    assert summary_log.migrate(str(tmp_path / "max_price_changes_summary_*.json")) == 2
+    assert not list(tmp_path.glob("max_price_changes_summary_*.json"))
+    assert [record["total_changes"] for record in summary_log.read()] == [1, 2]